@@ -35,6 +35,121 @@ SNOWFLAKE_SCHEMA = config.get("snowflake", "schema")
 SNOWFLAKE_WAREHOUSE = config.get("snowflake", "warehouse")
 SNOWFLAKE_ROLE = config.get("snowflake", "role")
 
+SNOWFLAKE_POOL_SIZE = 4                  # Max concurrent pooled connections per process
+SNOWFLAKE_POOL_TIMEOUT = 30              # Seconds to wait for a free pooled connection
+SNOWFLAKE_HEALTH_CHECK_INTERVAL = 300    # Idle seconds before a pooled connection is re-validated
+
+SNOWFLAKE_ROLLUP_TABLE = "DASHBOARD_ROLLUP"  # Pre-aggregated (date, brand, sentiment, topic) counts
+
+SNOWFLAKE_QUERY_TAGS = True                       # Set QUERY_TAG (app, stage, run ID) on pooled sessions for QUERY_HISTORY reports
+SNOWFLAKE_QUERY_TAG_APP = "brand-intelligence"    # "app" field of every query tag
+SNOWFLAKE_QUERY_TAG_DEFAULT_STAGE = "adhoc"       # Stage of statements issued outside a tagged stage
+
+# Brands tracked by the dashboards, in match-priority order (a tweet counts toward the first brand it mentions)
+DASHBOARD_BRANDS = ["Nike", "Adidas", "Puma", "Under Armour", "New Balance"]
+
+# === Local Dashboard Store (Parquet replica of FINAL_TWEETS) ===
+LOCAL_STORE_ENABLED = True                                  # Serve dashboard aggregates from the local replica
+LOCAL_STORE_PATH = os.path.join("data", "final_tweets")     # Directory holding the Parquet parts
+LOCAL_STORE_SYNC_INTERVAL = 300                             # Seconds between incremental syncs from the dashboards
+LOCAL_STORE_MAX_PARTS = 20                                  # Compact into a single file beyond this many parts
+LOCAL_STORE_SYNC_OVERLAP = 7 * 24 * 3600                    # Seconds of CREATED_AT re-read each sync, for tweets loaded late
+
+# === Ingest Near-Duplicate Detection ===
+DEDUP_ENABLED = True                                        # Copy annotations from near-duplicate tweets instead of recomputing them
+DEDUP_INDEX_PATH = os.path.join("data", "dedup_index")      # MinHash signatures and cluster assignments
+DEDUP_SIMILARITY_THRESHOLD = 0.8                            # Estimated Jaccard similarity for a tweet to join a cluster
+DEDUP_LSH_BANDS = 16                                        # LSH bands (of 4 signature slots each)
+
+# === Data Version & Dashboard Cache ===
+DATA_VERSION_PATH = os.path.join("data", "data_version.json")        # Token bumped by the pipeline after each load
+DASHBOARD_CACHE_PATH = os.path.join("data", "dashboard_cache")       # Panel results shared by all dashboard sessions
+DASHBOARD_CACHE_MAX_ENTRIES = 64                                     # Filter combinations kept in memory per process
+DASHBOARD_PREWARM_TOP_N = 5                                          # Most requested filter combinations pre-warmed after a load
+
+# === Embedding Profile ===
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536                        # Requested from the API and stored in Neo4j / Snowflake (e.g. 512); run testing/migrate_embeddings.py after lowering
+EMBEDDING_JSON_DECIMALS = 6                        # Decimals kept when embeddings are stored as JSON in Snowflake
+
+# === QA Semantic Answer Cache ===
+QA_CACHE_ENABLED = True
+QA_CACHE_PATH = os.path.join("data", "qa_cache")   # Persisted questions, answers and embeddings
+QA_CACHE_SIMILARITY_THRESHOLD = 0.92               # Cosine similarity needed to reuse a previous answer
+QA_CACHE_MAX_ENTRIES = 1000                        # Oldest entries are evicted beyond this
+
+# === QA Prompt Context ===
+QA_CONTEXT_TOKEN_BUDGET = 800                      # Tokens of tweet context per answer prompt
+QA_CONTEXT_DUPLICATE_THRESHOLD = 0.7               # Estimated Jaccard similarity for tweets to count as near-duplicates
+
+# === QA Retrieval Backend ===
+QA_RETRIEVAL_BACKEND = "neo4j"                     # "neo4j" (server vector index) or "local" (in-process ANN index)
+ANN_INDEX_PATH = os.path.join("data", "ann_index") # Memory-mapped vectors, tweet IDs and IVF lists
+ANN_NLIST = 256                                    # Upper bound on IVF clusters (sqrt(n) is used for smaller indexes)
+ANN_NPROBE = 16                                    # Clusters scanned per query
+ANN_MIN_TRAIN_SIZE = 2048                          # Below this many vectors search is exact
+ANN_FILTER_EXACT_MAX = 20000                       # Filtered searches over at most this many eligible rows are exact
+VECTOR_FILTER_OVERFETCH = 10                       # Neo4j backend: filtered searches fetch this many times more neighbours before filtering
+ANN_QUANTIZATION = "none"                          # "int8": scan 1-byte codes and re-score the best candidates with the float vectors
+ANN_RESCORE_FACTOR = 4                             # int8 candidates re-scored per requested result
+QA_RETRIEVAL_PREFILTER = True                      # Restrict retrieval to the brands / time window named in the question
+FULLTEXT_INDEX_NAME = "tweet_text"                 # Neo4j full-text index on Tweet.text (keyword half of hybrid search)
+RRF_K = 60                                         # Reciprocal-rank fusion constant
+
+# === LLM Gateway ===
+LLM_MODEL = "gpt-4o-mini"                          # Chat model for answers and follow-up questions
+LLM_MAX_IN_FLIGHT = 8                              # OpenAI requests open at once per process (streams hold a slot until done)
+LLM_MAX_RETRIES = 4                                # Retries of rate-limited, timed-out or 5xx requests
+LLM_RETRY_BASE_DELAY = 0.5                         # Seconds before the first retry, doubled for each further one
+LLM_REQUEST_TIMEOUT = 30.0                         # Seconds for a single request (further capped by the caller's deadline)
+LLM_HEDGE_DEFAULT_DELAY = 0.5                      # Seconds before a hedged embedding request until its p95 is known
+LLM_CACHE_ENABLED = True                           # Reuse responses to identical temperature-0 prompts
+LLM_CACHE_PATH = os.path.join("data", "llm_cache") # One JSON file per cached prompt
+LLM_CACHE_MAX_ENTRIES = 5000                       # Oldest responses are pruned beyond this
+
+# === QA Deadlines ===
+QA_DEADLINE = 30.0                                 # Seconds from question to finished answer
+QA_EMBEDDING_TIMEOUT = 2.0                         # Past this, retrieval falls back to keyword (full-text) search
+QA_ANSWER_TIMEOUT = 20.0                           # Past this, a template answer built from the retrieved tweets is returned
+
+# === QA Conversation Follow-ups ===
+QA_CONVERSATION_MIN_SIMILARITY = 0.35              # Previous candidates at least this similar to a follow-up count as covering it
+QA_CONVERSATION_MIN_COVERAGE = 10                  # Covering candidates needed to answer a follow-up without a new graph query
+QA_CONVERSATION_MAX_REUSES = 3                     # Follow-ups answered from one candidate set before it is refreshed
+
+# === QA Question Router ===
+QA_ROUTER_ENABLED = True                           # Answer count / sentiment-share / top-N questions from Cypher templates, without the LLM
+QA_ROUTER_CACHE_MAX_ENTRIES = 500                  # Template results kept in memory (per data version)
+QA_ROUTER_TOP_N = 10                               # Hashtags / topics listed by top-N answers
+
+# === Graph Summaries ===
+QA_GRAPH_SUMMARIES = True                          # Answer aggregate questions from precomputed Summary nodes
+SUMMARY_MIN_TWEETS = 20                            # Smaller brand / topic / hashtag summaries do not answer questions
+SUMMARY_REPRESENTATIVE_TWEETS = 5                  # Highest-engagement tweets (one per near-duplicate cluster) kept per summary
+SUMMARY_TOP_ENTRIES = 5                            # Topics and hashtags listed per summary
+SUMMARY_MAX_PER_QUESTION = 3                       # Summaries put into one answer prompt (e.g. brand comparisons)
+
+# === QA Batch Questions ===
+QA_BATCH_MAX_CONCURRENCY = 4                       # Answers generated in parallel by process_questions
+QA_BATCH_REQUESTS_PER_MINUTE = 120                 # Cap on answer requests started per minute
+
+# === QA Service ===
+QA_SERVICE_HOST = "127.0.0.1"
+QA_SERVICE_PORT = 8765
+QA_SERVICE_URL = f"http://{QA_SERVICE_HOST}:{QA_SERVICE_PORT}"  # Used by the Streamlit apps; None embeds the QA system in each app
+QA_SERVICE_MAX_CONCURRENCY = 8                     # Questions computed at once
+QA_SERVICE_MAX_PENDING = 64                        # Distinct questions admitted (running + waiting) before 503s
+QA_SERVICE_TIMEOUT = 120                           # Seconds a client waits on one answer stream
+QA_SERVICE_CONVERSATION_TTL = 1800                 # Seconds an idle conversation's follow-up candidates are kept
+QA_SERVICE_MAX_CONVERSATIONS = 1000                # Conversations kept at once (least recently used are dropped)
+
+# === Tracing & Metrics ===
+TRACING_ENABLED = True
+METRICS_FILE_PATH = os.path.join("data", "metrics", "pipeline.prom")  # Prometheus text file written after each pipeline run
+METRICS_PORT = 9464                                                   # Local /metrics endpoint of the Streamlit apps (0 disables)
+TRACE_LOG_PATH = None                                                 # OTLP/JSON span log, e.g. os.path.join("data", "traces.jsonl")
+TRACE_SERVICE_NAME = "brand-intelligence"
+
 # === Twikit Authentication Configuration ===
 X_USERNAME = config.get("X", "username")
 #X_EMAIL = config.get("X", "email")
@@ -46,6 +161,11 @@ NEO4J_USERNAME = config.get('neo4j', 'username')
 NEO4J_PASSWORD = config.get('neo4j', 'password')
 NEO4J_DATABASE = config.get('neo4j', 'database')
 
+# === Neo4j Query Profiling ===
+NEO4J_PROFILE_SAMPLE_RATE = 0.0                    # Fraction of Cypher statements run with PROFILE (0 disables profiling)
+NEO4J_PROFILE_PATH = os.path.join("data", "neo4j_profiles.jsonl")  # One line per profiled statement
+NEO4J_PROFILE_SIZE_TTL = 300                       # Seconds the graph size recorded with profiles is reused
+
 # === Logging ===
 logging.basicConfig(
     filename="scraper_errors.log",
@@ -3,7 +3,7 @@ Database connector modules for the Twitter Analytics project.
 This package provides connections to Snowflake and Neo4j databases.
 """
 
-from .snowflake_connector import get_connection as get_snowflake_connection
+from .snowflake_connector import get_connection as get_snowflake_connection, get_pool as get_snowflake_pool
 from .neo4j_connector import get_driver as get_neo4j_driver, get_session as get_neo4j_session
 
-__all__ = ['get_snowflake_connection', 'get_neo4j_driver', 'get_neo4j_session']
\ No newline at end of file
+__all__ = ['get_snowflake_connection', 'get_snowflake_pool', 'get_neo4j_driver', 'get_neo4j_session']
\ No newline at end of file
@@ -1,13 +1,21 @@
 # neo4j_connector.py
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from connectors.neo4j_profiling import profiling_driver
 from config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NEO4J_DATABASE
 
 def get_driver():
     """
     Create and return a Neo4j driver instance using credentials from the config.
+    Statements are sampled for PROFILE capture when NEO4J_PROFILE_SAMPLE_RATE > 0.
     """
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
-    return driver
+    return profiling_driver(driver)
+
+def get_async_driver():
+    """
+    Create and return an asyncio Neo4j driver (used by the QA service).
+    """
+    return AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
 
 # Optional: if you want a helper to create a session for a specific database
 def get_session():
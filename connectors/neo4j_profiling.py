@@ -0,0 +1,231 @@
+# neo4j_profiling.py
+"""
+Opt-in, sampled PROFILE capture for Cypher statements.
+With NEO4J_PROFILE_SAMPLE_RATE > 0, drivers from `profiling_driver` run that fraction of
+statements as `PROFILE <statement>` (which executes them normally and returns the same
+rows) and append one line per profiled statement to NEO4J_PROFILE_PATH:
+
+- the query name: a `// query: <name>` comment in the statement, or otherwise a hash of
+  its shape (whitespace collapsed, string and number literals replaced by ?)
+- total db hits, rows returned, elapsed time and the plan's operators
+- flags for full scans (AllNodesScan, NodeByLabelScan), Eager and CartesianProduct
+- the number of Tweet nodes at the time, so cost can be related to graph size
+
+`python -m testing.neo4j_profile_report` turns the log into a per-query report of which
+shapes get more expensive as the graph grows. Statements in managed transactions
+(`execute_read` / `execute_write`) are sampled too; the asyncio driver is not wrapped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from config import NEO4J_PROFILE_SAMPLE_RATE, NEO4J_PROFILE_PATH, NEO4J_PROFILE_SIZE_TTL
+
+logger = logging.getLogger(__name__)
+
+QUERY_NAME = re.compile(r"//\s*query:\s*([\w.\-]+)")
+COMMENT = re.compile(r"//[^\n]*")
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Statements that are already profiled or explained, or are schema commands
+NOT_PROFILED = re.compile(r"^\s*(?:PROFILE|EXPLAIN|CREATE\s+(?:INDEX|CONSTRAINT|VECTOR|FULLTEXT)|DROP|SHOW)\b", re.IGNORECASE)
+
+# Plan operators that usually mean the statement does not scale with the graph
+FLAGGED_OPERATORS = {
+    "AllNodesScan": "all_nodes_scan",
+    "NodeByLabelScan": "label_scan",
+    "Eager": "eager",
+    "CartesianProduct": "cartesian_product",
+}
+
+def query_shape(query):
+    """The statement with comments dropped, literals replaced by ? and whitespace collapsed."""
+    shape = COMMENT.sub(" ", query)
+    shape = STRING_LITERAL.sub("?", shape)
+    shape = NUMBER_LITERAL.sub("?", shape)
+    return " ".join(shape.split())
+
+def query_name(query):
+    """The `// query: <name>` tag of a statement, or `shape-<hash>` of its shape."""
+    match = QUERY_NAME.search(query)
+    if match:
+        return match.group(1)
+    return "shape-" + hashlib.sha1(query_shape(query).encode("utf-8")).hexdigest()[:10]
+
+def plan_operators(plan):
+    """Every operator of a profiled plan (the driver's nested dict), depth first."""
+    yield plan
+    for child in plan.get("children", []):
+        yield from plan_operators(child)
+
+def operator_type(operator):
+    # Operator types carry the runtime, e.g. "NodeByLabelScan@neo4j"
+    return str(operator.get("operatorType", "")).split("@")[0]
+
+def summarize_profile(plan):
+    """db hits, rows, operators and flags of a profiled plan."""
+    operators = list(plan_operators(plan))
+    types = [operator_type(operator) for operator in operators]
+    return {
+        "db_hits": sum(int(operator.get("dbHits", 0) or 0) for operator in operators),
+        "rows": int(plan.get("rows", 0) or 0),
+        "operators": sorted(set(types)),
+        "flags": sorted({FLAGGED_OPERATORS[t] for t in types if t in FLAGGED_OPERATORS}),
+    }
+
+class BufferedResult:
+    """The fully fetched records of a profiled statement, with the Result methods the repo uses."""
+
+    def __init__(self, records, keys, summary):
+        self._records = records
+        self._keys = keys
+        self._summary = summary
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def keys(self):
+        return self._keys
+
+    def data(self, *keys):
+        return [record.data(*keys) for record in self._records]
+
+    def single(self, strict=False):
+        if strict and len(self._records) != 1:
+            raise ValueError(f"Expected a single record, found {len(self._records)}")
+        return self._records[0] if self._records else None
+
+    def value(self, key=0, default=None):
+        return [record.get(key, default) if isinstance(key, str) else record[key] for record in self._records]
+
+    def consume(self):
+        return self._summary
+
+class QueryProfiler:
+    """Samples statements, runs them with PROFILE and appends the plans to the profile log."""
+
+    def __init__(self, sample_rate=NEO4J_PROFILE_SAMPLE_RATE, path=NEO4J_PROFILE_PATH, size_ttl=NEO4J_PROFILE_SIZE_TTL):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.size_ttl = size_ttl
+        self._lock = threading.Lock()
+        self._tweet_count = None
+        self._tweet_count_at = 0.0
+
+    def should_profile(self, query):
+        return (isinstance(query, str) and not NOT_PROFILED.match(COMMENT.sub(" ", query))
+                and random.random() < self.sample_rate)
+
+    def _graph_size(self, runner):
+        """Tweet node count (from the count store), refreshed every size_ttl seconds."""
+        if self._tweet_count is None or time.monotonic() - self._tweet_count_at > self.size_ttl:
+            self._tweet_count = runner.run("MATCH (t:Tweet) RETURN count(t) AS tweets").single()["tweets"]
+            self._tweet_count_at = time.monotonic()
+        return self._tweet_count
+
+    def run(self, runner, query, parameters=None, **kwargs):
+        """Run `query` on a session or transaction with PROFILE and record its plan."""
+        start = time.perf_counter()
+        result = runner.run(f"PROFILE {query}", parameters, **kwargs)
+        records = list(result)
+        keys = result.keys()
+        summary = result.consume()
+        elapsed = time.perf_counter() - start
+        try:
+            entry = {
+                "timestamp": time.time(),
+                "name": query_name(query),
+                "shape": query_shape(query),
+                "elapsed_ms": elapsed * 1000,
+                "tweets": self._graph_size(runner),
+                **summarize_profile(summary.profile or {}),
+            }
+            self._append(entry)
+            if entry["flags"]:
+                logger.info(f"Profiled {entry['name']}: {entry['db_hits']} db hits, flags {entry['flags']}")
+        except Exception as e:
+            logger.warning(f"Could not record the profile of a Cypher statement: {e}")
+        return BufferedResult(records, keys, summary)
+
+    def _append(self, entry):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+class ProfilingTransaction:
+    """A transaction whose `run` is sampled for profiling."""
+
+    def __init__(self, tx, profiler):
+        self._tx = tx
+        self._profiler = profiler
+
+    def run(self, query, parameters=None, **kwargs):
+        if self._profiler.should_profile(query):
+            return self._profiler.run(self._tx, query, parameters, **kwargs)
+        return self._tx.run(query, parameters, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+class ProfilingSession(ProfilingTransaction):
+    """A session whose statements, including those of managed transactions, are sampled for profiling."""
+
+    def _managed(self, work):
+        return lambda tx, *args, **kwargs: work(ProfilingTransaction(tx, self._profiler), *args, **kwargs)
+
+    def execute_read(self, work, *args, **kwargs):
+        return self._tx.execute_read(self._managed(work), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._tx.execute_write(self._managed(work), *args, **kwargs)
+
+    def __enter__(self):
+        self._tx.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._tx.__exit__(*exc_info)
+
+class ProfilingDriver:
+    """Driver wrapper handing out ProfilingSessions."""
+
+    def __init__(self, driver, profiler):
+        self._driver = driver
+        self._profiler = profiler
+
+    def session(self, **kwargs):
+        return ProfilingSession(self._driver.session(**kwargs), self._profiler)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._driver.close()
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+def get_query_profiler():
+    """Process-wide QueryProfiler, so every driver appends to the same log."""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = QueryProfiler()
+        return _profiler
+
+def profiling_driver(driver, sample_rate=NEO4J_PROFILE_SAMPLE_RATE):
+    """`driver` with sampled profiling when NEO4J_PROFILE_SAMPLE_RATE > 0, otherwise unchanged."""
+    if sample_rate <= 0:
+        return driver
+    logger.info(f"Profiling {sample_rate:.1%} of Cypher statements into {NEO4J_PROFILE_PATH}")
+    return ProfilingDriver(driver, get_query_profiler())
@@ -1,12 +1,79 @@
 # snowflake_connector.py
+import contextvars
+import inspect
+import json
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
 import snowflake.connector
 from config import SNOWFLAKE_ACCOUNT, SNOWFLAKE_DATABASE, SNOWFLAKE_PASSWORD, SNOWFLAKE_ROLE, SNOWFLAKE_SCHEMA, SNOWFLAKE_STAGE_TABLE, SNOWFLAKE_USER, SNOWFLAKE_WAREHOUSE  # All your credentials
+from config import SNOWFLAKE_POOL_SIZE, SNOWFLAKE_POOL_TIMEOUT, SNOWFLAKE_HEALTH_CHECK_INTERVAL
+from config import SNOWFLAKE_QUERY_TAGS, SNOWFLAKE_QUERY_TAG_APP, SNOWFLAKE_QUERY_TAG_DEFAULT_STAGE
+
+# 1. Query Tags
+# Every session carries QUERY_TAG = {"app", "stage", "run_id"} so QUERY_HISTORY can be
+# broken down per pipeline stage and run (see testing/snowflake_query_report.py; tags are
+# parsed back by `testing.query_history.parse_query_tag`).
+# The stage follows the calling code (a context variable, so set it in the thread or
+# task that queries); the run ID is process-wide and renewed by `start_run`.
+
+def new_run_id():
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{secrets.token_hex(3)}"
+
+_run_id = new_run_id()
+_stage = contextvars.ContextVar("snowflake_query_stage", default=SNOWFLAKE_QUERY_TAG_DEFAULT_STAGE)
+
+def start_run(run_id=None):
+    """Start a new run ID for the statements that follow (one per pipeline run) and return it."""
+    global _run_id
+    _run_id = run_id or new_run_id()
+    return _run_id
+
+def current_run_id():
+    return _run_id
+
+def current_query_tag():
+    """The QUERY_TAG for statements issued from here: JSON with app, stage and run ID."""
+    return json.dumps({"app": SNOWFLAKE_QUERY_TAG_APP, "stage": _stage.get(), "run_id": _run_id},
+                      separators=(",", ":"))
 
-# 1. Basic Connection Function
-def get_connection():
+@contextmanager
+def query_stage(stage):
+    """Tag the Snowflake statements of a block with `stage`."""
+    token = _stage.set(stage)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+
+def tag_queries(stage):
+    """Decorator form of `query_stage` for plain and async functions."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with query_stage(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# 2. Basic Connection Function
+def get_connection(keep_alive=False):
 
     """Connecting to Snowflake using the provided credentials."""
 
+    session_parameters = {"QUERY_TAG": current_query_tag()} if SNOWFLAKE_QUERY_TAGS else None
     return snowflake.connector.connect(
         user=SNOWFLAKE_USER,
         password=SNOWFLAKE_PASSWORD,
@@ -14,5 +81,157 @@ def get_connection():
         warehouse=SNOWFLAKE_WAREHOUSE,
         database=SNOWFLAKE_DATABASE,
         schema=SNOWFLAKE_SCHEMA,
-        role=SNOWFLAKE_ROLE
+        role=SNOWFLAKE_ROLE,
+        client_session_keep_alive=keep_alive,
+        session_parameters=session_parameters
     )
+
+# 3. Connection Pool
+class SnowflakeConnectionPool:
+    """
+    Thread-safe pool of authenticated Snowflake connections.
+    Connections are created on demand up to `max_size`, kept alive between checkouts,
+    and health-checked before being handed out again. A connection's QUERY_TAG is updated
+    on checkout when the caller's stage or run differs from its last one.
+    """
+
+    def __init__(self, max_size=SNOWFLAKE_POOL_SIZE, timeout=SNOWFLAKE_POOL_TIMEOUT,
+                 health_check_interval=SNOWFLAKE_HEALTH_CHECK_INTERVAL):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()   # (connection, last_used) - most recently used first
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._all = set()
+        self._tags = {}   # connection -> QUERY_TAG currently set on its session
+        self._closed = False
+
+    def _is_healthy(self, conn, last_used):
+        """Cheap check for recently used connections, round-trip check for stale ones."""
+        if conn.is_closed():
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _apply_query_tag(self, conn):
+        """Set the caller's QUERY_TAG on a connection, skipping the round trip if it is already set."""
+        if not SNOWFLAKE_QUERY_TAGS:
+            return
+        tag = current_query_tag()
+        if self._tags.get(conn) == tag:
+            return
+        with conn.cursor() as cur:
+            cur.execute("ALTER SESSION SET QUERY_TAG = %s", (tag,))
+        with self._lock:
+            self._tags[conn] = tag
+
+    def _discard(self, conn):
+        with self._lock:
+            self._all.discard(conn)
+            self._tags.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a healthy connection, opening a new one if none are idle."""
+        if self._closed:
+            raise RuntimeError("Snowflake connection pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No Snowflake connection available after {self.timeout} seconds")
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_healthy(conn, last_used):
+                    try:
+                        self._apply_query_tag(conn)
+                        return conn
+                    except Exception:
+                        pass
+                self._discard(conn)
+
+            conn = get_connection(keep_alive=True)
+            with self._lock:
+                self._all.add(conn)
+                self._tags[conn] = current_query_tag()  # Set at connect time
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any uncommitted work."""
+        try:
+            if self._closed or conn.is_closed():
+                self._discard(conn)
+                return
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                return
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def cursor(self, cursor_class=None):
+        """Context manager yielding a fresh cursor on a pooled connection."""
+        with self.connection() as conn:
+            cur = conn.cursor(cursor_class) if cursor_class else conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def close(self):
+        """Close every connection owned by the pool."""
+        self._closed = True
+        with self._lock:
+            connections = list(self._all)
+            self._all.clear()
+            self._tags.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = SnowflakeConnectionPool()
+        return _pool
+
+def pooled_connection():
+    """Shortcut for `get_pool().connection()`."""
+    return get_pool().connection()
+
+def pooled_cursor(cursor_class=None):
+    """Shortcut for `get_pool().cursor()`."""
+    return get_pool().cursor(cursor_class)
@@ -3,19 +3,25 @@ Data pipeline modules for the Twitter Analytics project.
 This package handles Twitter data scraping, processing, and loading.
 """
 
-from .twitter_client import authenticate, scrape_tweets
-from .enriched_tweets import process_tweets
-from .data_loading_neo4j import load_tweets_data_into_neo4j
-from .utils import log_error, apply_delay, extract_hashtags, extract_mentions, extract_urls
+# Public name -> submodule defining it. Submodules are imported on first attribute access
+# (PEP 562), so `import data_pipeline.utils` no longer drags in torch, transformers and
+# twikit through this package; each entry point only pays for what it uses.
+_EXPORTS = {
+    'authenticate': 'twitter_client',
+    'scrape_tweets': 'twitter_client',
+    'process_tweets': 'enriched_tweets',
+    'load_tweets_data_into_neo4j': 'data_loading_neo4j',
+    'log_error': 'utils',
+    'apply_delay': 'utils',
+    'extract_hashtags': 'utils',
+    'extract_mentions': 'utils',
+    'extract_urls': 'utils',
+}
 
-__all__ = [
-    'authenticate', 
-    'scrape_tweets',
-    'process_tweets',
-    'load_tweets_data_into_neo4j',
-    'log_error',
-    'apply_delay',
-    'extract_hashtags',
-    'extract_mentions',
-    'extract_urls'
-]
\ No newline at end of file
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        from importlib import import_module
+        return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,446 @@
+# ann_index.py
+"""
+This module provides an embedded approximate-nearest-neighbour index over tweet embeddings.
+Vectors are unit-normalized and appended to a raw float32 file that is memory-mapped for
+search, next to the tweet IDs (one per row) and an IVF coarse quantizer: k-means centroids
+plus the cluster of every row. A query scans only the ANN_NPROBE closest clusters, and
+falls back to an exact scan while the index is smaller than ANN_MIN_TRAIN_SIZE.
+Each row also carries the brands its tweet mentions (a bitmask over DASHBOARD_BRANDS) and
+its date, so a search can be restricted to a brand / time window before scoring: small
+eligible subsets are scanned exactly, larger ones probe clusters until enough eligible
+rows are found.
+Rows are stored with the profile's EMBEDDING_DIMENSIONS (longer embeddings are truncated,
+see `data_pipeline.embedding_profile`). With ANN_QUANTIZATION = "int8" every row also gets
+int8 codes and a scale; searches score candidates on the 4x smaller codes and re-score only
+the best top_k * ANN_RESCORE_FACTOR of them with the float vectors.
+The index is filled from Neo4j and updated incrementally after each load: it records the
+latest `loaded_at` (set by the loader) it has synced, and the next sync reads only tweets
+loaded since, through an index on Tweet.loaded_at.
+"""
+
+import json
+import logging
+import os
+import threading
+
+from datetime import date
+
+import numpy as np
+from data_pipeline.embedding_profile import truncate_rows
+from data_pipeline.retrieval_filters import brands_mentioned
+from data_pipeline.tracing import traced
+from config import (NEO4J_DATABASE, ANN_INDEX_PATH, ANN_NLIST, ANN_NPROBE, ANN_MIN_TRAIN_SIZE,
+                    ANN_FILTER_EXACT_MAX, ANN_QUANTIZATION, ANN_RESCORE_FACTOR, EMBEDDING_DIMENSIONS,
+                    DASHBOARD_BRANDS)
+
+logger = logging.getLogger(__name__)
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64  # Training rows sampled per cluster
+SCAN_CHUNK_ROWS = 65536      # Rows converted from int8 at a time during a scan
+
+def normalize_rows(matrix):
+    """Scale each row to unit length so inner product equals cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def train_kmeans(vectors, nlist, seed=0):
+    """Spherical k-means on a sample of the vectors; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = sample[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+            else:
+                # Re-seed empty clusters so every list stays useful
+                centroids[cluster] = sample[rng.integers(len(sample))]
+        centroids = normalize_rows(centroids)
+    return centroids
+
+def quantize_int8(vectors):
+    """Symmetric per-row int8 quantization: returns (codes, scales) with row ≈ codes * scale."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def int8_scores(codes, scales, rows, query):
+    """Approximate inner products of `query` with the int8-coded `rows` (every row when None)."""
+    total = len(codes) if rows is None else len(rows)
+    scores = np.empty(total, dtype=np.float32)
+    for start in range(0, total, SCAN_CHUNK_ROWS):
+        selected = slice(start, start + SCAN_CHUNK_ROWS) if rows is None else rows[start:start + SCAN_CHUNK_ROWS]
+        scores[start:start + SCAN_CHUNK_ROWS] = (codes[selected].astype(np.float32) @ query) * scales[selected]
+    return scores
+
+def best_positions(scores, top_k):
+    """Positions of the `top_k` highest scores, best first."""
+    top_k = min(top_k, len(scores))
+    if not top_k:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(scores, -top_k)[-top_k:]
+    return best[np.argsort(scores[best])[::-1]]
+
+def day_number(value):
+    """Ordinal of an ISO date (or datetime) string; 0 when unknown."""
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+class TweetANNIndex:
+    def __init__(self, path=ANN_INDEX_PATH, nlist=ANN_NLIST, nprobe=ANN_NPROBE, min_train_size=ANN_MIN_TRAIN_SIZE,
+                 dimensions=EMBEDDING_DIMENSIONS, quantization=ANN_QUANTIZATION, rescore_factor=ANN_RESCORE_FACTOR):
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.dimensions = dimensions          # Embeddings are truncated to this size when added
+        self.default_quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.ids_path = os.path.join(path, "ids.json")
+        self.ivf_path = os.path.join(path, "ivf.npz")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.brand_bits_path = os.path.join(path, "brand_bits.u32")
+        self.days_path = os.path.join(path, "days.i32")
+        self.codes_path = os.path.join(path, "codes.i8")
+        self.scales_path = os.path.join(path, "scales.f32")
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self.dim = None
+        self.count = 0
+        self.trained_count = 0
+        self.ids = []
+        self._id_set = set()
+        self._positions = None   # tweet_id -> row, built on first use by vectors_for
+        self.brands = list(DASHBOARD_BRANDS)  # Bit i of a row's brand mask is brands[i]
+        self.has_attributes = True            # False for indexes built before rows had attributes
+        self.synced_until = None              # Latest Tweet.loaded_at synced from Neo4j, None before a full sync
+        self.quantization = self.default_quantization  # What the stored rows carry ("none" or "int8")
+        self._vectors = None     # Memory-mapped (count, dim) float32 matrix
+        self._codes = None       # Memory-mapped (count, dim) int8 codes when quantized
+        self._scales = None      # Memory-mapped float32 scale per row when quantized
+        self._brand_bits = None  # Memory-mapped uint32 brand mask per row
+        self._days = None        # Memory-mapped int32 date ordinal per row (0 = unknown)
+        self._centroids = None   # (nlist, dim) unit-length centroids, None while untrained
+        self._assignments = None # Cluster of each row
+        self._list_order = None  # Row indices grouped by cluster
+        self._list_offsets = None
+
+    # --- Persistence ----------------------------------------------------------
+
+    def _load(self):
+        """(Re)load the index if another process or thread has written a newer version."""
+        try:
+            mtime = os.path.getmtime(self.meta_path)
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        with open(self.ids_path) as f:
+            ids = json.load(f)
+        self._reset_state()
+        self.dim, self.count, self.trained_count = meta["dim"], meta["count"], meta["trained_count"]
+        self.ids = ids[:self.count]
+        self._id_set = set(self.ids)
+        self.brands = meta.get("brands", self.brands)
+        self.has_attributes = meta.get("attributes", False) or not self.count
+        self.synced_until = meta.get("synced_until")
+        if self.count:
+            self.quantization = meta.get("quantization", "none")
+            if self.quantization != self.default_quantization:
+                logger.warning(f"ANN index is stored with quantization '{self.quantization}' but ANN_QUANTIZATION is "
+                               f"'{self.default_quantization}'; rebuild it with `python -m data_pipeline.ann_index`")
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            if self.has_attributes:
+                self._map_attributes()
+            if self.quantization == "int8":
+                self._map_codes()
+        if os.path.exists(self.ivf_path):
+            ivf = np.load(self.ivf_path)
+            self._centroids = ivf["centroids"]
+            self._set_assignments(ivf["assignments"][:self.count])
+        self._loaded_mtime = mtime
+
+    def _save(self):
+        """Write IDs, IVF lists and metadata; metadata goes last so readers never see a partial index."""
+        with open(self.ids_path + ".tmp", "w") as f:
+            json.dump(self.ids, f)
+        os.replace(self.ids_path + ".tmp", self.ids_path)
+        if self._centroids is not None:
+            with open(self.ivf_path + ".tmp", "wb") as f:
+                np.savez(f, centroids=self._centroids, assignments=self._assignments)
+            os.replace(self.ivf_path + ".tmp", self.ivf_path)
+        elif os.path.exists(self.ivf_path):
+            os.remove(self.ivf_path)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump({
+                "dim": self.dim, "count": self.count, "trained_count": self.trained_count,
+                "brands": self.brands, "attributes": self.has_attributes, "quantization": self.quantization,
+                "synced_until": self.synced_until,
+            }, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        self._loaded_mtime = os.path.getmtime(self.meta_path)
+
+    def _map_attributes(self):
+        self._brand_bits = np.memmap(self.brand_bits_path, dtype=np.uint32, mode="r", shape=(self.count,))
+        self._days = np.memmap(self.days_path, dtype=np.int32, mode="r", shape=(self.count,))
+
+    def _map_codes(self):
+        self._codes = np.memmap(self.codes_path, dtype=np.int8, mode="r", shape=(self.count, self.dim))
+        self._scales = np.memmap(self.scales_path, dtype=np.float32, mode="r", shape=(self.count,))
+
+    def brand_mask(self, brands):
+        """Bitmask of the given brand names (names the index does not track are ignored)."""
+        mask = 0
+        for brand in brands:
+            if brand in self.brands:
+                mask |= 1 << self.brands.index(brand)
+        return mask
+
+    def _set_assignments(self, assignments):
+        self._assignments = np.asarray(assignments, dtype=np.int32)
+        self._list_order = np.argsort(self._assignments, kind="stable")
+        counts = np.bincount(self._assignments, minlength=len(self._centroids))
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    # --- Updates --------------------------------------------------------------
+
+    def _train(self):
+        """Re-cluster every row. Caller must hold the lock."""
+        nlist = min(self.nlist, max(1, int(np.sqrt(self.count))))
+        self._centroids = train_kmeans(self._vectors, nlist)
+        assignments = np.concatenate([
+            np.argmax(self._vectors[start:start + 65536] @ self._centroids.T, axis=1)
+            for start in range(0, self.count, 65536)
+        ])
+        self._set_assignments(assignments)
+        self.trained_count = self.count
+        logger.info(f"ANN index trained with {nlist} clusters over {self.count} vectors")
+
+    def add(self, tweet_ids, embeddings, texts=None, dates=None):
+        """
+        Append embeddings for tweets not yet in the index. `texts` and `dates` (ISO strings)
+        give the attributes used by filtered search. Embeddings longer than the index's
+        dimensions are truncated. Returns the number of rows added.
+        """
+        texts = texts if texts is not None else [None] * len(tweet_ids)
+        dates = dates if dates is not None else [None] * len(tweet_ids)
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            self._load()
+            rows = [row for row in zip(tweet_ids, embeddings, texts, dates)
+                    if row[1] is not None and len(row[1]) and row[0] not in self._id_set]
+            # Drop duplicate IDs within the batch itself
+            rows = list({row[0]: row for row in rows}.values())
+            if not rows:
+                return 0
+
+            new_vectors = truncate_rows([embedding for _, embedding, _, _ in rows], self.dimensions)
+            if self.dim is None:
+                self.dim = new_vectors.shape[1]
+            elif new_vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {new_vectors.shape[1]} does not match index dimension {self.dim}; "
+                                 "rebuild the index with `python -m data_pipeline.ann_index`")
+
+            # Write after the last committed row, discarding anything left by an interrupted add
+            new_brand_bits = np.array([self.brand_mask(brands_mentioned(text)) for _, _, text, _ in rows], dtype=np.uint32)
+            new_days = np.array([day_number(value) for _, _, _, value in rows], dtype=np.int32)
+            files = [(self.vectors_path, new_vectors, self.dim * 4),
+                     (self.brand_bits_path, new_brand_bits, 4),
+                     (self.days_path, new_days, 4)]
+            if self.quantization == "int8":
+                new_codes, new_scales = quantize_int8(new_vectors)
+                files += [(self.codes_path, new_codes, self.dim), (self.scales_path, new_scales, 4)]
+            for path, values, row_size in files:
+                with open(path, "r+b" if self.count and os.path.exists(path) else "wb") as f:
+                    f.seek(self.count * row_size)
+                    f.truncate()
+                    f.write(values.tobytes())
+            self.ids.extend(row[0] for row in rows)
+            self._id_set.update(row[0] for row in rows)
+            self._positions = None
+            self.count += len(rows)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            if self.has_attributes:
+                self._map_attributes()
+            if self.quantization == "int8":
+                self._map_codes()
+
+            if self.count >= self.min_train_size and (self._centroids is None or self.count >= 2 * self.trained_count):
+                # Clusters drift as the corpus grows, re-train once it has doubled
+                self._train()
+            elif self._centroids is not None:
+                new_assignments = np.argmax(new_vectors @ self._centroids.T, axis=1)
+                self._set_assignments(np.concatenate([self._assignments, new_assignments]))
+
+            self._save()
+            return len(rows)
+
+    def clear(self):
+        """Remove every vector from the index."""
+        with self._lock:
+            for path in (self.vectors_path, self.ids_path, self.ivf_path, self.meta_path,
+                         self.brand_bits_path, self.days_path, self.codes_path, self.scales_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._reset_state()
+            self._loaded_mtime = None
+
+    # --- Search ---------------------------------------------------------------
+
+    def _eligible(self, filters):
+        """Boolean mask of the rows satisfying `filters` (a RetrievalFilter), or None for no filtering."""
+        if not filters:
+            return None
+        if not self.has_attributes:
+            logger.warning("ANN index has no row attributes, ignoring filters; rebuild it with `python -m data_pipeline.ann_index`")
+            return None
+        eligible = np.ones(self.count, dtype=bool)
+        if filters.since:
+            eligible &= self._days >= day_number(filters.since)
+        if filters.until:
+            eligible &= (self._days <= day_number(filters.until)) & (self._days > 0)
+        if filters.brands:
+            eligible &= (self._brand_bits & np.uint32(self.brand_mask(filters.brands))) != 0
+        return eligible
+
+    def search(self, embedding, top_k=100, filters=None):
+        """
+        Return up to `top_k` (tweet_id, cosine similarity) pairs, most similar first,
+        among the rows matching `filters` (a RetrievalFilter) when given.
+        """
+        if embedding is None or not len(embedding):
+            return []
+        with self._lock:
+            self._load()
+            if not self.count:
+                return []
+            vectors, codes, scales, centroids = self._vectors, self._codes, self._scales, self._centroids
+            list_order, list_offsets = self._list_order, self._list_offsets
+            ids = self.ids
+            eligible = self._eligible(filters)
+            query = truncate_rows([embedding], self.dim)[0]
+
+        if eligible is not None and (centroids is None or eligible.sum() <= ANN_FILTER_EXACT_MAX):
+            # Small eligible subset: exact scan of just those rows
+            candidates = np.flatnonzero(eligible)
+        elif eligible is not None:
+            # Probe clusters closest-first until nprobe are scanned and top_k eligible rows are found
+            found, candidate_lists = 0, []
+            for probed, cluster in enumerate(np.argsort(centroids @ query)[::-1], 1):
+                members = list_order[list_offsets[cluster]:list_offsets[cluster + 1]]
+                members = members[eligible[members]]
+                candidate_lists.append(members)
+                found += len(members)
+                if probed >= self.nprobe and found >= top_k:
+                    break
+            candidates = np.sort(np.concatenate(candidate_lists))
+        elif centroids is None:
+            candidates = None
+        else:
+            # Scan only the rows of the closest clusters
+            nprobe = min(self.nprobe, len(centroids))
+            probe = np.argpartition(centroids @ query, -nprobe)[-nprobe:]
+            candidates = np.sort(np.concatenate([
+                list_order[list_offsets[cluster]:list_offsets[cluster + 1]] for cluster in probe
+            ]))
+
+        if candidates is not None and not len(candidates):
+            return []
+        if codes is not None:
+            # Rank on the int8 codes, then re-score only the shortlist with the float vectors
+            shortlist = best_positions(int8_scores(codes, scales, candidates, query), top_k * self.rescore_factor)
+            candidates = np.sort(shortlist if candidates is None else candidates[shortlist])
+        scores = np.asarray((vectors if candidates is None else vectors[candidates]) @ query)
+        best = best_positions(scores, top_k)
+        rows = best if candidates is None else candidates[best]
+        return [(ids[row], float(scores[i])) for row, i in zip(rows, best)]
+
+    def vectors_for(self, tweet_ids):
+        """{tweet_id: unit-length float32 vector} for the given tweets that are in the index."""
+        with self._lock:
+            self._load()
+            if self._positions is None:
+                self._positions = {tweet_id: row for row, tweet_id in enumerate(self.ids)}
+            rows = {tweet_id: self._positions[tweet_id] for tweet_id in tweet_ids if tweet_id in self._positions}
+            vectors = self._vectors
+        return {tweet_id: np.array(vectors[row]) for tweet_id, row in rows.items()}
+
+    # --- Neo4j sync -----------------------------------------------------------
+
+    @traced("ann_index.sync")
+    def sync_from_neo4j(self, neo4j_driver, batch_size=5000):
+        """
+        Add embeddings of tweets loaded into Neo4j since the last sync (every tweet on the
+        first sync, or for an index from before the `loaded_at` watermark).
+        """
+        with self._lock:
+            self._load()
+            since = self.synced_until
+        # >= rather than >: tweets committed in the same millisecond as the last synced one;
+        # those already in the index are skipped by `add`
+        query = f"""
+        // query: ann_index.sync
+        MATCH (t:Tweet)
+        WHERE {"t.loaded_at >= $since AND " if since is not None else ""}t.embedding IS NOT NULL
+        RETURN t.tweet_id AS tweet_id, t.embedding AS embedding, t.text AS text, t.date AS date,
+               t.loaded_at AS loaded_at
+        """
+        added, watermark = 0, since or 0
+        with neo4j_driver.session(database=NEO4J_DATABASE) as session:
+            session.run("CREATE INDEX tweet_loaded_at IF NOT EXISTS FOR (t:Tweet) ON (t.loaded_at)")
+            batch = []
+            for record in session.run(query, since=since):
+                batch.append((record["tweet_id"], record["embedding"], record["text"], record["date"]))
+                watermark = max(watermark, record["loaded_at"] or 0)
+                if len(batch) >= batch_size:
+                    added += self.add(*map(list, zip(*batch)))
+                    batch = []
+            if batch:
+                added += self.add(*map(list, zip(*batch)))
+        with self._lock:
+            self._load()
+            if self.count and watermark != self.synced_until:
+                self.synced_until = watermark
+                self._save()
+        print(f"✅ ANN index synced {added} new embedding(s) ({self.count} total).")
+        return added
+
+    def rebuild_from_neo4j(self, neo4j_driver):
+        """Drop the index and rebuild it from every tweet embedding in Neo4j."""
+        self.clear()
+        return self.sync_from_neo4j(neo4j_driver)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_ann_index():
+    """Return the process-wide ANN index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TweetANNIndex()
+        return _index
+
+if __name__ == "__main__":
+    from connectors.neo4j_connector import get_driver
+    driver = get_driver()
+    try:
+        get_ann_index().rebuild_from_neo4j(driver)
+    finally:
+        driver.close()
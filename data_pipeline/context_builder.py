@@ -0,0 +1,91 @@
+# context_builder.py
+"""
+This module builds the tweet context of the QA prompts under a token budget.
+Retrieved tweets are grouped into near-duplicate clusters by MinHash similarity (see
+`data_pipeline.near_duplicates`). Each cluster is written once, using its
+highest-engagement variant, with a count of the similar tweets it stands for. Clusters
+are packed in relevance order until the budget is spent.
+`fallback_answer` turns the same tweets into a template answer for when the LLM cannot
+answer within its time budget.
+"""
+
+import logging
+from collections import Counter
+
+from data_pipeline.near_duplicates import minhash_signature, estimate_jaccard
+from config import QA_CONTEXT_TOKEN_BUDGET, QA_CONTEXT_DUPLICATE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_ANSWER_INTRO = "I couldn't write a full answer in time, so here is what the most relevant tweets say"
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoding = None
+
+def count_tokens(text):
+    """Count prompt tokens with tiktoken when available, otherwise estimate ~4 characters per token."""
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+def engagement(result):
+    return (result.get("like_count") or 0) + (result.get("retweet_count") or 0)
+
+def collapse_near_duplicates(results, threshold=QA_CONTEXT_DUPLICATE_THRESHOLD):
+    """
+    Group results (in relevance order) whose estimated Jaccard similarity to a cluster's
+    first member is at least `threshold`. Returns [(representative, cluster_size)] in order
+    of each cluster's best-ranked member; the representative is the highest-engagement tweet.
+    """
+    clusters = []  # [signature, members]
+    for result in results:
+        signature = minhash_signature(result.get("tweet", ""))
+        for cluster in clusters:
+            if estimate_jaccard(cluster[0], signature) >= threshold:
+                cluster[1].append(result)
+                break
+        else:
+            clusters.append([signature, [result]])
+    return [(max(members, key=engagement), len(members)) for _, members in clusters]
+
+def format_tweet(result, count=1):
+    line = f"- @{result.get('user', 'Anonymous')}: {result.get('tweet', '')}"
+    if count > 1:
+        line += f" ({count} similar tweets)"
+    return line
+
+def build_context(results, token_budget=QA_CONTEXT_TOKEN_BUDGET, max_tweets=15):
+    """Return the prompt context for the retrieved tweets and the number of tokens it uses."""
+    lines = []
+    used = 0
+    for representative, count in collapse_near_duplicates(results):
+        if len(lines) >= max_tweets:
+            break
+        line = format_tweet(representative, count)
+        tokens = count_tokens(line) + 1  # Newline
+        if used + tokens > token_budget:
+            continue  # Lower-ranked but shorter clusters may still fit
+        lines.append(line)
+        used += tokens
+    logger.info(f"Prompt context: {len(lines)} tweet cluster(s) from {len(results)} results, ~{used} tokens")
+    return "\n".join(lines), used
+
+def fallback_answer(results, max_tweets=3):
+    """Template answer from the retrieved tweets: their sentiment breakdown and the top clusters."""
+    sentiments = Counter(result.get("sentiment") for result in results if result.get("sentiment"))
+    breakdown = ", ".join(f"{count} {label.lower()}" for label, count in sentiments.most_common())
+    lines = [f"{FALLBACK_ANSWER_INTRO} ({len(results)} tweets{': ' + breakdown if breakdown else ''}):"]
+    lines += [format_tweet(representative, count)
+              for representative, count in collapse_near_duplicates(results)[:max_tweets]]
+    return "\n".join(lines)
@@ -0,0 +1,124 @@
+# conversation.py
+"""
+This module lets follow-up questions reuse the retrieval of the previous turn.
+A follow-up ("and what about their running shoes?") is usually answered by the same
+neighbourhood of tweets as the question before it, so each conversation (one Streamlit
+session) keeps that turn's candidate rows together with their embeddings. The next
+question is first re-ranked locally against them: cosine similarity to the new question
+embedding and keyword matches in the tweet text, merged with the same reciprocal-rank
+fusion as `hybrid_search`. The graph is only queried again when
+
+- fewer than QA_CONVERSATION_MIN_COVERAGE candidates reach QA_CONVERSATION_MIN_SIMILARITY,
+- the question names other brands or a wider time window than the candidate set was
+  retrieved for (fewer brands or a narrower window is applied to the candidates instead),
+- or the set has already answered QA_CONVERSATION_MAX_REUSES follow-ups.
+
+Each conversation has an `id`, which the apps send to the QA service so it can keep the
+candidates of a remote conversation between requests (`data_pipeline.qa_service`).
+Outcomes are counted in `qa_conversation_retrieval_total`.
+"""
+
+import logging
+import threading
+import uuid
+
+import numpy as np
+from data_pipeline.embedding_profile import truncate_rows
+from data_pipeline.retrieval import reciprocal_rank_fusion
+from data_pipeline.tracing import Counter, register_metric
+from config import QA_CONVERSATION_MIN_SIMILARITY, QA_CONVERSATION_MIN_COVERAGE, QA_CONVERSATION_MAX_REUSES
+
+logger = logging.getLogger(__name__)
+
+RETRIEVALS = register_metric(
+    Counter("qa_conversation_retrieval_total",
+            "Follow-up retrievals answered from the previous candidates (reused) or by a new graph query "
+            "(low_coverage, filters_changed, exhausted)."),
+    "outcome",
+)
+
+def filter_key(filters):
+    """Comparable form of a RetrievalFilter (or None)."""
+    return filters.to_params() if filters else None
+
+def keyword_hits(rows, keywords):
+    """(tweet_id, matched keyword count) for the rows whose text contains any of `keywords`, best first."""
+    hits = []
+    for row in rows:
+        text = (row.get("tweet") or "").lower()
+        score = sum(1 for keyword in keywords if keyword in text)
+        if score:
+            hits.append((row["tweet_id"], float(score)))
+    return sorted(hits, key=lambda hit: hit[1], reverse=True)
+
+class ConversationRetrieval:
+    """The retrieval candidates of a conversation's previous turn."""
+
+    def __init__(self, min_similarity=QA_CONVERSATION_MIN_SIMILARITY, min_coverage=QA_CONVERSATION_MIN_COVERAGE,
+                 max_reuses=QA_CONVERSATION_MAX_REUSES):
+        self.min_similarity = min_similarity
+        self.min_coverage = min_coverage
+        self.max_reuses = max_reuses
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget the candidates, e.g. when the chat history is cleared; starts a new conversation id."""
+        self.id = uuid.uuid4().hex
+        self._reset()
+
+    def _reset(self):
+        self._rows = []
+        self._vectors = None  # Unit-length float32 matrix, one row per candidate
+        self._filters = None
+        self.reuses = 0
+
+    def remember(self, results, embeddings, filters=None):
+        """
+        Keep `results` (hybrid_search rows) as the candidates for the next turn. `embeddings`
+        maps tweet_id to stored embedding; rows without one are dropped.
+        """
+        rows = [row for row in results if len(embeddings.get(row["tweet_id"], ())) > 0]
+        with self._lock:
+            self._reset()
+            if not rows:
+                return
+            dim = min(len(embeddings[row["tweet_id"]]) for row in rows)
+            self._rows = rows
+            self._vectors = truncate_rows([embeddings[row["tweet_id"]] for row in rows], dim)
+            self._filters = filters or None
+
+    def rerank(self, embedding, keywords, filters=None, limit=50):
+        """
+        The candidates re-ranked for a follow-up question, or None when they do not cover it
+        and the graph has to be queried.
+        """
+        with self._lock:
+            if not embedding or not self._rows:
+                return None
+            if filters and not filters.within(self._filters):
+                RETRIEVALS.inc("filters_changed")
+                return None
+            if self.reuses >= self.max_reuses:
+                RETRIEVALS.inc("exhausted")
+                return None
+            rows, vectors = self._rows, self._vectors
+            if filters:
+                # A narrower follow-up ("and just last week?") keeps the candidates it still admits
+                keep = [i for i, row in enumerate(rows) if filters.matches(row)]
+                rows, vectors = [rows[i] for i in keep], vectors[keep]
+            query = truncate_rows([embedding], vectors.shape[1])[0]
+            scores = vectors @ query
+            covered = int(np.count_nonzero(scores >= self.min_similarity))
+            if covered < self.min_coverage:
+                logger.info(f"Previous candidates cover the follow-up with {covered} tweet(s), querying the graph")
+                RETRIEVALS.inc("low_coverage")
+                return None
+            self.reuses += 1
+
+        order = np.argsort(-scores)
+        vector_hits = [(rows[i]["tweet_id"], float(scores[i])) for i in order[:covered]]
+        hits = reciprocal_rank_fusion(vector_hits, keyword_hits(rows, keywords), limit=limit)
+        by_id = {row["tweet_id"]: row for row in rows}
+        RETRIEVALS.inc("reused")
+        return [{**by_id[hit["tweet_id"]], **hit} for hit in hits]
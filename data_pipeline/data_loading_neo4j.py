@@ -5,30 +5,43 @@ import json
 from neo4j.exceptions import ServiceUnavailable, Neo4jError
 
 # Import connection functions from your connector files
-from connectors.snowflake_connector import get_connection as get_snowflake_connection
+from connectors.snowflake_connector import get_pool as get_snowflake_pool, tag_queries
 from connectors.neo4j_connector import get_driver as get_neo4j_driver
+from data_pipeline.enriched_tweets import ensure_dup_cluster_column
+from data_pipeline.retrieval import ensure_fulltext_index, ensure_filter_indexes
+from data_pipeline.embedding_profile import truncate_embedding
+from data_pipeline.retrieval_filters import brands_mentioned
+from data_pipeline.tracing import span, traced
 from config import NEO4J_DATABASE
 
+@traced("load_tweets_data_into_neo4j")
+@tag_queries("load_neo4j")
 def load_tweets_data_into_neo4j():
     try:
         # Establish connections using your configured connectors
-        snowflake_connection = get_snowflake_connection()
+        snowflake_pool = get_snowflake_pool()
+        snowflake_connection = snowflake_pool.acquire()
         neo4j_driver = get_neo4j_driver()
+        ensure_dup_cluster_column(snowflake_connection)  # FINAL_TWEETS written before near-duplicate detection lack it
         
         # Query data from the Final_Tweets table in Snowflake
         snowflake_cursor = snowflake_connection.cursor(snowflake.connector.DictCursor)
-        snowflake_cursor.execute(""" SELECT 
-        TWEET_ID, CREATED_AT, DAY, DATE, TIME, TEXT, USER_ID, SCREEN_NAME, NAME,
-        TWEETS_COUNT, FOLLOWERS_COUNT, RETWEET_COUNT, LIKE_COUNT, HASHTAGS, MENTIONS, URLS,
-        LOCATION, SENTIMENT, TOPIC, EMBEDDING FROM FINAL_TWEETS
-        """ )
-        tweet_rows = snowflake_cursor.fetchall()
+        with span("snowflake.select_final_tweets"):
+            snowflake_cursor.execute(""" SELECT 
+            TWEET_ID, CREATED_AT, DAY, DATE, TIME, TEXT, USER_ID, SCREEN_NAME, NAME,
+            TWEETS_COUNT, FOLLOWERS_COUNT, RETWEET_COUNT, LIKE_COUNT, HASHTAGS, MENTIONS, URLS,
+            LOCATION, SENTIMENT, TOPIC, EMBEDDING, DUP_CLUSTER_ID FROM FINAL_TWEETS
+            """ )
+            tweet_rows = snowflake_cursor.fetchall()
         print(f"Fetched {len(tweet_rows)} rows from the Final_Tweets table in Snowflake.")
 
         # -- Early Duplicate Check: Fetch existing tweet IDs from Neo4j --
         with neo4j_driver.session(database=NEO4J_DATABASE) as neo4j_session:
-            result = neo4j_session.run("MATCH (t:Tweet) RETURN t.tweet_id AS tweet_id")
-            existing_tweet_ids = {record["tweet_id"] for record in result}
+            ensure_fulltext_index(neo4j_session)  # Keyword search index used by the QA systems, even with no new tweets
+            ensure_filter_indexes(neo4j_session)  # Date index for filtered retrieval
+            with span("neo4j.existing_tweet_ids"):
+                result = neo4j_session.run("MATCH (t:Tweet) RETURN t.tweet_id AS tweet_id")
+                existing_tweet_ids = {record["tweet_id"] for record in result}
         
         original_count = len(tweet_rows)
         tweet_rows = [row for row in tweet_rows if row["TWEET_ID"] not in existing_tweet_ids]
@@ -66,10 +79,13 @@ def load_tweets_data_into_neo4j():
                     # If it's a VARIANT type from Snowflake, it might be already parsed
                     else:
                         embedding = tweet_row['EMBEDDING']
+                    # The vector index expects the profile's dimensions
+                    embedding = truncate_embedding(embedding)
                 except Exception as e:
                     print(f"Error processing embedding for tweet {tweet_row['TWEET_ID']}: {str(e)}")
             
             cypher_query = """
+            // query: loader.merge_tweet
             // Merge User node (uniquely identified by user_id)
             MERGE (user:User {user_id: $user_id})
               ON CREATE SET user.screen_name = $user_screen_name,
@@ -85,7 +101,10 @@ def load_tweets_data_into_neo4j():
                             tweet.date = $tweet_date,
                             tweet.time = $tweet_time,
                             tweet.retweet_count = $tweet_retweet_count,
-                            tweet.like_count = $tweet_like_count
+                            tweet.like_count = $tweet_like_count,
+                            tweet.dup_cluster_id = $tweet_dup_cluster_id,
+                            tweet.brands = $tweet_brands,
+                            tweet.loaded_at = timestamp()
             
             // Create relationship between User and Tweet
             MERGE (user)-[:POSTED]->(tweet)
@@ -139,6 +158,8 @@ def load_tweets_data_into_neo4j():
                    tweet_time=tweet_row['TIME'],
                    tweet_retweet_count=tweet_row['RETWEET_COUNT'],
                    tweet_like_count=tweet_row['LIKE_COUNT'],
+                   tweet_dup_cluster_id=tweet_row['DUP_CLUSTER_ID'],
+                   tweet_brands=brands_mentioned(tweet_row['TEXT']),
                    hashtag_list=hashtag_list,
                    url_list=url_list,
                    tweet_location=tweet_row['LOCATION'],
@@ -151,6 +172,7 @@ def load_tweets_data_into_neo4j():
                 try:
                     # Use db.create.setNodeVectorProperty to set the embedding
                     tx.run("""
+                    // query: loader.set_embedding
                     MATCH (t:Tweet {tweet_id: $tweet_id})
                     CALL db.create.setNodeVectorProperty(t, 'embedding', $EMBEDDING) 
                     """, tweet_id=tweet_row['TWEET_ID'], EMBEDDING=embedding)
@@ -160,8 +182,9 @@ def load_tweets_data_into_neo4j():
         
         # Write each tweet row into Neo4j using a session
         with neo4j_driver.session(database=NEO4J_DATABASE) as neo4j_session:
-            for tweet_row in tweet_rows:
-                neo4j_session.execute_write(merge_tweet_data, tweet_row)
+            with span("neo4j.merge_tweets", rows=len(tweet_rows)):
+                for tweet_row in tweet_rows:
+                    neo4j_session.execute_write(merge_tweet_data, tweet_row)
             print(f"Loaded {len(tweet_rows)} tweets into Neo4j.")
         
         print("Data loading complete. Re-running this script will not create duplicates.")
@@ -173,7 +196,7 @@ def load_tweets_data_into_neo4j():
     finally:
         try:
             snowflake_cursor.close()
-            snowflake_connection.close()
+            snowflake_pool.release(snowflake_connection)
             neo4j_driver.close()
         except Exception as close_ex:
             print("Error closing connections:", close_ex)
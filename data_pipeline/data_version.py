@@ -0,0 +1,30 @@
+# data_version.py
+"""
+This module tracks the data version token shared by the pipeline and the apps.
+The pipeline bumps the token after each load, and caches tag their entries with it,
+so cached results are invalidated by new data instead of by a timer.
+"""
+
+import json
+import os
+import time
+from config import DATA_VERSION_PATH
+
+def get_data_version() -> str:
+    """Return the current data version token ("0" before the first load)."""
+    try:
+        with open(DATA_VERSION_PATH) as f:
+            return str(json.load(f).get("version", 0))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return "0"
+
+def bump_data_version() -> str:
+    """Advance the data version token; call after new tweets are loaded."""
+    version = int(get_data_version()) + 1
+    os.makedirs(os.path.dirname(DATA_VERSION_PATH) or ".", exist_ok=True)
+    tmp_path = DATA_VERSION_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": version, "updated_at": time.time()}, f)
+    os.replace(tmp_path, DATA_VERSION_PATH)
+    print(f"✅ Data version bumped to {version}.")
+    return str(version)
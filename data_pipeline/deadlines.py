@@ -0,0 +1,109 @@
+# deadlines.py
+"""
+This module provides the time budgets that keep QA latency bounded.
+A `Deadline` is created per question (QA_DEADLINE) and handed down to each stage, which
+takes a share of what is left with `deadline.child(seconds)`: the OpenAI gateway caps
+request timeouts, retries and waits for an in-flight slot at the remaining time, and the
+QA pipeline falls back when a stage runs out (keyword-only retrieval without an embedding,
+a template answer without a completion). Fallbacks are counted in `qa_fallbacks_total`.
+
+`hedged(request, ...)` runs a request and, if it has not answered after a delay (the
+observed p95 of that request, see `LatencyTracker`), fires a second identical one and
+returns whichever answers first.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+from data_pipeline.tracing import Counter, register_metric
+
+FALLBACKS = register_metric(
+    Counter("qa_fallbacks_total", "QA stages that ran out of time and fell back (embedding, answer, followups)."),
+    "stage",
+)
+
+class DeadlineExceeded(TimeoutError):
+    """A stage did not finish within its time budget."""
+
+class Deadline:
+    """A point in time by which work must finish; `Deadline(None)` never expires."""
+
+    def __init__(self, seconds=None):
+        self.expires_at = math.inf if seconds is None else time.monotonic() + seconds
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+    def remaining(self):
+        """Seconds left (0 once expired, inf without a deadline)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def child(self, seconds):
+        """A deadline `seconds` from now, but no later than this one."""
+        child = Deadline(seconds)
+        child.expires_at = min(child.expires_at, self.expires_at)
+        return child
+
+    def timeout(self, cap=None):
+        """Remaining seconds capped at `cap`, for APIs that take a timeout; None means no limit."""
+        remaining = self.remaining()
+        if cap is not None:
+            remaining = min(remaining, cap)
+        return None if remaining == math.inf else remaining
+
+    def check(self, what="operation"):
+        if self.expired():
+            raise DeadlineExceeded(f"{what} exceeded its deadline")
+
+class LatencyTracker:
+    """Rolling window of request latencies, for hedge delays."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q, default):
+        """The q-th percentile of the window, or `default` until min_samples are recorded."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return default
+            return float(np.percentile(self._samples, q))
+
+def hedged(request, hedge_after, deadline, executor):
+    """
+    Run `request()` on `executor` and return (result, whether the hedge was fired). If it has
+    not completed after `hedge_after` seconds a second copy is submitted and the first
+    successful result wins. Raises DeadlineExceeded when none completes before `deadline`
+    (including a last copy that failed once the deadline had passed), or the error of the
+    last copy to fail.
+    """
+    futures = {executor.submit(request)}
+    hedge_at = time.monotonic() + hedge_after
+    fired = False
+    while True:
+        deadline.check("request")
+        timeout = deadline.timeout() if fired else min(deadline.remaining(), max(0.0, hedge_at - time.monotonic()))
+        done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return future.result(), fired
+            if not futures:
+                if deadline.expired() and not isinstance(error, DeadlineExceeded):
+                    raise DeadlineExceeded(f"request exceeded its deadline ({type(error).__name__})") from error
+                raise error
+        if not fired and time.monotonic() >= hedge_at:
+            fired = True
+            futures.add(executor.submit(request))
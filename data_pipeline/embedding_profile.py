@@ -0,0 +1,70 @@
+# embedding_profile.py
+"""
+This module defines the embedding profile shared by ingestion, the Neo4j loader, retrieval
+and the QA systems: which OpenAI model embeds text, how many dimensions are kept, and how
+embeddings are written to Neo4j (vector index) and Snowflake (JSON VARIANT).
+
+text-embedding-3 models are trained so that the first N components of an embedding,
+re-normalized, are themselves a good N-dimensional embedding; requesting `dimensions=N`
+from the API returns exactly that. Existing full-size embeddings can therefore be moved to
+a shorter profile by truncation, without calling the API again
+(`python -m testing.migrate_embeddings`), and the recall cost of a profile can be measured
+offline against the full-size vectors (`python -m testing.embedding_recall_report`).
+
+int8 quantization of the local ANN index is configured separately (ANN_QUANTIZATION,
+see `data_pipeline.ann_index`).
+"""
+
+import json
+
+import numpy as np
+from config import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_JSON_DECIMALS
+
+# Full embedding size of each supported model
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+VECTOR_INDEX_NAME = "tweet_embeddings"
+
+def embedding_request_params(model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+    """Keyword arguments for an OpenAI embeddings request under the profile."""
+    params = {"model": model}
+    if dimensions < NATIVE_DIMENSIONS.get(model, dimensions):
+        params["dimensions"] = dimensions
+    return params
+
+def truncate_rows(matrix, dimensions=EMBEDDING_DIMENSIONS):
+    """Keep the first `dimensions` components of each row and re-normalize to unit length."""
+    matrix = np.asarray(matrix, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def truncate_embedding(embedding, dimensions=EMBEDDING_DIMENSIONS):
+    """
+    An embedding shortened to `dimensions` (a list of floats). Embeddings that are already
+    that size or shorter, and empty ones, are returned unchanged.
+    """
+    if embedding is None or len(embedding) <= dimensions:
+        return embedding
+    return truncate_rows([embedding], dimensions)[0].tolist()
+
+def embedding_json(embedding, decimals=EMBEDDING_JSON_DECIMALS):
+    """Compact JSON for the Snowflake EMBEDDING column (rounded components)."""
+    return json.dumps([round(float(value), decimals) for value in embedding], separators=(",", ":"))
+
+def vector_index_statement(dimensions=EMBEDDING_DIMENSIONS):
+    """CREATE statement for the Neo4j vector index on Tweet.embedding."""
+    return f"""
+    CREATE VECTOR INDEX {VECTOR_INDEX_NAME} IF NOT EXISTS
+    FOR (t:Tweet)
+    ON (t.embedding)
+    OPTIONS {{
+        indexConfig: {{
+            `vector.dimensions`: {int(dimensions)},
+            `vector.similarity_function`: 'cosine'
+        }}
+    }}
+    """
@@ -1,35 +1,105 @@
 import pandas as pd
-import torch
 import re
-import openai
-import configparser
 import json
 from tqdm import tqdm
 from snowflake.connector import connect
 from snowflake.connector.cursor import DictCursor
-from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
-from connectors.snowflake_connector import get_connection
+from connectors.snowflake_connector import get_pool, tag_queries
+from data_pipeline.rollup import update_dashboard_rollup
+from data_pipeline.near_duplicates import get_dedup_index
+from data_pipeline.embedding_profile import embedding_json, truncate_embedding
+from data_pipeline.llm_gateway import get_llm_gateway
+from data_pipeline.tracing import span, traced
+from config import DEDUP_ENABLED
 
-# Read config file - add this where you inialize other components
-config = configparser.ConfigParser()
-config.read("config.ini")
+# Enrichment outputs copied from a cluster representative onto its near-duplicates
+ANNOTATION_COLUMNS = ["SENTIMENT", "TOPIC", "EMBEDDING"]
 
-# Set OpenAI API key - read from config.ini
-openai.api_key = config.get("openai", "api_key")
+def ensure_dup_cluster_column(conn):
+    """Add the DUP_CLUSTER_ID column to FINAL_TWEETS if it is missing."""
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE FINAL_TWEETS ADD COLUMN IF NOT EXISTS DUP_CLUSTER_ID STRING")
+    cursor.close()
+
+def fetch_cluster_annotations(conn, cluster_ids):
+    """Annotations of cluster representatives enriched in earlier runs, keyed by TWEET_ID."""
+    if not cluster_ids:
+        return {}
+    cursor = conn.cursor(DictCursor)
+    cursor.execute("""
+        SELECT TWEET_ID, SENTIMENT, TOPIC, EMBEDDING FROM FINAL_TWEETS
+        WHERE TWEET_ID IN (SELECT VALUE::STRING FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))
+    """, (json.dumps(sorted(cluster_ids)),))
+    annotations = {}
+    for row in cursor.fetchall():
+        embedding = row["EMBEDDING"]
+        if isinstance(embedding, str):
+            embedding = json.loads(embedding)
+        annotations[str(row["TWEET_ID"])] = {
+            "SENTIMENT": row["SENTIMENT"],
+            "TOPIC": row["TOPIC"],
+            "EMBEDDING": truncate_embedding(embedding or []),  # Stored before a shorter profile was chosen
+        }
+    cursor.close()
+    return annotations
+
+@traced("enrich.dedup")
+def cluster_near_duplicates(df, conn):
+    """
+    Assign DUP_CLUSTER_ID to every tweet and return (needs_enrichment mask, inherited annotations).
+    Only cluster representatives are enriched; copies reuse their representative's annotations.
+    """
+    tweet_ids = df["TWEET_ID"].astype(str)
+    if not DEDUP_ENABLED:
+        df["DUP_CLUSTER_ID"] = tweet_ids
+        return pd.Series(True, index=df.index), {}
+
+    dedup_index = get_dedup_index()
+    df["DUP_CLUSTER_ID"] = [dedup_index.assign(tweet_id, text) for tweet_id, text in zip(tweet_ids, df["TEXT"])]
+
+    # Representatives from earlier runs must already be in FINAL_TWEETS to copy from
+    batch_ids = set(tweet_ids)
+    earlier_clusters = set(df["DUP_CLUSTER_ID"]) - batch_ids
+    inherited = fetch_cluster_annotations(conn, earlier_clusters)
+    for i, (tweet_id, cluster_id) in enumerate(zip(tweet_ids, df["DUP_CLUSTER_ID"])):
+        if cluster_id not in batch_ids and cluster_id not in inherited:
+            dedup_index.detach(tweet_id)
+            df.iat[i, df.columns.get_loc("DUP_CLUSTER_ID")] = tweet_id
 
+    needs_enrichment = df["DUP_CLUSTER_ID"] == tweet_ids
+    print(f"🧬 {(~needs_enrichment).sum()} of {len(df)} tweet(s) are near-duplicates and reuse their cluster's annotations.")
+    return needs_enrichment, inherited
+
+def copy_cluster_annotations(df, needs_enrichment, inherited):
+    """Fill SENTIMENT, TOPIC and EMBEDDING of near-duplicates from their cluster representative."""
+    annotations = dict(inherited)
+    for _, row in df[needs_enrichment].iterrows():
+        annotations[row["DUP_CLUSTER_ID"]] = {column: row[column] for column in ANNOTATION_COLUMNS}
+    for column in ANNOTATION_COLUMNS:
+        df[column] = [
+            value if enriched else annotations[cluster_id][column]
+            for value, enriched, cluster_id in zip(df[column], needs_enrichment, df["DUP_CLUSTER_ID"])
+        ]
+
+@traced("process_tweets")
+@tag_queries("process_tweets")
 def process_tweets():
     """Fetch, clean, analyze, and store tweets in Snowflake."""
-    conn = get_connection()
+    pool = get_pool()
+    conn = pool.acquire()
+    ensure_dup_cluster_column(conn)  # Before the early exit: the Neo4j loader selects it
     query = "SELECT * FROM CLEAN_TWEETS ORDER BY CREATED_AT DESC "
     cursor = conn.cursor()
-    cursor.execute(query)
-    df = pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+    with span("snowflake.select_clean_tweets"):
+        cursor.execute(query)
+        df = pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
 
     # -- Early duplicate check: Filter out tweets already in FINAL_TWEETS --
     check_query = "SELECT TWEET_ID FROM FINAL_TWEETS"
     cursor_existing = conn.cursor()
-    cursor_existing.execute(check_query)
-    existing_ids = set(row[0] for row in cursor_existing.fetchall())
+    with span("snowflake.select_final_tweet_ids"):
+        cursor_existing.execute(check_query)
+        existing_ids = set(row[0] for row in cursor_existing.fetchall())
     cursor_existing.close()
 
     initial_count = len(df)
@@ -39,9 +109,14 @@ def process_tweets():
 
     if df.empty:
         print("No new tweets to process. Exiting.")
-        conn.close()
+        pool.release(conn)
         exit()
 
+    # Heavy ML dependencies are only loaded once there is something to enrich
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    llm = get_llm_gateway()  # Creates the OpenAI client on first use, like the imports above
+
     # **2️⃣ Set Up GPU (MPS) for Apple Silicon**
     device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
     print(f"Using device: {device}")
@@ -60,6 +135,9 @@ def process_tweets():
     df["DATE"] = df["CREATED_AT"].dt.date
     df["TIME"] = df["CREATED_AT"].dt.strftime('%H:%M:%S')
 
+    # **4️⃣b Cluster Near-Duplicates (MinHash LSH) so copies skip enrichment**
+    needs_enrichment, inherited = cluster_near_duplicates(df, conn)
+
     # **5️⃣ Load RoBERTa Sentiment Analysis Model**
     roberta_model_name = "cardiffnlp/twitter-roberta-base-sentiment"
     roberta_tokenizer = AutoTokenizer.from_pretrained(roberta_model_name)
@@ -78,7 +156,8 @@ def process_tweets():
         return sentiment
 
     tqdm.pandas(desc="Applying Sentiment Analysis")
-    df["SENTIMENT"] = df["TEXT"].progress_apply(get_twitter_roberta_sentiment)
+    with span("enrich.sentiment", rows=int(needs_enrichment.sum())):
+        df["SENTIMENT"] = df.loc[needs_enrichment, "TEXT"].progress_apply(get_twitter_roberta_sentiment).reindex(df.index)
 
     # **7️⃣ Load Zero-Shot Classification Model**
     classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli", device=0 if device.type == "mps" else -1)
@@ -98,21 +177,25 @@ def process_tweets():
         return result["labels"][0]
 
     tqdm.pandas(desc="Classifying Topics")
-    df["TOPIC"] = df["TEXT"].progress_apply(zero_shot_classification)
+    with span("enrich.topic", rows=int(needs_enrichment.sum())):
+        df["TOPIC"] = df.loc[needs_enrichment, "TEXT"].progress_apply(zero_shot_classification).reindex(df.index)
 
     # **8️⃣ Generate Embeddings (store in memory, update later)**
     def get_embedding(text):
         try:
             if not isinstance(text, str) or text.strip() == "":
                 return []
-            response = openai.Embedding.create(input=text, model="text-embedding-3-small")
-            return response['data'][0]['embedding']
+            return llm.embed(text)
         except Exception as e:
             print(f"Embedding error: {str(e)}")
             return []
 
     tqdm.pandas(desc="Generating Embeddings")
-    df["EMBEDDING"] = df["TEXT"].progress_apply(get_embedding)
+    with span("enrich.embedding", rows=int(needs_enrichment.sum())):
+        df["EMBEDDING"] = df.loc[needs_enrichment, "TEXT"].progress_apply(get_embedding).reindex(df.index)
+
+    # Near-duplicates take their representative's sentiment, topic and embedding
+    copy_cluster_annotations(df, needs_enrichment, inherited)
 
     # **9️⃣ Format Data for Insertion**
     df["CREATED_AT"] = df["CREATED_AT"].dt.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3]
@@ -129,38 +212,47 @@ def process_tweets():
     INSERT INTO FINAL_TWEETS (
         TWEET_ID, CREATED_AT, DAY, DATE, TIME, TEXT, USER_ID, SCREEN_NAME, NAME,
         TWEETS_COUNT, FOLLOWERS_COUNT, RETWEET_COUNT, LIKE_COUNT, HASHTAGS, MENTIONS, URLS,
-        LOCATION, SENTIMENT, TOPIC
+        LOCATION, SENTIMENT, TOPIC, DUP_CLUSTER_ID
     ) VALUES (
         %(TWEET_ID)s, %(CREATED_AT)s, %(DAY)s, %(DATE)s, %(TIME)s, %(TEXT)s, %(USER_ID)s, %(SCREEN_NAME)s, %(NAME)s,
         %(TWEETS_COUNT)s, %(FOLLOWERS_COUNT)s, %(RETWEET_COUNT)s, %(LIKE_COUNT)s, %(HASHTAGS)s, %(MENTIONS)s, %(URLS)s,
-        %(LOCATION)s, %(SENTIMENT)s, %(TOPIC)s
+        %(LOCATION)s, %(SENTIMENT)s, %(TOPIC)s, %(DUP_CLUSTER_ID)s
     )
     """
 
     columns = [
         "TWEET_ID", "CREATED_AT", "DAY", "DATE", "TIME", "TEXT", "USER_ID", "SCREEN_NAME", "NAME",
         "TWEETS_COUNT", "FOLLOWERS_COUNT", "RETWEET_COUNT", "LIKE_COUNT", "HASHTAGS", "MENTIONS", "URLS",
-        "LOCATION", "SENTIMENT", "TOPIC"
+        "LOCATION", "SENTIMENT", "TOPIC", "DUP_CLUSTER_ID"
     ]
 
     data_to_insert = df[columns].to_dict(orient="records")
 
     cursor = conn.cursor(DictCursor)
-    for i, row in enumerate(data_to_insert):
-        cursor.execute(insert_query, row)
-        if i % 100 == 0:
-            conn.commit()
-    conn.commit()
+    with span("snowflake.insert_final_tweets", rows=len(data_to_insert)):
+        for i, row in enumerate(data_to_insert):
+            cursor.execute(insert_query, row)
+            if i % 100 == 0:
+                conn.commit()
+        conn.commit()
     print("✅ Data inserted without embeddings.")
 
+    # Persist the new signatures only once their tweets are in FINAL_TWEETS
+    if DEDUP_ENABLED:
+        get_dedup_index().save()
+
+    # Fold only the newly inserted rows into the dashboard rollup
+    update_dashboard_rollup(conn, df["TWEET_ID"].tolist())
+
     # ✨ NEW: Update embeddings separately
     update_embeddings_variant(df, conn)
 
     cursor.close()
-    conn.close()
+    pool.release(conn)
 
 #  NEW FUNCTION: Update embeddings separately
 
+@traced("snowflake.update_embeddings")
 def update_embeddings_variant(df, conn):
     print("🔁 Updating EMBEDDING column in FINAL_TWEETS...")
     cursor = conn.cursor()
@@ -176,7 +268,7 @@ def update_embeddings_variant(df, conn):
                 SET EMBEDDING = PARSE_JSON(%s)
                 WHERE TWEET_ID = %s AND EMBEDDING IS NULL
                 """,
-                (json.dumps(embedding), tweet_id)
+                (embedding_json(embedding), tweet_id)
             )
             if i % 100 == 0:
                 conn.commit()
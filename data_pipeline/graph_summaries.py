@@ -0,0 +1,435 @@
+# graph_summaries.py
+"""
+This module precomputes summaries of the tweet graph for aggregate questions.
+Questions like "overall sentiment toward Adidas this month" are about every matching tweet,
+not the handful a retrieval returns, so each brand, Topic and Hashtag gets a `Summary` node
+per month and one for all time, holding its tweet count, engagement, sentiment mix, top
+topics / hashtags and links to its representative (highest-engagement) tweets:
+
+    (:Summary {kind, name, bucket})-[:SUMMARIZES]->(:Topic | :Hashtag)
+    (:Summary {bucket: "2025-03"})-[:PART_OF]->(:Summary {bucket: "all"})
+    (:Summary)-[:REPRESENTED_BY {rank}]->(:Tweet)
+
+`refresh_graph_summaries` runs after each load and only reads the tweets loaded since the
+last run, through the index on Tweet.loaded_at (set by the loader) from the watermark kept on
+`(:SummaryState {id: "refresh"}).synced_until`. Tweets are also flagged `summarized` once
+counted, so those loaded in the watermark's millisecond are not counted twice:
+
+- all-time summaries get them added to their stored counts, engagement, sentiment mix and
+  date range, and their representatives are re-picked from the previous ones plus the new
+  tweets. Top topics / hashtags are merged from the stored top lists, so an entry outside a
+  list only enters it on the strength of its new tweets.
+- month summaries the new tweets fall into are recomputed from that month's tweets.
+
+`python -m data_pipeline.graph_summaries --full` rebuilds every summary from scratch.
+Summaries of every size are stored (the next delta needs them); only those of at least
+SUMMARY_MIN_TWEETS tweets answer questions.
+
+At question time `fetch_summaries` recognizes aggregate questions (an aggregate cue such as
+"overall" or "sentiment", plus a brand, hashtag or topic, and no time window or a calendar
+month) and returns the matching summaries, which replace retrieval in the answer prompt.
+Questions with other qualifiers ("how do people feel about Nike's running shoes?") are left
+to retrieval, unless those words name a matched topic.
+"""
+
+import argparse
+import calendar
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+from data_pipeline.context_builder import format_tweet
+from data_pipeline.retrieval_filters import WORD, extract_filters, residual_terms, unresolved_dates
+from data_pipeline.tracing import span, traced
+from config import (NEO4J_DATABASE, SUMMARY_MIN_TWEETS, SUMMARY_REPRESENTATIVE_TWEETS, SUMMARY_TOP_ENTRIES,
+                    SUMMARY_MAX_PER_QUESTION)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KINDS = ("brand", "topic", "hashtag")
+ALL_TIME = "all"
+
+# Words that make a question about a whole population of tweets rather than specific ones
+AGGREGATE_CUE = re.compile(
+    r"\b(overall|in general|generally|sentiment|feel|feeling|opinions?|perceptions?|mood|reputation|"
+    r"how many|volume|summar(?:y|ize|ise)|breakdown)\b",
+    re.IGNORECASE,
+)
+# Words of aggregate questions that do not narrow them down
+AGGREGATE_VOCABULARY = frozenset("""
+overall general generally sentiment sentiments feel feels feeling feelings opinion opinions perception perceptions
+mood reputation volume summary summarize summarise breakdown people public users fans customers consumers
+think say saying toward towards view views perceived doing going positive negative neutral topic topics hashtag hashtags
+""".split())
+HASHTAG = re.compile(r"#(\w+)")
+MONTH_BUCKET = re.compile(r"^\d{4}-\d{2}")
+
+# What the summaries aggregate, per tweet `t` with topic `tpc` and hashtag list `hashtags`
+TWEET_FIELDS = """
+OPTIONAL MATCH (t)-[:HAS_SENTIMENT]->(s:Sentiment)
+RETURN t.tweet_id AS tweet_id, t.date AS date, coalesce(t.brands, []) AS brands,
+       tpc.name AS topic, hashtags, s.label AS sentiment,
+       coalesce(t.like_count, 0) AS like_count, coalesce(t.retweet_count, 0) AS retweet_count,
+       coalesce(t.dup_cluster_id, t.tweet_id) AS cluster, t.loaded_at AS loaded_at
+"""
+
+# Tweets loaded since the last refresh (every tweet for a full rebuild), see dirty_condition
+DIRTY_QUERY = """
+// query: summaries.dirty
+MATCH (t:Tweet) WHERE {condition}
+OPTIONAL MATCH (t)-[:BELONGS_TO_TOPIC]->(tpc:Topic)
+OPTIONAL MATCH (t)-[:CONTAINS_HASHTAG]->(h:Hashtag)
+WITH t, tpc, collect(h.tag) AS hashtags
+""" + TWEET_FIELDS
+
+# Tweets of the given months (through the date index) with any of the given brands, topics or hashtags
+MONTH_MEMBER_QUERY = """
+// query: summaries.month_members
+UNWIND $months AS month
+MATCH (t:Tweet) WHERE t.date STARTS WITH month
+OPTIONAL MATCH (t)-[:BELONGS_TO_TOPIC]->(tpc:Topic)
+OPTIONAL MATCH (t)-[:CONTAINS_HASHTAG]->(h:Hashtag)
+WITH t, tpc, collect(h.tag) AS hashtags
+WHERE any(b IN coalesce(t.brands, []) WHERE b IN $brands)
+   OR tpc.name IN $topics
+   OR any(tag IN hashtags WHERE tag IN $hashtags)
+""" + TWEET_FIELDS
+
+STATE_QUERY = """
+// query: summaries.state
+OPTIONAL MATCH (state:SummaryState {id: 'refresh'})
+RETURN state.synced_until AS synced_until
+"""
+
+SAVE_STATE_QUERY = """
+// query: summaries.save_state
+MERGE (state:SummaryState {id: 'refresh'})
+SET state.synced_until = $synced_until
+"""
+
+# Stored summaries with their representative tweets' engagement, to add new tweets to
+BASE_QUERY = """
+// query: summaries.base
+UNWIND $keys AS key
+MATCH (s:Summary {key: key})
+OPTIONAL MATCH (s)-[r:REPRESENTED_BY]->(t:Tweet)
+WITH s, r, t ORDER BY r.rank
+RETURN s {.*} AS summary, collect(t {
+    .tweet_id, like_count: coalesce(t.like_count, 0), retweet_count: coalesce(t.retweet_count, 0),
+    cluster: coalesce(t.dup_cluster_id, t.tweet_id)
+}) AS representatives
+"""
+
+LOOKUP_QUERY = """
+// query: summaries.lookup
+MATCH (s:Summary {bucket: $bucket})
+WHERE s.tweet_count >= $min_tweets
+  AND ((s.kind = 'brand' AND s.name IN $brands)
+       OR (s.kind = 'hashtag' AND toLower(s.name) IN $hashtags)
+       OR (s.kind = 'topic' AND $text CONTAINS toLower(s.name)))
+OPTIONAL MATCH (s)-[r:REPRESENTED_BY]->(t:Tweet)
+OPTIONAL MATCH (t)<-[:POSTED]-(u:User)
+OPTIONAL MATCH (t)-[:HAS_SENTIMENT]->(sent:Sentiment)
+WITH s, r, t, u, sent ORDER BY r.rank
+WITH s, collect(t {
+    .tweet_id, tweet: t.text, created: t.created_at, user: u.screen_name,
+    .retweet_count, .like_count, sentiment: sent.label, .location
+}) AS tweets
+RETURN s {.*} AS summary, tweets
+ORDER BY s.tweet_count DESC
+LIMIT $limit
+"""
+
+def ensure_summary_schema(session):
+    """
+    Unique summary keys, an index on the bucket looked up at question time and one on
+    Tweet.loaded_at for the refresh watermark.
+    """
+    session.run("CREATE CONSTRAINT summary_key IF NOT EXISTS FOR (s:Summary) REQUIRE s.key IS UNIQUE")
+    session.run("CREATE INDEX summary_bucket IF NOT EXISTS FOR (s:Summary) ON (s.bucket)")
+    session.run("CREATE INDEX tweet_loaded_at IF NOT EXISTS FOR (t:Tweet) ON (t.loaded_at)")
+
+def dirty_condition(full, synced_until):
+    """
+    DIRTY_QUERY's condition: every tweet when `full`, the unsummarized tweets loaded since
+    `synced_until` otherwise, and every unsummarized tweet before the first watermark (tweets
+    loaded before `loaded_at` was set are only found then).
+    """
+    if full:
+        return "true"
+    if synced_until is None:
+        return "t.summarized IS NULL"
+    # >= rather than >: tweets committed in the watermark's millisecond after the last refresh
+    return "t.loaded_at >= $since AND t.summarized IS NULL"
+
+def summary_key(kind, name, bucket):
+    return f"{kind}:{name}:{bucket}"
+
+def month_bucket(value):
+    """"YYYY-MM" of an ISO date string, or None when the tweet has no usable date."""
+    value = str(value or "")
+    return value[:7] if MONTH_BUCKET.match(value) else None
+
+def tweet_keys(tweet):
+    """(kind, name, bucket) of every summary a tweet counts towards."""
+    names = [("brand", brand) for brand in tweet["brands"]]
+    if tweet["topic"]:
+        names.append(("topic", tweet["topic"]))
+    names += [("hashtag", tag) for tag in tweet["hashtags"]]
+    month = month_bucket(tweet["date"])
+    buckets = [ALL_TIME, month] if month else [ALL_TIME]
+    return [(kind, name, bucket) for kind, name in names for bucket in buckets]
+
+def top_entries(counter, exclude=None, limit=SUMMARY_TOP_ENTRIES):
+    entries = [(name, count) for name, count in counter.most_common() if name != exclude][:limit]
+    return [name for name, _ in entries], [count for _, count in entries]
+
+def stored_counter(summary, names, counts):
+    """Counter of a stored name list and its parallel count list."""
+    return Counter(dict(zip(summary.get(names) or [], summary.get(counts) or [])))
+
+def summarize(key, tweets, base=None, base_representatives=(), representatives=SUMMARY_REPRESENTATIVE_TWEETS):
+    """
+    Summary node properties for the tweets of one (kind, name, bucket), and its representative
+    tweet IDs. With `base` (the stored properties) and `base_representatives` (its stored
+    representatives), `tweets` are the ones to add to it.
+    """
+    kind, name, bucket = key
+    base = base or {}
+    sentiments = stored_counter(base, "sentiment_labels", "sentiment_counts")
+    sentiments.update(tweet["sentiment"] or "Unknown" for tweet in tweets)
+    topics = stored_counter(base, "top_topics", "top_topic_counts")
+    topics.update(tweet["topic"] for tweet in tweets if tweet["topic"])
+    hashtags = stored_counter(base, "top_hashtags", "top_hashtag_counts")
+    hashtags.update(tag for tweet in tweets for tag in tweet["hashtags"])
+    dates = sorted([str(tweet["date"]) for tweet in tweets if month_bucket(tweet["date"])]
+                   + [base[field] for field in ("first_date", "last_date") if base.get(field)])
+
+    # Highest engagement first, one tweet per near-duplicate cluster
+    representative_ids, clusters = [], set()
+    candidates = list(base_representatives) + list(tweets)
+    for tweet in sorted(candidates, key=lambda t: t["like_count"] + t["retweet_count"], reverse=True):
+        if tweet["cluster"] in clusters:
+            continue
+        clusters.add(tweet["cluster"])
+        representative_ids.append(tweet["tweet_id"])
+        if len(representative_ids) >= representatives:
+            break
+
+    sentiment_labels, sentiment_counts = top_entries(sentiments, limit=len(sentiments))
+    top_topics, top_topic_counts = top_entries(topics, exclude=name if kind == "topic" else None)
+    top_hashtags, top_hashtag_counts = top_entries(hashtags, exclude=name if kind == "hashtag" else None)
+    return {
+        "key": summary_key(*key),
+        "kind": kind,
+        "name": name,
+        "bucket": bucket,
+        "tweet_count": base.get("tweet_count", 0) + len(tweets),
+        "like_count": base.get("like_count", 0) + sum(tweet["like_count"] for tweet in tweets),
+        "retweet_count": base.get("retweet_count", 0) + sum(tweet["retweet_count"] for tweet in tweets),
+        "sentiment_labels": sentiment_labels,
+        "sentiment_counts": sentiment_counts,
+        "top_topics": top_topics,
+        "top_topic_counts": top_topic_counts,
+        "top_hashtags": top_hashtags,
+        "top_hashtag_counts": top_hashtag_counts,
+        "first_date": dates[0] if dates else None,
+        "last_date": dates[-1] if dates else None,
+        "updated_at": time.time(),
+    }, representative_ids
+
+def group_by_key(tweets, keys=None):
+    """{(kind, name, bucket): tweets} for the summaries the tweets count towards (only `keys`, if given)."""
+    groups = defaultdict(list)
+    for tweet in tweets:
+        for key in tweet_keys(tweet):
+            if keys is None or key in keys:
+                groups[key].append(tweet)
+    return groups
+
+def write_summaries(session, summaries):
+    """Upsert summary nodes with their entity, parent and representative-tweet relationships."""
+    rows = [props for props, _ in summaries]
+    keys = [props["key"] for props in rows]
+    session.run("UNWIND $rows AS row MERGE (s:Summary {key: row.key}) SET s = row", rows=rows)
+    session.run("""
+    UNWIND $keys AS key
+    MATCH (:Summary {key: key})-[r:REPRESENTED_BY]->()
+    DELETE r
+    """, keys=keys)
+    session.run("""
+    UNWIND $links AS link
+    MATCH (s:Summary {key: link.key})
+    MATCH (t:Tweet {tweet_id: link.tweet_id})
+    MERGE (s)-[r:REPRESENTED_BY]->(t)
+    SET r.rank = link.rank
+    """, links=[{"key": props["key"], "tweet_id": tweet_id, "rank": rank}
+                for props, tweet_ids in summaries for rank, tweet_id in enumerate(tweet_ids)])
+    session.run("""
+    UNWIND $rows AS row
+    MATCH (s:Summary {key: row.key})
+    OPTIONAL MATCH (topic:Topic {name: row.name}) WHERE row.kind = 'topic'
+    OPTIONAL MATCH (tag:Hashtag {tag: row.name}) WHERE row.kind = 'hashtag'
+    WITH s, coalesce(topic, tag) AS entity
+    WHERE entity IS NOT NULL
+    MERGE (s)-[:SUMMARIZES]->(entity)
+    """, rows=[{"key": props["key"], "kind": props["kind"], "name": props["name"]} for props in rows])
+    session.run("""
+    UNWIND $pairs AS pair
+    MATCH (s:Summary {key: pair.key})
+    MATCH (parent:Summary {key: pair.parent})
+    MERGE (s)-[:PART_OF]->(parent)
+    """, pairs=[{"key": props["key"], "parent": summary_key(props["kind"], props["name"], ALL_TIME)}
+                for props in rows if props["bucket"] != ALL_TIME])
+
+@traced("graph_summaries.refresh")
+def refresh_graph_summaries(neo4j_driver, full=False):
+    """
+    Add the tweets loaded since the last refresh to the summaries they belong to (rebuild
+    every summary when `full`). Returns the number of summaries written.
+    """
+    with neo4j_driver.session(database=NEO4J_DATABASE) as session:
+        ensure_summary_schema(session)
+        synced_until = session.run(STATE_QUERY).single()["synced_until"]
+        with span("neo4j.summary_dirty_tweets", full=full):
+            dirty = session.run(DIRTY_QUERY.format(condition=dirty_condition(full, synced_until)),
+                                since=synced_until).data()
+        if not dirty:
+            print("✅ Graph summaries are up to date.")
+            return 0
+
+        new_tweets = group_by_key(dirty)
+        if full:
+            summaries = [summarize(key, tweets) for key, tweets in new_tweets.items()]
+        else:
+            month_keys = {key for key in new_tweets if key[2] != ALL_TIME}
+            names = {kind: sorted({name for k, name, _ in month_keys if k == kind}) for kind in SUMMARY_KINDS}
+            months = sorted({bucket for _, _, bucket in month_keys})
+            with span("neo4j.summary_month_tweets", months=len(months)):
+                members = session.run(MONTH_MEMBER_QUERY, months=months, brands=names["brand"],
+                                      topics=names["topic"], hashtags=names["hashtag"]).data()
+            summaries = [summarize(key, tweets) for key, tweets in group_by_key(members, month_keys).items()]
+
+            all_time_keys = [key for key in new_tweets if key[2] == ALL_TIME]
+            with span("neo4j.summary_bases", summaries=len(all_time_keys)):
+                bases = {record["summary"]["key"]: record for record in
+                         session.run(BASE_QUERY, keys=[summary_key(*key) for key in all_time_keys]).data()}
+            for key in all_time_keys:
+                base = bases.get(summary_key(*key), {})
+                summaries.append(summarize(key, new_tweets[key], base.get("summary"), base.get("representatives", ())))
+
+        with span("neo4j.write_summaries", rows=len(summaries)):
+            write_summaries(session, summaries)
+            session.run("UNWIND $ids AS id MATCH (t:Tweet {tweet_id: id}) SET t.summarized = true",
+                        ids=[tweet["tweet_id"] for tweet in dirty])
+            loaded = [tweet["loaded_at"] for tweet in dirty if tweet["loaded_at"] is not None]
+            if loaded:
+                session.run(SAVE_STATE_QUERY, synced_until=max(*loaded, synced_until or 0))
+    print(f"✅ {len(summaries)} graph summaries {'rebuilt' if full else 'refreshed'} for {len(dirty)} tweet(s).")
+    return len(summaries)
+
+# --- Question time ------------------------------------------------------------
+
+def question_bucket(filters, today=None):
+    """
+    The summary bucket covering a question's time window: "all" without one, "YYYY-MM" for a
+    calendar month (or this month so far), None for any other window.
+    """
+    if not filters.since and not filters.until:
+        return ALL_TIME
+    if not filters.since:
+        return None
+    today = today or date.today()
+    since = date.fromisoformat(filters.since)
+    if since.day != 1:
+        return None
+    if filters.until:
+        month_end = date(since.year, since.month, calendar.monthrange(since.year, since.month)[1])
+        return since.strftime("%Y-%m") if date.fromisoformat(filters.until) == month_end else None
+    return since.strftime("%Y-%m") if (since.year, since.month) == (today.year, today.month) else None
+
+def summary_request(question, today=None):
+    """Lookup parameters when `question` is an aggregate question summaries can answer, else None."""
+    if not AGGREGATE_CUE.search(question):
+        return None
+    filters = extract_filters(question, today)
+    bucket = question_bucket(filters, today)
+    if bucket is None or unresolved_dates(question, filters):
+        return None
+    return {
+        "bucket": bucket,
+        "brands": filters.brands,
+        "hashtags": [tag.lower() for tag in HASHTAG.findall(question)],
+        "text": question.lower(),
+        # Qualifiers a brand / hashtag summary does not cover; they have to name a topic
+        "residual": residual_terms(HASHTAG.sub(" ", question), AGGREGATE_VOCABULARY),
+    }
+
+def covers_residual(request, summaries):
+    """Whether the question's residual words all belong to the names of matched topic summaries."""
+    topic_words = {word for summary in summaries if summary["kind"] == "topic"
+                   for word in WORD.findall(summary["name"].lower())}
+    return set(request["residual"]) <= topic_words
+
+def fetch_summaries(session, question, limit=SUMMARY_MAX_PER_QUESTION, min_tweets=SUMMARY_MIN_TWEETS):
+    """The summaries answering an aggregate question, each with its representative tweets; [] otherwise."""
+    request = summary_request(question)
+    if request is None:
+        return []
+    params = {key: value for key, value in request.items() if key != "residual"}
+    with span("neo4j.graph_summaries", bucket=request["bucket"]):
+        records = session.run(LOOKUP_QUERY, {**params, "limit": limit, "min_tweets": min_tweets}).data()
+    summaries = [{**record["summary"], "tweets": record["tweets"]} for record in records]
+    if not covers_residual(request, summaries):
+        return []  # The question is narrower than any summary; retrieval answers it
+    return summaries
+
+def describe_summary(summary):
+    """Prompt text for one summary."""
+    kind, name, bucket = summary["kind"], summary["name"], summary["bucket"]
+    subject = {"brand": name, "topic": f"Topic '{name}'", "hashtag": f"#{name}"}[kind]
+    if bucket == ALL_TIME:
+        period = "all tweets"
+    else:
+        year, month = bucket.split("-")
+        period = f"{calendar.month_name[int(month)]} {year}"
+    count = summary["tweet_count"]
+    dates = f" from {summary['first_date']} to {summary['last_date']}" if summary.get("first_date") else ""
+    lines = [f"{subject}, {period}: {count} tweets{dates}, "
+             f"{summary['like_count']} likes, {summary['retweet_count']} retweets"]
+    lines.append("Sentiment: " + ", ".join(
+        f"{label.lower()} {n / count:.0%}" for label, n in zip(summary["sentiment_labels"], summary["sentiment_counts"])
+    ))
+    if summary.get("top_topics"):
+        lines.append("Top topics: " + ", ".join(
+            f"{topic} {n / count:.0%}" for topic, n in zip(summary["top_topics"], summary["top_topic_counts"])
+        ))
+    if summary.get("top_hashtags"):
+        lines.append("Top hashtags: " + ", ".join(
+            f"#{tag} ({n})" for tag, n in zip(summary["top_hashtags"], summary["top_hashtag_counts"])
+        ))
+    if summary["tweets"]:
+        lines.append("Representative tweets:")
+        lines += [format_tweet(tweet) for tweet in summary["tweets"]]
+    return "\n".join(lines)
+
+def summary_context(summaries):
+    """Answer prompt context for a list of summaries."""
+    return "\n\n".join(describe_summary(summary) for summary in summaries)
+
+def summary_sources(summaries):
+    """The summaries' representative tweets, as result rows for the sources list."""
+    return list({tweet["tweet_id"]: tweet for summary in summaries for tweet in summary["tweets"]}.values())
+
+if __name__ == "__main__":
+    from connectors.neo4j_connector import get_driver
+    parser = argparse.ArgumentParser(description="Refresh the precomputed graph summaries.")
+    parser.add_argument("--full", action="store_true", help="Recompute every summary, not just those with new tweets")
+    args = parser.parse_args()
+    driver = get_driver()
+    try:
+        refresh_graph_summaries(driver, full=args.full)
+    finally:
+        driver.close()
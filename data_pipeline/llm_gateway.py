@@ -0,0 +1,326 @@
+# llm_gateway.py
+"""
+This module is the single entry point to OpenAI for the QA systems and enrichment.
+One process-wide `LLMGateway` (see `get_llm_gateway`) owns:
+
+- one SDK client, so HTTP connections are kept alive and reused across calls instead of
+  a new connection pool and TLS handshake per request; the differences between the
+  current and the legacy (0.x) SDK surfaces are handled here and nowhere else
+- an on-disk exact-prompt cache for deterministic calls (temperature 0): an identical
+  model + messages request is answered from LLM_CACHE_PATH without reaching the API
+- a limit of LLM_MAX_IN_FLIGHT concurrent requests, with exponential backoff and jitter
+  on rate limits, timeouts and server errors
+- timeouts: every request is capped at LLM_REQUEST_TIMEOUT and at the caller's Deadline
+  (see `data_pipeline.deadlines`), which also bounds retries and waiting for a slot;
+  embeddings can be hedged with a second request after their observed p95 latency
+- Prometheus metrics: request latency per operation, tokens used and request outcomes
+"""
+
+import configparser
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from data_pipeline.deadlines import Deadline, DeadlineExceeded, LatencyTracker, hedged
+from data_pipeline.embedding_profile import embedding_request_params
+from data_pipeline.tracing import Counter, Histogram, register_metric
+from config import (LLM_MODEL, LLM_MAX_IN_FLIGHT, LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, LLM_REQUEST_TIMEOUT,
+                    LLM_HEDGE_DEFAULT_DELAY, LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+
+logger = logging.getLogger(__name__)
+
+CONFIG_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.ini")
+
+LATENCY = register_metric(
+    Histogram("llm_request_duration_seconds", "OpenAI request latency by operation (embedding, chat, chat_stream)."),
+    "operation",
+)
+TOKENS = register_metric(
+    Counter("llm_tokens_total", "OpenAI tokens by kind (prompt, completion); streamed completions count chunks."),
+    "kind",
+)
+REQUESTS = register_metric(
+    Counter("llm_requests_total", "OpenAI calls by outcome (ok, cached, retried, hedged, deadline_exceeded, error)."),
+    "outcome",
+)
+
+# Exception class names, across SDK versions, worth retrying
+RETRYABLE_ERRORS = {
+    "RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError",
+    "ServiceUnavailableError", "Timeout", "TryAgain",
+}
+
+CACHE_PRUNE_INTERVAL = 100  # Stores between checks of the on-disk entry count
+
+def read_openai_api_key(path=CONFIG_INI_PATH):
+    """The [openai] api_key from config.ini, or None."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    return config.get("openai", "api_key", fallback=None)
+
+def is_retryable(error):
+    """Whether a failed request may succeed if sent again."""
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "http_status", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+class PromptCache:
+    """Responses of temperature-0 requests keyed by their exact model and messages."""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # key -> text, least recently used first
+        self._lock = threading.Lock()
+        self._stores = 0
+
+    @staticmethod
+    def key(model, messages, **params):
+        payload = json.dumps({"model": model, "messages": messages, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                return text
+        try:
+            with open(self._entry_path(key)) as f:
+                text = json.load(f)["text"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        self._remember(key, text)
+        return text
+
+    def put(self, key, text):
+        self._remember(key, text)
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"text": text, "created_at": time.time()}, f)
+        os.replace(tmp_path, entry_path)
+        with self._lock:
+            self._stores += 1
+            prune = self._stores % CACHE_PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete the least recently written entries beyond max_entries."""
+        entries = []
+        for root, _, files in os.walk(self.path):
+            entries.extend(os.path.join(root, name) for name in files if name.endswith(".json"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: os.path.getmtime(path))
+        for path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class LLMGateway:
+    def __init__(self, api_key=None, max_in_flight=LLM_MAX_IN_FLIGHT, max_retries=LLM_MAX_RETRIES,
+                 retry_base_delay=LLM_RETRY_BASE_DELAY, request_timeout=LLM_REQUEST_TIMEOUT,
+                 cache_enabled=LLM_CACHE_ENABLED):
+        import openai  # Deferred: the SDK is slow to import and not every importer makes requests
+        self._openai = openai
+        api_key = api_key or getattr(openai, "api_key", None) or read_openai_api_key()
+        if hasattr(openai, "OpenAI"):
+            # One client per process; retries are done here so they share the in-flight limit
+            self._client = openai.OpenAI(api_key=api_key, max_retries=0)
+        else:
+            # Legacy SDK: module-level calls, which keep one HTTP session per thread
+            self._client = None
+            openai.api_key = api_key
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.request_timeout = request_timeout
+        self.cache = PromptCache() if cache_enabled else None
+        self.embedding_latency = LatencyTracker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        # Runs hedged requests: the original and its hedge each need a thread
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * max_in_flight, thread_name_prefix="llm-hedge")
+
+    @contextmanager
+    def _slot(self, deadline):
+        if not self._slots.acquire(timeout=deadline.timeout()):
+            REQUESTS.inc("deadline_exceeded")
+            raise DeadlineExceeded("no OpenAI request slot became free before the deadline")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _send(self, request, deadline):
+        """
+        Run `request(timeout)`, retrying retryable failures with exponential backoff and jitter.
+        Each attempt's timeout and the retries themselves stay within `deadline`; a failure
+        that leaves no time for another attempt (typically the SDK timing out at the
+        deadline) raises DeadlineExceeded.
+        """
+        for attempt in range(self.max_retries + 1):
+            if deadline.expired():
+                REQUESTS.inc("deadline_exceeded")
+                raise DeadlineExceeded("OpenAI request exceeded its deadline")
+            try:
+                return request(deadline.timeout(self.request_timeout))
+            except Exception as e:
+                delay = self.retry_base_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+                if deadline.expired() or (is_retryable(e) and attempt < self.max_retries
+                                          and delay >= deadline.remaining()):
+                    REQUESTS.inc("deadline_exceeded")
+                    raise DeadlineExceeded(f"OpenAI request exceeded its deadline ({type(e).__name__})") from e
+                if attempt == self.max_retries or not is_retryable(e):
+                    REQUESTS.inc("error")
+                    raise
+                logger.warning(f"OpenAI request failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                REQUESTS.inc("retried")
+                time.sleep(delay)
+
+    def _count_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage:
+            TOKENS.inc("prompt", getattr(usage, "prompt_tokens", 0) or 0)
+            TOKENS.inc("completion", getattr(usage, "completion_tokens", 0) or 0)
+
+    def _create_chat(self, model, messages, temperature, stream, timeout):
+        if self._client is not None:
+            return self._client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, stream=stream, timeout=timeout
+            )
+        return self._openai.ChatCompletion.create(
+            model=model, messages=messages, temperature=temperature, stream=stream, request_timeout=timeout
+        )
+
+    def _create_embeddings(self, inputs, timeout):
+        params = embedding_request_params()
+        if self._client is not None:
+            return self._client.embeddings.create(input=inputs, timeout=timeout, **params)
+        return self._openai.Embedding.create(input=inputs, request_timeout=timeout, **params)
+
+    def _cache_key(self, model, messages, temperature):
+        """Cache key for deterministic requests, None for sampled ones."""
+        if self.cache is None or temperature != 0:
+            return None
+        return self.cache.key(model, messages)
+
+    def embed(self, texts, deadline=None, hedge=False):
+        """
+        Embeddings (under the embedding profile) of `texts`: one embedding for a string,
+        a list of embeddings in input order for a list of strings.
+        With `hedge`, a second request is fired if the first is slower than the p95 so far.
+        Raises DeadlineExceeded if no response arrives before `deadline`.
+        """
+        inputs = [texts] if isinstance(texts, str) else list(texts)
+        deadline = deadline or Deadline()
+
+        def request():
+            request_start = time.perf_counter()
+            with self._slot(deadline):
+                response = self._send(lambda timeout: self._create_embeddings(inputs, timeout), deadline)
+            self.embedding_latency.record(time.perf_counter() - request_start)
+            return response
+
+        start = time.perf_counter()
+        if hedge:
+            hedge_after = self.embedding_latency.percentile(95, LLM_HEDGE_DEFAULT_DELAY)
+            response, fired = hedged(request, hedge_after, deadline, self._hedge_executor)
+            if fired:
+                REQUESTS.inc("hedged")
+        else:
+            response = request()
+        LATENCY.observe("embedding", time.perf_counter() - start)
+        REQUESTS.inc("ok")
+        self._count_usage(response)
+        embeddings = [[] for _ in inputs]
+        for item in response.data:
+            embeddings[item.index] = list(item.embedding)
+        return embeddings[0] if isinstance(texts, str) else embeddings
+
+    def chat(self, messages, temperature=0.0, model=LLM_MODEL, deadline=None):
+        """
+        Text of a chat completion; temperature-0 requests are served from the prompt cache when
+        possible. Raises DeadlineExceeded if it cannot complete before `deadline`.
+        """
+        key = self._cache_key(model, messages, temperature)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                REQUESTS.inc("cached")
+                return cached
+        deadline = deadline or Deadline()
+        start = time.perf_counter()
+        with self._slot(deadline):
+            response = self._send(lambda timeout: self._create_chat(model, messages, temperature, False, timeout), deadline)
+        LATENCY.observe("chat", time.perf_counter() - start)
+        REQUESTS.inc("ok")
+        self._count_usage(response)
+        text = (response.choices[0].message.content or "").strip()
+        if key:
+            self.cache.put(key, text)
+        return text
+
+    def stream_chat(self, messages, temperature=0.0, model=LLM_MODEL, deadline=None):
+        """
+        Yield completion tokens as they arrive. A cached temperature-0 response is yielded
+        as a single token. The in-flight slot is held until the stream is exhausted or closed.
+        `deadline` bounds getting the stream started; the caller stops reading it when its
+        own budget runs out.
+        """
+        key = self._cache_key(model, messages, temperature)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                REQUESTS.inc("cached")
+                yield cached
+                return
+        deadline = deadline or Deadline()
+        start = time.perf_counter()
+        parts = []
+        with self._slot(deadline):
+            # Only the request itself is retried; a stream that fails midway has already emitted tokens
+            stream = self._send(lambda timeout: self._create_chat(model, messages, temperature, True, timeout), deadline)
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = getattr(chunk.choices[0].delta, "content", None)
+                if content:
+                    parts.append(content)
+                    yield content
+        LATENCY.observe("chat_stream", time.perf_counter() - start)
+        REQUESTS.inc("ok")
+        TOKENS.inc("completion", len(parts))  # One content chunk per token
+        if key and parts:
+            self.cache.put(key, "".join(parts).strip())
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway():
+    """Return the process-wide LLM gateway."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -1,51 +1,115 @@
-import spacy
-import os
-from openai import OpenAI
-import configparser
+import asyncio
 import logging
-from data_pipeline.connectors.neo4j_connector import get_driver
-from data_pipeline.config import NEO4J_DATABASE
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from connectors.neo4j_connector import get_driver
+from config import (NEO4J_DATABASE, QA_CACHE_ENABLED, QA_BATCH_MAX_CONCURRENCY, QA_BATCH_REQUESTS_PER_MINUTE,
+                    QA_RETRIEVAL_PREFILTER, QA_DEADLINE, QA_EMBEDDING_TIMEOUT, QA_ANSWER_TIMEOUT, QA_GRAPH_SUMMARIES,
+                    QA_ROUTER_ENABLED)
+from data_pipeline.semantic_cache import SemanticAnswerCache
+from data_pipeline.retrieval import (get_retrieval_backend, hybrid_search, hybrid_search_many, hybrid_search_async,
+                                     ensure_fulltext_index, ensure_filter_indexes)
+from data_pipeline.context_builder import build_context, fallback_answer, FALLBACK_ANSWER_INTRO
+from data_pipeline.deadlines import Deadline, DeadlineExceeded, FALLBACKS
+from data_pipeline.graph_summaries import fetch_summaries, summary_context, summary_sources
+from data_pipeline.llm_gateway import get_llm_gateway
+from data_pipeline.question_router import get_question_router, route_question
+from data_pipeline.retrieval_filters import extract_filters
+from data_pipeline.tracing import span, traced
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load config
-config = configparser.ConfigParser()
-config.read("config.ini")
-openai_api_key = config.get("openai", "api_key")
+class RateLimiter:
+    """Spaces request starts at least 60 / requests_per_minute seconds apart, across threads."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
 
 class QASystem:
-    def __init__(self):
-        # Load language model for keyword extraction
+    def __init__(self, async_driver=None, neo4j_driver=None):
+        # Language model for keyword extraction
+        self.nlp = self.load_language_model()
+        
+        # Shared OpenAI client, prompt cache and request limiter
+        self.llm = get_llm_gateway()
+        self.router = get_question_router()  # Cypher fast path for aggregate questions
+        
+        # Connect to Neo4j (the Streamlit apps pass in their own driver)
+        self.neo4j_driver = neo4j_driver or get_driver()
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
+                ensure_fulltext_index(session)  # Keyword half of hybrid_search
+        except Exception as e:
+            logger.warning(f"Could not ensure the full-text index, keyword search may be unavailable: {e}")
+        if QA_RETRIEVAL_PREFILTER:
+            try:
+                with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
+                    ensure_filter_indexes(session)  # Date index for filtered retrieval
+            except Exception as e:
+                logger.warning(f"Could not ensure the retrieval filter indexes, filtered searches may scan: {e}")
+        # Optional asyncio driver (owned by the caller) for query_knowledge_graph_async
+        self.async_driver = async_driver
+        
+        # Reuse answers for semantically equivalent questions
+        self.answer_cache = SemanticAnswerCache() if QA_CACHE_ENABLED else None
+        
+        # Vector search backend (Neo4j server index or local ANN index)
+        self.retrieval_backend = get_retrieval_backend()
+    
+    def load_language_model(self):
+        """The spaCy model used by `extract_keywords`"""
+        # spaCy is imported here rather than at module level: it takes seconds to
+        # import and most importers of this module never build a QASystem
+        import spacy
+
+        try:
+            return spacy.load("en_core_web_sm")
         except OSError:
             logger.info("Downloading spaCy model...")
             import subprocess
             subprocess.check_call([
                 "python", "-m", "spacy", "download", "en_core_web_sm"
             ])
-            self.nlp = spacy.load("en_core_web_sm")
-        
-        # Initialize OpenAI client
-        self.openai_client = OpenAI(api_key=openai_api_key)
-        
-        # Connect to Neo4j
-        self.neo4j_driver = get_driver()
+            return spacy.load("en_core_web_sm")
     
-    def generate_embeddings(self, text):
-        """Generate embeddings for the input text"""
+    def generate_embeddings(self, text, deadline=None):
+        """
+        Generate embeddings for the input text, hedged and within `deadline`
+        (QA_EMBEDDING_TIMEOUT by default). Returns [] when it fails or runs out of time.
+        """
         try:
-            response = self.openai_client.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"
-            )
-            return response.data[0].embedding
+            return self.llm.embed(text, deadline=deadline or Deadline(QA_EMBEDDING_TIMEOUT), hedge=True)
+        except DeadlineExceeded as e:
+            logger.warning(f"Embedding missed its deadline, retrieving by keywords only: {e}")
+            FALLBACKS.inc("embedding")
+            return []
         except Exception as e:
             logger.error(f"Embedding error: {e}")
             return []
     
+    def generate_embeddings_batch(self, texts):
+        """Embed several texts in one request; returns one embedding (or [] on failure) per text."""
+        if not texts:
+            return []
+        try:
+            return self.llm.embed(list(texts))
+        except Exception as e:
+            logger.error(f"Batch embedding error: {e}")
+            return [[] for _ in texts]
+    
     def extract_keywords(self, text):
         """Extract keywords from the question"""
         doc = self.nlp(text)
@@ -53,99 +117,165 @@ class QASystem:
         keywords = [t.text.lower() for t in doc if t.is_alpha and not t.is_stop]
         return keywords
     
-    def query_knowledge_graph(self, question, embedding):
-        """Query Neo4j with both vector search and keyword matching"""
-        # Return empty results if embedding generation failed
-        if not embedding:
-            return []
-        
+    def retrieval_filters(self, question):
+        """Brand / time-window constraints named in the question, or None when pre-filtering is off."""
+        if not QA_RETRIEVAL_PREFILTER:
+            return None
+        filters = extract_filters(question)
+        if filters:
+            logger.info(f"Retrieval restricted to {filters}")
+        return filters
+    
+    def query_knowledge_graph(self, question, embedding, keywords=None):
+        """Query Neo4j with both vector search and keyword matching (keywords only without an embedding)"""
         # Extract keywords for keyword matching
-        keywords = self.extract_keywords(question)
-        
-        # Build hybrid search query
-        query = """
-        // Vector search for semantic similarity
-        CALL db.index.vector.queryNodes('tweet_embeddings', $topK, $embedding)
-        YIELD node, score
-        WITH node AS t, score AS semanticScore
-        
-        // Add keyword matching as additional signal
-        WITH t, semanticScore,
-            reduce(s=0, k IN $keywords | 
-                s + CASE WHEN toLower(t.text) CONTAINS k THEN 1 ELSE 0 END
-            ) AS keywordScore
-            
-        // Get related information
-        OPTIONAL MATCH (t)<-[:POSTED]-(u:User)
-        OPTIONAL MATCH (t)-[:HAS_SENTIMENT]->(s:Sentiment)
-        OPTIONAL MATCH (t)-[:BELONGS_TO_TOPIC]->(topic:Topic)
-        
-        // Return results with combined relevance score
-        RETURN 
-            t.text AS tweet, 
-            t.created_at AS created, 
-            u.screen_name AS user,
-            t.retweet_count AS retweet_count,
-            t.like_count AS like_count,
-            s.label AS sentiment,
-            topic.name AS topic,
-            t.location AS location,
-            semanticScore, 
-            keywordScore, 
-            (semanticScore * 3 + keywordScore) AS relevance
-            
-        ORDER BY relevance DESC 
-        LIMIT 50
-        """
+        if keywords is None:
+            keywords = self.extract_keywords(question)
         
         try:
             with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
-                result = session.run(query, {
-                    "embedding": embedding,
-                    "keywords": keywords,
-                    "topK": 100
-                })
-                return result.data()
+                return hybrid_search(session, embedding, keywords, self.retrieval_backend,
+                                     filters=self.retrieval_filters(question))
         except Exception as e:
             logger.error(f"Neo4j query error: {e}")
             return []
     
-    def generate_answer(self, question, results):
-        """Generate an answer using the LLM with context from tweets"""
+    def answer_routed(self, question):
+        """Deterministic answer from a Cypher template (counts, sentiment share, top hashtags / topics), or None"""
+        route = route_question(question) if QA_ROUTER_ENABLED else None
+        if route is None:
+            return None
+        try:
+            with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
+                return self.router.answer(session, route)
+        except Exception as e:
+            logger.error(f"Routed question error, answering with the LLM: {e}")
+            return None
+    
+    def lookup_summaries(self, question):
+        """Precomputed graph summaries answering an aggregate question ([] for other questions)"""
+        if not QA_GRAPH_SUMMARIES:
+            return []
+        try:
+            with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
+                return fetch_summaries(session, question)
+        except Exception as e:
+            logger.error(f"Graph summary lookup error: {e}")
+            return []
+    
+    def candidate_embeddings(self, tweet_ids):
+        """Stored embeddings of the given tweets, {tweet_id: embedding}, for conversation follow-ups"""
+        with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
+            return self.retrieval_backend.embeddings(session, tweet_ids)
+    
+    async def query_knowledge_graph_async(self, question, embedding, keywords=None):
+        """`query_knowledge_graph` on the asyncio driver; runs the blocking version in a thread without one."""
+        if self.async_driver is None:
+            return await asyncio.to_thread(self.query_knowledge_graph, question, embedding, keywords)
+        if keywords is None:
+            keywords = self.extract_keywords(question)
+        try:
+            return await hybrid_search_async(self.async_driver, embedding, keywords, self.retrieval_backend,
+                                             filters=self.retrieval_filters(question))
+        except Exception as e:
+            logger.error(f"Neo4j query error: {e}")
+            return []
+    
+    def query_knowledge_graph_many(self, questions, embeddings):
+        """`query_knowledge_graph` for several questions, one Neo4j round trip per retrieval stage."""
+        results = [[] for _ in questions]
+        # Questions whose embedding failed get no results, as in query_knowledge_graph
+        batch = [i for i, embedding in enumerate(embeddings) if embedding]
+        if not batch:
+            return results
+        try:
+            with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
+                batch_results = hybrid_search_many(
+                    session,
+                    [embeddings[i] for i in batch],
+                    [self.extract_keywords(questions[i]) for i in batch],
+                    self.retrieval_backend,
+                    filter_list=[self.retrieval_filters(questions[i]) for i in batch],
+                )
+            for i, rows in zip(batch, batch_results):
+                results[i] = rows
+        except Exception as e:
+            logger.error(f"Neo4j batch query error: {e}")
+        return results
+    
+    def generate_answer(self, question, results, deadline=None, summaries=()):
+        """
+        Generate an answer using the LLM with context from `summaries` when given and from the
+        tweets otherwise, within `deadline` (QA_ANSWER_TIMEOUT by default); past it the answer
+        is a template built from the tweets.
+        """
         if not results:
             return "I couldn't find relevant information about that topic.", []
         
-        # Create context from top relevant tweets
-        context = "\n".join([
-            f"- @{r.get('user', 'Anonymous')}: {r.get('tweet', '')}" 
-            for r in results[:15]  # Use top 15 results
-        ])
+        if summaries:
+            context = f"Tweet summaries (computed over every matching tweet):\n{summary_context(summaries)}"
+        else:
+            # Top relevant tweets, near-duplicates collapsed, under the token budget
+            context = f"Tweets:\n{build_context(results)[0]}"
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You're a sportswear brand analyst answering questions based on tweet data."},
-                    {"role": "user", "content": f"Question: {question}\n\nTweets:\n{context}"}
-                ],
-                temperature=0.0
-            )
-            return response.choices[0].message.content.strip(), results
+            answer = self.llm.chat([
+                {"role": "system", "content": "You're a sportswear brand analyst answering questions based on tweet data."},
+                {"role": "user", "content": f"Question: {question}\n\n{context}"}
+            ], temperature=0.0, deadline=deadline or Deadline(QA_ANSWER_TIMEOUT))
+            return answer, results
+        except DeadlineExceeded as e:
+            logger.warning(f"LLM answer missed its deadline, using the template answer: {e}")
+            FALLBACKS.inc("answer")
+            return fallback_answer(results), results
         except Exception as e:
             logger.error(f"LLM answer error: {e}")
             return "Error generating answer.", results
     
-    def process_question(self, question):
-        """Process a question and return answer with sources"""
+    @traced("qa.question")
+    def process_question(self, question, deadline=None):
+        """Process a question and return answer with sources, within `deadline` (QA_DEADLINE by default)"""
+        start_time = time.perf_counter()
+        deadline = deadline or Deadline(QA_DEADLINE)
+        
+        # Counts, sentiment shares and top-N lists come straight from a Cypher template
+        with span("qa.router"):
+            routed = self.answer_routed(question)
+        if routed:
+            return {"question": question, **routed}
+        
         # 1. Generate vector embedding
-        embedding = self.generate_embeddings(question)
+        with span("qa.embedding"):
+            embedding = self.generate_embeddings(question, deadline.child(QA_EMBEDDING_TIMEOUT))
+        
+        # 2. Reuse the answer to a semantically equivalent question if we have one
+        if self.answer_cache:
+            cached = self.answer_cache.lookup(embedding, question)
+            if cached:
+                self.answer_cache.record(True, time.perf_counter() - start_time)
+                return {"question": question, "cached": True, **cached}
         
-        # 2. Perform hybrid search (vector + keyword)
-        results = self.query_knowledge_graph(question, embedding)
-        logger.info(f"Found {len(results)} relevant tweets")
+        # 3. Aggregate questions are answered from precomputed graph summaries
+        with span("qa.summaries"):
+            summaries = self.lookup_summaries(question)
+        if summaries:
+            results = summary_sources(summaries)
+            logger.info(f"Answering from {len(summaries)} graph summaries: {[summary['key'] for summary in summaries]}")
+        else:
+            # 4. Otherwise hybrid search (vector + keyword)
+            with span("qa.retrieval"):
+                results = self.query_knowledge_graph(question, embedding)
+            logger.info(f"Found {len(results)} relevant tweets")
         
-        # 3. Generate answer using LLM
-        answer, sources = self.generate_answer(question, results)
+        # 5. Generate answer using LLM
+        with span("qa.answer"):
+            answer, sources = self.generate_answer(question, results, deadline.child(QA_ANSWER_TIMEOUT), summaries)
+        
+        if self.answer_cache:
+            # Only answers grounded in retrieved tweets are worth reusing
+            if sources and not answer.startswith(("Error generating answer", FALLBACK_ANSWER_INTRO)):
+                self.answer_cache.add(question, embedding, {"answer": answer, "sources": sources})
+            self.answer_cache.record(False, time.perf_counter() - start_time)
         
         return {
             "question": question,
@@ -153,6 +283,79 @@ class QASystem:
             "sources": sources
         }
     
+    @traced("qa.questions")
+    def process_questions(self, questions, max_concurrency=QA_BATCH_MAX_CONCURRENCY,
+                          requests_per_minute=QA_BATCH_REQUESTS_PER_MINUTE):
+        """
+        Answer a list of questions (e.g. a daily report) and return one result per question, in order.
+        Template-routed questions and those covered by graph summaries skip retrieval, as in
+        `process_question`. Embedding and retrieval are each a single request for the whole list;
+        answers are generated concurrently, at most `max_concurrency` at a time and
+        `requests_per_minute` started per minute.
+        """
+        questions = list(questions)
+        results = [None] * len(questions)
+        
+        # 1. Counts, sentiment shares and top-N lists come straight from a Cypher template
+        with span("qa.router", questions=len(questions)):
+            for i, question in enumerate(questions):
+                routed = self.answer_routed(question)
+                if routed:
+                    results[i] = {"question": question, **routed}
+        remaining = [i for i, result in enumerate(results) if result is None]
+        
+        # 2. One embedding request for every other question
+        embeddings = [[] for _ in questions]
+        with span("qa.embedding", questions=len(remaining)):
+            for i, embedding in zip(remaining, self.generate_embeddings_batch([questions[i] for i in remaining])):
+                embeddings[i] = embedding
+        
+        # 3. Answer what we can from the semantic cache
+        pending = []
+        for i in remaining:
+            cached = self.answer_cache.lookup(embeddings[i], questions[i]) if self.answer_cache and embeddings[i] else None
+            if cached:
+                self.answer_cache.record(True, 0.0)
+                results[i] = {"question": questions[i], "cached": True, **cached}
+            else:
+                pending.append(i)
+        
+        # 4. Aggregate questions are answered from precomputed graph summaries
+        with span("qa.summaries", questions=len(pending)):
+            summaries = {i: self.lookup_summaries(questions[i]) for i in pending}
+        rows = {i: summary_sources(summaries[i]) for i in pending if summaries[i]}
+        
+        # 5. One retrieval round trip per stage for the rest
+        to_retrieve = [i for i in pending if i not in rows]
+        with span("qa.retrieval", questions=len(to_retrieve)):
+            retrieved = self.query_knowledge_graph_many(
+                [questions[i] for i in to_retrieve], [embeddings[i] for i in to_retrieve]
+            )
+        rows.update(zip(to_retrieve, retrieved))
+        
+        # 6. Concurrent, rate-limited answer generation
+        limiter = RateLimiter(requests_per_minute)
+        
+        def answer(i):
+            start_time = time.perf_counter()
+            if rows[i]:
+                limiter.wait()  # Questions without results never reach the LLM
+            with span("qa.answer"):
+                answer_text, sources = self.generate_answer(questions[i], rows[i], summaries=summaries[i])
+            if self.answer_cache:
+                if sources and not answer_text.startswith(("Error generating answer", FALLBACK_ANSWER_INTRO)):
+                    self.answer_cache.add(questions[i], embeddings[i], {"answer": answer_text, "sources": sources})
+                self.answer_cache.record(False, time.perf_counter() - start_time)
+            return {"question": questions[i], "answer": answer_text, "sources": sources}
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            for i, result in zip(pending, executor.map(answer, pending)):
+                results[i] = result
+        
+        logger.info(f"Answered {len(questions)} questions ({len(questions) - len(remaining)} routed, "
+                    f"{len(remaining) - len(pending)} from cache, {len(pending) - len(to_retrieve)} from summaries)")
+        return results
+    
     def close(self):
         """Close the Neo4j connection"""
         if self.neo4j_driver:
@@ -0,0 +1,149 @@
+# near_duplicates.py
+"""
+This module detects near-duplicate tweets (promo copies, bot reposts, copy-paste) with MinHash.
+Tweets are reduced to their word set, with links and @mentions stripped since copies usually
+differ only there, and summarized by a fixed-size MinHash signature. The fraction of equal
+signature slots estimates the Jaccard similarity of the word sets.
+At ingest, signatures are kept in a banded LSH index persisted under DEDUP_INDEX_PATH,
+so each new tweet is matched against every previously seen tweet in near-constant time.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+from config import DEDUP_INDEX_PATH, DEDUP_SIMILARITY_THRESHOLD, DEDUP_LSH_BANDS
+
+NUM_PERM = 64
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9#']+")
+URL_PATTERN = re.compile(r"https?://\S+")
+MENTION_PATTERN = re.compile(r"@\w+")
+
+# Fixed seed so signatures stay comparable across runs and processes
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+def shingles(text):
+    """Lowercase word set of a tweet, without links and @mentions."""
+    text = MENTION_PATTERN.sub(" ", URL_PATTERN.sub(" ", (text or "").lower()))
+    return set(TOKEN_PATTERN.findall(text))
+
+def minhash_signature(text):
+    """NUM_PERM-slot MinHash signature of the tweet's word set."""
+    words = shingles(text)
+    if not words:
+        return np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    hashes = np.array([
+        int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "big")
+        for word in words
+    ], dtype=np.uint64)
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=0)
+
+def estimate_jaccard(signature_a, signature_b):
+    """Estimated Jaccard similarity of the word sets behind two signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+class MinHashLSHIndex:
+    """
+    Persistent LSH index of tweet signatures for ingest-time de-duplication.
+    Signatures are split into `bands` bands; tweets sharing any band are candidates and are
+    confirmed by their estimated Jaccard similarity. Every tweet belongs to a cluster
+    identified by the TWEET_ID of its first-seen member, the cluster representative.
+    """
+
+    def __init__(self, path=DEDUP_INDEX_PATH, threshold=DEDUP_SIMILARITY_THRESHOLD, bands=DEDUP_LSH_BANDS):
+        if NUM_PERM % bands:
+            raise ValueError(f"NUM_PERM ({NUM_PERM}) must be divisible by the number of bands ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = NUM_PERM // bands
+        self.signatures_path = os.path.join(path, "signatures.npy")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.ids = []
+        self.cluster_ids = []
+        self._signatures = []
+        self._buckets = defaultdict(list)  # (band, band bytes) -> row numbers
+        self._row_by_id = {}
+        self._load()
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows_per_band
+            yield band, signature[start:start + self.rows_per_band].tobytes()
+
+    def _insert(self, tweet_id, cluster_id, signature):
+        row = len(self.ids)
+        self.ids.append(tweet_id)
+        self.cluster_ids.append(cluster_id)
+        self._signatures.append(signature)
+        self._row_by_id[tweet_id] = row
+        for key in self._band_keys(signature):
+            self._buckets[key].append(row)
+
+    def _load(self):
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            signatures = np.load(self.signatures_path)
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            return
+        if len(signatures) != len(meta["ids"]):
+            return
+        for tweet_id, cluster_id, signature in zip(meta["ids"], meta["cluster_ids"], signatures):
+            self._insert(tweet_id, cluster_id, signature)
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        signatures = np.array(self._signatures, dtype=np.uint64).reshape(-1, NUM_PERM)
+        with open(self.signatures_path + ".tmp", "wb") as f:
+            np.save(f, signatures)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump({"ids": self.ids, "cluster_ids": self.cluster_ids}, f)
+        os.replace(self.signatures_path + ".tmp", self.signatures_path)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def query(self, signature):
+        """Return (cluster_id, similarity) of the most similar indexed tweet above the threshold, or None."""
+        candidates = {row for key in self._band_keys(signature) for row in self._buckets.get(key, ())}
+        best = None
+        for row in candidates:
+            similarity = estimate_jaccard(self._signatures[row], signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self.cluster_ids[row], similarity)
+        return best
+
+    def assign(self, tweet_id, text):
+        """Index a tweet and return its cluster ID (its own TWEET_ID if it starts a new cluster)."""
+        tweet_id = str(tweet_id)
+        if tweet_id in self._row_by_id:
+            return self.cluster_ids[self._row_by_id[tweet_id]]
+        signature = minhash_signature(text)
+        # Empty texts all share one signature and are never treated as copies of each other
+        match = self.query(signature) if shingles(text) else None
+        cluster_id = match[0] if match else tweet_id
+        self._insert(tweet_id, cluster_id, signature)
+        return cluster_id
+
+    def detach(self, tweet_id):
+        """Make an indexed tweet the representative of its own cluster (its representative was lost)."""
+        row = self._row_by_id.get(str(tweet_id))
+        if row is not None:
+            self.cluster_ids[row] = str(tweet_id)
+
+_dedup_index = None
+
+def get_dedup_index():
+    """Return the process-wide de-duplication index."""
+    global _dedup_index
+    if _dedup_index is None:
+        _dedup_index = MinHashLSHIndex()
+    return _dedup_index
@@ -0,0 +1,72 @@
+# qa_client.py
+"""
+This module is the Streamlit apps' client for the QA service (`data_pipeline.qa_service`).
+`RemoteQAPipeline.stream(question, conversation)` has the same interface as
+`StreamingQAPipeline.stream`: iterate the returned stream (e.g. with `st.write_stream`) for
+answer tokens, then read `stream.result`. Only the conversation's id is sent; the service
+keeps the conversation's retrieval candidates itself.
+"""
+
+import json
+
+import requests
+from config import QA_SERVICE_TIMEOUT
+
+class QAServiceError(Exception):
+    """The QA service could not be reached, was overloaded, or failed to answer."""
+
+class RemoteQAStream:
+    """Iterable of answer tokens streamed from the QA service."""
+
+    def __init__(self, url, question, timeout, conversation_id=None):
+        self.url = url
+        self.question = question
+        self.conversation_id = conversation_id
+        self.timeout = timeout
+        self.result = None
+        self.error = None
+
+    def __iter__(self):
+        try:
+            payload = {"question": self.question, "conversation_id": self.conversation_id}
+            with requests.post(self.url, json=payload, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 503:
+                    raise QAServiceError("The QA service is busy, please try again in a moment.")
+                if response.status_code != 200:
+                    raise QAServiceError(f"QA service error ({response.status_code}): {response.text}")
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if "token" in message:
+                        yield message["token"]
+                    elif "result" in message:
+                        self.result = message["result"]
+                    elif "error" in message:
+                        raise QAServiceError(message["error"])
+        except requests.RequestException as e:
+            self.error = QAServiceError(f"QA service unavailable at {self.url}: {e}")
+            raise self.error
+        except QAServiceError as e:
+            self.error = e
+            raise
+        if self.result is None:
+            self.error = QAServiceError("QA service closed the stream without a result")
+            raise self.error
+
+class RemoteQAPipeline:
+    def __init__(self, base_url, timeout=QA_SERVICE_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def stream(self, question, conversation=None):
+        conversation_id = conversation.id if conversation is not None else None
+        return RemoteQAStream(f"{self.base_url}/ask", question, self.timeout, conversation_id)
+
+    def health(self):
+        """The service's /health payload, or None if it is not reachable."""
+        try:
+            response = requests.get(f"{self.base_url}/health", timeout=5)
+            return response.json() if response.ok else None
+        except requests.RequestException:
+            return None
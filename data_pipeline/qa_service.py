@@ -0,0 +1,239 @@
+# qa_service.py
+"""
+This module runs the QA system as a standalone asyncio HTTP service shared by the Streamlit apps.
+One warm `QASystem` (spaCy model, OpenAI client, Neo4j drivers, answer cache) serves every UI;
+retrieval uses the asyncio Neo4j driver so a slow graph query does not hold a thread.
+
+- Identical questions of the same conversation in flight at the same time are coalesced: later
+  requests attach to the running computation and receive the same token stream and result.
+- Requests carrying a `conversation_id` share a ConversationRetrieval, so follow-up questions
+  are re-ranked against the previous turn's candidates (`data_pipeline.conversation`).
+  Conversations idle for QA_SERVICE_CONVERSATION_TTL seconds are dropped, and at most
+  QA_SERVICE_MAX_CONVERSATIONS are kept (least recently used first out).
+- At most QA_SERVICE_MAX_CONCURRENCY questions are computed at once. Beyond
+  QA_SERVICE_MAX_PENDING distinct admitted questions, new ones are rejected with 503 so the
+  clients back off instead of queueing without bound.
+
+Endpoints:
+    POST /ask      {"question": "...", "conversation_id": "..." (optional)} -> NDJSON stream of {"token": ...} lines, then {"result": {...}} or {"error": "..."}
+    GET  /health   service status and load
+    GET  /metrics  Prometheus metrics (spans plus request outcomes)
+
+Run with:
+    python -m data_pipeline.qa_service [--host 127.0.0.1] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from connectors.neo4j_connector import get_async_driver
+from data_pipeline.conversation import ConversationRetrieval
+from data_pipeline.qa_streaming import StreamingQAPipeline
+from data_pipeline.tracing import Counter, register_metric, render_prometheus
+from config import (
+    QA_SERVICE_HOST, QA_SERVICE_PORT, QA_SERVICE_MAX_CONCURRENCY, QA_SERVICE_MAX_PENDING,
+    QA_SERVICE_CONVERSATION_TTL, QA_SERVICE_MAX_CONVERSATIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = register_metric(
+    Counter("qa_service_requests_total", "QA service requests by outcome (computed, coalesced, rejected)."),
+    "outcome",
+)
+
+class ServiceOverloaded(Exception):
+    """Raised when QA_SERVICE_MAX_PENDING questions are already admitted."""
+
+class SharedAnswer:
+    """Token stream and result of one computation, replayed to every request attached to it."""
+
+    def __init__(self):
+        self.tokens = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def emit(self, token):
+        self.tokens.append(token)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    async def follow(self):
+        """Yield every token from the first one on, including those emitted before attaching."""
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.tokens):
+                yield self.tokens[position]
+                position += 1
+            if self.done:
+                return
+            await changed.wait()
+
+def question_key(question, conversation_id=None):
+    """
+    Coalescing key: questions differing only in case or whitespace share a computation, unless
+    they belong to different conversations (whose previous turns may answer them differently).
+    """
+    return " ".join(question.lower().split()), conversation_id
+
+class ConversationStore:
+    """ConversationRetrieval per conversation id, dropped after `ttl` idle seconds."""
+
+    def __init__(self, ttl=QA_SERVICE_CONVERSATION_TTL, max_conversations=QA_SERVICE_MAX_CONVERSATIONS):
+        self.ttl = ttl
+        self.max_conversations = max_conversations
+        self._conversations = OrderedDict()  # id -> (ConversationRetrieval, last used), least recently used first
+
+    def get(self, conversation_id):
+        """The conversation's retrieval candidates (new if unknown or expired), or None without an id."""
+        if not conversation_id:
+            return None
+        now = time.monotonic()
+        conversation, last_used = self._conversations.pop(conversation_id, (None, now))
+        if conversation is None or now - last_used > self.ttl:
+            conversation = ConversationRetrieval()
+        # Drop expired conversations, then the least recently used beyond the limit
+        while self._conversations:
+            oldest_id, (_, oldest_used) = next(iter(self._conversations.items()))
+            if now - oldest_used <= self.ttl and len(self._conversations) < self.max_conversations:
+                break
+            del self._conversations[oldest_id]
+        self._conversations[conversation_id] = (conversation, now)
+        return conversation
+
+    def __len__(self):
+        return len(self._conversations)
+
+class QAService:
+    def __init__(self, qa_system, max_concurrency=QA_SERVICE_MAX_CONCURRENCY, max_pending=QA_SERVICE_MAX_PENDING):
+        self.qa = qa_system
+        self.pipeline = StreamingQAPipeline(qa_system)
+        self.max_pending = max_pending
+        self.conversations = ConversationStore()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}  # question key -> SharedAnswer
+        self.active = 0
+
+    def ask(self, question, conversation_id=None):
+        """Return the SharedAnswer for `question`, starting a computation unless one is in flight."""
+        key = question_key(question, conversation_id)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            REQUESTS.inc("coalesced")
+            return shared
+        if len(self._inflight) >= self.max_pending:
+            REQUESTS.inc("rejected")
+            raise ServiceOverloaded(f"{len(self._inflight)} questions already pending")
+        REQUESTS.inc("computed")
+        shared = SharedAnswer()
+        self._inflight[key] = shared
+        conversation = self.conversations.get(conversation_id)
+        shared.task = asyncio.create_task(self._compute(key, question, shared, conversation))
+        return shared
+
+    async def _compute(self, key, question, shared, conversation=None):
+        try:
+            async with self._slots:
+                self.active += 1
+                try:
+                    shared.result = await self.pipeline.run(question, shared.emit, conversation=conversation)
+                finally:
+                    self.active -= 1
+        except Exception as e:
+            logger.error(f"QA service error for '{question}': {e}")
+            shared.error = e
+        finally:
+            # Later identical questions start fresh (and hit the answer cache if this one was stored)
+            del self._inflight[key]
+            shared.finish()
+
+    def status(self):
+        return {"status": "ok", "active": self.active, "pending": len(self._inflight), "max_pending": self.max_pending,
+                "conversations": len(self.conversations)}
+
+def ndjson(payload):
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+async def handle_ask(request):
+    service = request.app["service"]
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return web.json_response({"error": "Request body must be JSON"}, status=400)
+    question = (body.get("question") or "").strip()
+    if not question:
+        return web.json_response({"error": "Missing 'question'"}, status=400)
+    conversation_id = body.get("conversation_id") or None
+
+    try:
+        shared = service.ask(question, conversation_id)
+    except ServiceOverloaded as e:
+        return web.json_response({"error": f"QA service is busy: {e}"}, status=503, headers={"Retry-After": "2"})
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    async for token in shared.follow():
+        await response.write(ndjson({"token": token}))
+    if shared.error is not None:
+        await response.write(ndjson({"error": str(shared.error)}))
+    else:
+        await response.write(ndjson({"result": shared.result}))
+    await response.write_eof()
+    return response
+
+async def handle_health(request):
+    return web.json_response(request.app["service"].status())
+
+async def handle_metrics(request):
+    return web.Response(text=render_prometheus(), content_type="text/plain")
+
+async def on_startup(app):
+    # Keyword extraction, embeddings and answer tokens run in threads; size the pool for them
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=QA_SERVICE_MAX_CONCURRENCY * 4, thread_name_prefix="qa")
+    )
+    # Imported here: llm_qa loads spaCy and OpenAI, which the request handlers above do not need
+    from data_pipeline.llm_qa import QASystem
+
+    app["async_driver"] = get_async_driver()
+    qa = await asyncio.to_thread(QASystem, app["async_driver"])
+    app["service"] = QAService(qa)
+    logger.info("QA service ready")
+
+async def on_cleanup(app):
+    app["service"].qa.close()
+    await app["async_driver"].close()
+
+def create_app():
+    app = web.Application()
+    app.router.add_post("/ask", handle_ask)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Standalone QA service for the Streamlit apps")
+    parser.add_argument("--host", default=QA_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=QA_SERVICE_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,334 @@
+# qa_streaming.py
+"""
+This module runs the QA pipeline asynchronously and streams answer tokens to the UI.
+Keyword extraction overlaps the embedding request, follow-up questions are generated
+from the retrieved tweets in parallel with the answer, and answer tokens are handed to
+the caller as they arrive. Latency of every stage and time-to-first-token are recorded.
+Each question runs against a Deadline (QA_DEADLINE): a question embedding that misses
+QA_EMBEDDING_TIMEOUT leaves retrieval to the keyword search, an answer that misses
+QA_ANSWER_TIMEOUT is replaced (or cut short) by a template answer built from the tweets,
+an answer stream that fails ends with the error, and late follow-up questions are replaced by the default ones. The stages that fell back
+are listed in the result's "degraded", and degraded answers are never cached.
+Given a ConversationRetrieval (`data_pipeline.conversation`), a question is first re-ranked
+against the previous turn's candidates and only retrieved from the graph when they do not
+cover it; freshly retrieved candidates are stored for the next turn while the answer streams.
+Aggregate questions ("overall sentiment toward Adidas this month") skip retrieval when the
+QA system has precomputed graph summaries for them (`data_pipeline.graph_summaries`), and
+counts, sentiment shares and top-N lists are answered by a Cypher template without any
+model call (`data_pipeline.question_router`).
+"""
+
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+import time
+
+from data_pipeline.context_builder import build_context, fallback_answer
+from data_pipeline.deadlines import Deadline, FALLBACKS
+from data_pipeline.graph_summaries import summary_context, summary_sources
+from data_pipeline.llm_gateway import get_llm_gateway
+from data_pipeline.tracing import span, traced
+from config import QA_DEADLINE, QA_EMBEDDING_TIMEOUT, QA_ANSWER_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+ANSWER_SYSTEM_PROMPT = "You're a sportswear brand analyst answering questions based on tweet data."
+FOLLOWUP_SYSTEM_PROMPT = "You generate relevant follow-up questions about sportswear brands."
+
+DEFAULT_FOLLOWUP_QUESTIONS = [
+    "How does this brand compare to its competitors?",
+    "What are the trending products from this brand?",
+    "What marketing strategies is this brand using effectively?"
+]
+
+_DONE = object()  # Sentinel closing the token queue
+
+def stream_chat_completion(messages, temperature=0.0):
+    """Yield completion tokens as they arrive, through the shared LLM gateway."""
+    yield from get_llm_gateway().stream_chat(messages, temperature=temperature)
+
+def generate_followups_from_context(question, results, chat_stream=stream_chat_completion):
+    """Suggest follow-up questions from the question and retrieved tweets, without waiting for the answer."""
+    if not results:
+        return DEFAULT_FOLLOWUP_QUESTIONS
+    prompt = f"""
+    Based on this question and these tweets about sportswear brands, suggest 3 natural follow-up questions that someone might ask next.
+    Keep the questions short, focused, and directly related to sportswear brands.
+
+    Question: {question}
+    Tweets:
+    {build_context(results)[0]}
+
+    Format each question on its own line, without numbering or bullets.
+    """
+    try:
+        questions_text = "".join(chat_stream([
+            {"role": "system", "content": FOLLOWUP_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ], temperature=0.7))
+        questions = [q.strip() for q in questions_text.split('\n') if q.strip()]
+        return questions[:3]
+    except Exception as e:
+        logger.error(f"Follow-up questions error: {e}")
+        return DEFAULT_FOLLOWUP_QUESTIONS
+
+class QAStream:
+    """
+    Iterable of answer tokens for one question.
+    Once iteration finishes, `result` holds the full answer, sources, follow-up questions and timings.
+    """
+
+    def __init__(self):
+        self.tokens = queue.Queue()
+        self.result = None
+        self.error = None
+
+    def __iter__(self):
+        while True:
+            token = self.tokens.get()
+            if token is _DONE:
+                break
+            yield token
+        if self.error:
+            raise self.error
+
+class StreamingQAPipeline:
+    """
+    Async driver around a QA system exposing `extract_keywords`, `generate_embeddings(text, deadline)`
+    (returning [] on failure or timeout) and `query_knowledge_graph(question, embedding, keywords)`
+    (and optionally `answer_cache`). Conversation reuse also needs `retrieval_filters(question)`
+    and `candidate_embeddings(tweet_ids)` ({tweet_id: embedding}); summaries need `lookup_summaries(question)`
+    and template answers `answer_routed(question)` (a result dict or None).
+    A `query_knowledge_graph_async` coroutine, when present, is awaited on the event loop
+    instead of running the blocking retrieval in a thread.
+    `chat_stream(messages, temperature)` yields completion tokens; it defaults to OpenAI.
+    """
+
+    def __init__(self, qa_system, chat_stream=stream_chat_completion):
+        self.qa = qa_system
+        self.chat_stream = chat_stream
+
+    async def _timed(self, timings, stage, func, *args):
+        start = time.perf_counter()
+        try:
+            with span(f"qa.{stage}"):
+                if inspect.iscoroutinefunction(func):
+                    return await func(*args)
+                return await asyncio.to_thread(func, *args)
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    def _remember(self, conversation, results, filters):
+        """Store `results` and their embeddings as the conversation's candidates for the next turn."""
+        try:
+            embeddings = self.qa.candidate_embeddings([row["tweet_id"] for row in results])
+        except Exception as e:
+            logger.error(f"Candidate embedding lookup error: {e}")
+            embeddings = {}
+        conversation.remember(results, embeddings, filters)
+
+    async def _stream_answer(self, question, results, emit, timings, start_time, deadline, degraded, summaries=()):
+        """
+        Stream the answer tokens through `emit` and return the full answer text, answering from
+        `summaries` when given and from the retrieved tweets otherwise. When `deadline` passes
+        before the first token the template answer is emitted instead; later, the answer is cut short.
+        """
+        if not results:
+            answer = "I couldn't find relevant information about that topic."
+            emit(answer)
+            return answer
+
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        stop = threading.Event()
+        if summaries:
+            context = f"Tweet summaries (computed over every matching tweet):\n{summary_context(summaries)}"
+        else:
+            context = f"Tweets:\n{build_context(results)[0]}"
+        messages = [
+            {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Question: {question}\n\n{context}"}
+        ]
+
+        def put(item):
+            if not stop.is_set():
+                loop.call_soon_threadsafe(tokens.put_nowait, item)
+
+        def produce():
+            stream = self.chat_stream(messages, temperature=0.0)
+            try:
+                for token in stream:
+                    if stop.is_set():
+                        break  # Out of time: closing the stream releases the request
+                    put(token)
+            except Exception as e:
+                put(e)
+            finally:
+                if hasattr(stream, "close"):
+                    stream.close()
+                put(_DONE)
+
+        answer_start = time.perf_counter()
+        # A plain thread rather than the loop's executor, so a late stream is never waited for
+        threading.Thread(target=produce, daemon=True).start()
+        parts = []
+        while True:
+            try:
+                token = await asyncio.wait_for(tokens.get(), timeout=deadline.timeout())
+            except asyncio.TimeoutError:
+                stop.set()
+                FALLBACKS.inc("answer")
+                degraded.append("answer")
+                logger.warning(f"LLM answer missed its deadline after {len(parts)} token(s)")
+                ending = " …" if parts else fallback_answer(results)
+                emit(ending)
+                parts.append(ending)
+                break
+            if token is _DONE:
+                break
+            if isinstance(token, Exception):
+                logger.error(f"LLM answer error: {token}")
+                degraded.append("answer")  # A partial answer must not be cached
+                error_text = f"Error generating answer: {str(token)}"
+                emit(error_text)
+                parts.append(error_text)
+                continue
+            if not parts:
+                timings["time_to_first_token"] = time.perf_counter() - start_time
+            parts.append(token)
+            emit(token)
+        timings["answer"] = time.perf_counter() - answer_start
+        return "".join(parts).strip()
+
+    @traced("qa.question")
+    async def run(self, question, emit, deadline=None, conversation=None):
+        """
+        Answer `question` within `deadline` (QA_DEADLINE by default), calling `emit(token)` for
+        each answer token, reusing the retrieval of `conversation`'s previous turn when it
+        covers the question. Returns the result dict.
+        """
+        start_time = time.perf_counter()
+        deadline = deadline or Deadline(QA_DEADLINE)
+        timings = {}
+        degraded = []
+
+        # Counts, sentiment shares and top-N lists come straight from a Cypher template
+        answer_routed = getattr(self.qa, "answer_routed", None)
+        routed = await self._timed(timings, "router", answer_routed, question) if answer_routed else None
+        if routed:
+            emit(routed["answer"])
+            timings["time_to_first_token"] = timings["total"] = time.perf_counter() - start_time
+            return {"question": question, "timings": timings, "degraded": degraded, **routed}
+
+        # 1. Keyword extraction overlaps the embedding request
+        keywords, embedding = await asyncio.gather(
+            self._timed(timings, "keywords", self.qa.extract_keywords, question),
+            self._timed(timings, "embedding", self.qa.generate_embeddings, question,
+                        deadline.child(QA_EMBEDDING_TIMEOUT)),
+        )
+        if not embedding:
+            degraded.append("embedding")  # Retrieval falls back to the keyword search
+
+        # 2. Semantic cache short-circuits retrieval and generation
+        answer_cache = getattr(self.qa, "answer_cache", None)
+        cached = answer_cache.lookup(embedding, question) if answer_cache else None
+        if cached:
+            emit(cached["answer"])
+            timings["time_to_first_token"] = timings["total"] = time.perf_counter() - start_time
+            answer_cache.record(True, timings["total"])
+            # Entries written by QASystem.process_question(s) carry no follow-up questions
+            return {"question": question, "cached": True, "timings": timings,
+                    "followup_questions": DEFAULT_FOLLOWUP_QUESTIONS, **cached}
+
+        # 3. Aggregate questions are answered from precomputed graph summaries
+        lookup_summaries = getattr(self.qa, "lookup_summaries", None)
+        summaries = await self._timed(timings, "summaries", lookup_summaries, question) if lookup_summaries else []
+        results, remember_task, reused_retrieval = summary_sources(summaries), None, False
+
+        # 4. Otherwise retrieval, from the previous turn's candidates when they cover the question
+        if summaries:
+            logger.info(f"Answering from {len(summaries)} graph summaries: {[summary['key'] for summary in summaries]}")
+        else:
+            if not hasattr(self.qa, "candidate_embeddings"):
+                conversation = None
+            if conversation is not None:
+                filters = self.qa.retrieval_filters(question)
+                results = await self._timed(timings, "retrieval", conversation.rerank, embedding, keywords, filters)
+                reused_retrieval = results is not None
+            if not reused_retrieval:
+                retrieve = getattr(self.qa, "query_knowledge_graph_async", None) or self.qa.query_knowledge_graph
+                results = await self._timed(timings, "retrieval", retrieve, question, embedding, keywords)
+                if conversation is not None:
+                    # The candidate embeddings are looked up while the answer streams
+                    remember_task = asyncio.create_task(
+                        self._timed(timings, "conversation", self._remember, conversation, results, filters)
+                    )
+            logger.info(f"Found {len(results)} relevant tweets" + (" (reused from the previous turn)" if reused_retrieval else ""))
+
+        # 5. Follow-ups start from the retrieved context while the answer streams
+        followup_task = asyncio.create_task(
+            self._timed(timings, "followups", generate_followups_from_context, question, results, self.chat_stream)
+        )
+        answer = await self._stream_answer(question, results, emit, timings, start_time,
+                                           deadline.child(QA_ANSWER_TIMEOUT), degraded, summaries)
+        try:
+            followup_questions = await asyncio.wait_for(followup_task, timeout=deadline.timeout())
+        except asyncio.TimeoutError:
+            FALLBACKS.inc("followups")
+            degraded.append("followups")
+            followup_questions = DEFAULT_FOLLOWUP_QUESTIONS
+        if remember_task:
+            try:
+                await asyncio.wait_for(remember_task, timeout=deadline.timeout())
+            except asyncio.TimeoutError:
+                logger.warning("Candidate embeddings not stored in time, the next turn queries the graph")
+
+        timings["total"] = time.perf_counter() - start_time
+        logger.info("QA stage latency: " + ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items()))
+
+        if answer_cache:
+            if results and not degraded:
+                answer_cache.add(question, embedding, {
+                    "answer": answer,
+                    "sources": results,
+                    "followup_questions": followup_questions
+                })
+            answer_cache.record(False, timings["total"])
+
+        return {
+            "question": question,
+            "answer": answer,
+            "sources": results,
+            "followup_questions": followup_questions,
+            "timings": timings,
+            "degraded": degraded,
+            "reused_retrieval": reused_retrieval,
+            "summaries": [summary["key"] for summary in summaries]
+        }
+
+    def stream(self, question, conversation=None):
+        """
+        Start answering `question` (a turn of `conversation`, if given) in a background thread
+        and return a QAStream.
+        Iterate it (e.g. with `st.write_stream`) to receive tokens, then read `stream.result`.
+        """
+        qa_stream = QAStream()
+
+        def worker():
+            # Not asyncio.run: it would wait at shutdown for executor threads still
+            # finishing requests that already missed their deadline
+            loop = asyncio.new_event_loop()
+            try:
+                qa_stream.result = loop.run_until_complete(
+                    self.run(question, qa_stream.tokens.put, conversation=conversation)
+                )
+            except Exception as e:
+                qa_stream.error = e
+            finally:
+                loop.close()
+                qa_stream.tokens.put(_DONE)
+
+        threading.Thread(target=worker, daemon=True).start()
+        return qa_stream
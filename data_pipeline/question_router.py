@@ -0,0 +1,239 @@
+# question_router.py
+"""
+This module routes questions that are really aggregates away from the RAG pipeline.
+"How many tweets mention Puma this month?", "What share of Nike tweets are negative?" or
+"Top hashtags for Adidas" are answered exactly by one Cypher aggregate over the graph, so
+`route_question` matches them with regular expressions (no model involved), a
+parameterized template runs with the brands / time window from `extract_filters`, and the
+answer is rendered from the rows - no embedding, retrieval or LLM call.
+
+Intents, checked in this order:
+- sentiment_share: percentage / share / breakdown of sentiment, per brand
+- top_hashtags, top_topics: most common hashtags or topics
+- tweet_count: number of tweets, per brand
+
+A question is only routed when nothing but the intent, brands and time window remain
+(`residual_terms`): "How many tweets mention the Nike Air Max?" or "Which topics drive
+negative sentiment for Nike?" carry qualifiers a template would silently drop, so they go
+to retrieval and the LLM. Questions asking for reasons ("why", "explain") always do too.
+Template results are cached in memory per data version, so repeated questions are answered
+without Neo4j until the next load. Routed questions are counted in `qa_routed_questions_total`.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from data_pipeline.data_version import get_data_version
+from data_pipeline.retrieval_filters import extract_filters, residual_terms, unresolved_dates
+from data_pipeline.tracing import Counter, register_metric, span
+from config import QA_ROUTER_CACHE_MAX_ENTRIES, QA_ROUTER_TOP_N
+
+ROUTED = register_metric(
+    Counter("qa_routed_questions_total", "Questions answered by a Cypher template instead of the LLM."),
+    "intent",
+)
+
+SENTIMENT = r"(?:sentiment|positive|negative|neutral)"
+SHARE = r"(?:\b(?:percent(?:age)?|share|proportion|fraction|ratio|breakdown|split|distribution)\b|%)"
+
+INTENT_PATTERNS = [
+    ("sentiment_share", re.compile(
+        rf"{SHARE}.*\b{SENTIMENT}\b|\b{SENTIMENT}\b.*{SHARE}|\bhow many\b.*\b(?:positive|negative|neutral)\b",
+        re.IGNORECASE)),
+    ("top_hashtags", re.compile(
+        r"\b(?:top|most (?:used|popular|common|frequent)|popular|trending|common|which|what)\s+(?:\w+\s+)?hashtags?\b",
+        re.IGNORECASE)),
+    ("top_topics", re.compile(
+        r"\b(?:top|most (?:discussed|popular|common|frequent)|popular|trending|common|main|which|what)\s+(?:\w+\s+)?topics?\b",
+        re.IGNORECASE)),
+    ("tweet_count", re.compile(
+        r"\bhow many (?:\w+\s+)?(?:tweets|mentions|posts)\b|\b(?:number|count|volume) of (?:\w+\s+)?(?:tweets|mentions|posts)\b",
+        re.IGNORECASE)),
+]
+
+# Words each intent's own phrasing may use, on top of brands, time windows and function words
+INTENT_VOCABULARY = {
+    "sentiment_share": frozenset("""
+        sentiment sentiments positive negative neutral percent percentage share proportion fraction
+        ratio breakdown split distribution
+    """.split()),
+    "top_hashtags": frozenset("top most used popular common frequent trending main biggest hashtag hashtags".split()),
+    "top_topics": frozenset("top most discussed popular common frequent trending main biggest topic topics".split()),
+    "tweet_count": frozenset(),
+}
+
+# Questions about reasons or content need the generative answer
+NEEDS_LLM = re.compile(r"\b(?:why|explain|reasons?|what do (?:people|users|they) say)\b", re.IGNORECASE)
+
+# Per-brand rows when brands are named, one overall row (brand null) otherwise
+BRAND_GROUPS = "CASE WHEN size($brands) = 0 THEN [null] ELSE [b IN coalesce(t.brands, []) WHERE b IN $brands] END"
+
+TEMPLATES = {
+    "tweet_count": """
+    // query: router.tweet_count
+    MATCH (t:Tweet) WHERE {where}
+    UNWIND {groups} AS brand
+    RETURN brand, count(t) AS tweets
+    ORDER BY tweets DESC
+    """,
+    "sentiment_share": """
+    // query: router.sentiment_share
+    MATCH (t:Tweet)-[:HAS_SENTIMENT]->(s:Sentiment) WHERE {where}
+    UNWIND {groups} AS brand
+    RETURN brand, s.label AS sentiment, count(t) AS tweets
+    ORDER BY brand, tweets DESC
+    """,
+    "top_hashtags": """
+    // query: router.top_hashtags
+    MATCH (t:Tweet)-[:CONTAINS_HASHTAG]->(h:Hashtag) WHERE {where}
+    RETURN h.tag AS name, count(t) AS tweets
+    ORDER BY tweets DESC
+    LIMIT $limit
+    """,
+    "top_topics": """
+    // query: router.top_topics
+    MATCH (t:Tweet)-[:BELONGS_TO_TOPIC]->(topic:Topic) WHERE {where}
+    RETURN topic.name AS name, count(t) AS tweets
+    ORDER BY tweets DESC
+    LIMIT $limit
+    """,
+}
+
+FOLLOWUP_QUESTIONS = {
+    "tweet_count": "How many tweets mention {subject}?",
+    "sentiment_share": "What is the sentiment breakdown for {subject}?",
+    "top_hashtags": "What are the top hashtags for {subject}?",
+    "top_topics": "What are the top topics for {subject}?",
+}
+
+class Route:
+    """A question's template intent and the RetrievalFilter its parameters come from."""
+
+    def __init__(self, intent, filters):
+        self.intent = intent
+        self.filters = filters
+
+    def __repr__(self):
+        return f"Route(intent={self.intent}, filters={self.filters})"
+
+    def query(self, top_n=QA_ROUTER_TOP_N):
+        """Cypher text and parameters of the route's template."""
+        cypher = TEMPLATES[self.intent].format(where=self.filters.cypher("t"), groups=BRAND_GROUPS)
+        return cypher, {**self.filters.to_params(), "limit": top_n}
+
+def route_question(question, today=None):
+    """The Route of a question a template answers, or None when it needs the RAG pipeline."""
+    if NEEDS_LLM.search(question):
+        return None
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(question):
+            if residual_terms(question, INTENT_VOCABULARY[intent]):
+                return None  # Qualifiers the template cannot express
+            filters = extract_filters(question, today)
+            if unresolved_dates(question, filters):
+                return None  # Answering for all time would misstate the count
+            return Route(intent, filters)
+    return None
+
+def describe_period(filters):
+    if filters.since and filters.since == filters.until:
+        return f" on {filters.since}"
+    if filters.since and filters.until:
+        return f" between {filters.since} and {filters.until}"
+    if filters.since:
+        return f" since {filters.since}"
+    if filters.until:
+        return f" until {filters.until}"
+    return ""
+
+def describe_subject(brands, joiner="or"):
+    return f" {joiner} ".join(brands) if brands else "sportswear brands"
+
+def render_answer(route, rows):
+    """Deterministic answer text for a template's rows."""
+    filters = route.filters
+    period = describe_period(filters)
+    subject = describe_subject(filters.brands)
+    if route.intent == "tweet_count":
+        if not rows:
+            return f"No tweets mention {subject}{period}."
+        if not filters.brands:
+            return f"There are {rows[0]['tweets']:,} tweets{period}."
+        return "\n".join(f"{row['tweets']:,} tweets mention {row['brand']}{period}." for row in rows)
+
+    if route.intent == "sentiment_share":
+        if not rows:
+            return f"No tweets with a sentiment label mention {subject}{period}."
+        groups = OrderedDict()
+        for row in rows:
+            groups.setdefault(row["brand"], []).append(row)
+        lines = []
+        for brand, brand_rows in groups.items():
+            total = sum(row["tweets"] for row in brand_rows)
+            shares = ", ".join(
+                f"{row['tweets'] / total:.0%} {(row['sentiment'] or 'unlabelled').lower()} ({row['tweets']:,})"
+                for row in brand_rows
+            )
+            lines.append(f"Sentiment of {total:,} tweets{' mentioning ' + brand if brand else ''}{period}: {shares}.")
+        return "\n".join(lines)
+
+    kind = "hashtags" if route.intent == "top_hashtags" else "topics"
+    if not rows:
+        return f"No {kind} found in tweets mentioning {subject}{period}."
+    entries = ", ".join(
+        f"{'#' if kind == 'hashtags' else ''}{row['name']} ({row['tweets']:,} tweets)" for row in rows
+    )
+    return f"Top {kind} in tweets mentioning {subject}{period}: {entries}."
+
+def followup_questions(route):
+    subject = describe_subject(route.filters.brands, "and")
+    return [question.format(subject=subject) for intent, question in FOLLOWUP_QUESTIONS.items() if intent != route.intent][:3]
+
+class QuestionRouter:
+    """Runs routed questions' templates, with results cached per data version."""
+
+    def __init__(self, max_entries=QA_ROUTER_CACHE_MAX_ENTRIES, top_n=QA_ROUTER_TOP_N):
+        self.max_entries = max_entries
+        self.top_n = top_n
+        self._results = OrderedDict()  # (version, cypher, params) -> rows, least recently used first
+        self._lock = threading.Lock()
+
+    def _rows(self, session, route):
+        cypher, params = route.query(self.top_n)
+        key = (get_data_version(), cypher, json.dumps(params, sort_keys=True))
+        with self._lock:
+            rows = self._results.get(key)
+            if rows is not None:
+                self._results.move_to_end(key)
+                return rows
+        with span("neo4j.route_template", intent=route.intent):
+            rows = session.run(cypher, params).data()
+        with self._lock:
+            self._results[key] = rows
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return rows
+
+    def answer(self, session, route):
+        """The result dict for a routed question."""
+        answer = render_answer(route, self._rows(session, route))
+        ROUTED.inc(route.intent)
+        return {
+            "answer": answer,
+            "sources": [],
+            "followup_questions": followup_questions(route),
+            "route": route.intent,
+        }
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_question_router():
+    """Process-wide QuestionRouter, so the template cache is shared by every QA system."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = QuestionRouter()
+        return _router
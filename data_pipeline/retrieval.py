@@ -0,0 +1,441 @@
+# retrieval.py
+"""
+This module holds the hybrid tweet retrieval shared by the QA systems.
+Two candidate lists are retrieved independently:
+- vector hits from a retrieval backend, either the Neo4j server's vector index or the
+  in-process ANN index from `data_pipeline.ann_index`
+- keyword hits from the Neo4j full-text (Lucene/BM25) index on `Tweet.text`
+They are merged with reciprocal-rank fusion, so tweets that only match the keywords are
+retrieved too, and the fused list is joined to its graph context (user, sentiment, topic)
+in a single batched Cypher statement.
+`hybrid_search_many` does the same for a list of questions with one round trip per stage
+(vector, full-text, graph context) instead of one per question.
+`hybrid_search_async` is the asyncio-driver variant used by the QA service; its vector and
+full-text searches run concurrently in separate sessions.
+Backends also return the stored embeddings of given tweets (`backend.embeddings`), which
+`data_pipeline.conversation` keeps to re-rank follow-up questions locally.
+Without an embedding (the embedding request missed its deadline) `hybrid_search` and
+`hybrid_search_async` fall back to the keyword hits alone; when the full-text search fails
+(e.g. the index does not exist yet) every search falls back to the vector hits alone.
+Every search takes an optional RetrievalFilter (brands / time window, see
+`data_pipeline.retrieval_filters`) that restricts it to the eligible tweets up front.
+"""
+
+import asyncio
+import logging
+import re
+
+from data_pipeline.ann_index import get_ann_index
+from data_pipeline.retrieval_filters import RetrievalFilter
+from data_pipeline.tracing import span
+from config import (
+    NEO4J_DATABASE, QA_RETRIEVAL_BACKEND, FULLTEXT_INDEX_NAME, RRF_K,
+    VECTOR_FILTER_OVERFETCH, ANN_FILTER_EXACT_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+# The full-text index cannot pre-filter, so filtered keyword searches fetch this many times
+# more hits before dropping the ineligible ones
+KEYWORD_FILTER_OVERFETCH = 5
+
+# Filter conditions on tweet `t` for a per-question `item` map in UNWIND statements
+ITEM_FILTER = """
+    (item.since IS NULL OR t.date >= item.since)
+    AND (item.until IS NULL OR t.date <= item.until)
+    AND (size(item.brands) = 0 OR any(b IN coalesce(t.brands, []) WHERE b IN item.brands))
+"""
+
+# Characters with a meaning in Lucene query syntax
+LUCENE_SPECIAL_CHARS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+# Graph context for the fused hits, one round trip for the whole list
+CONTEXT_QUERY = """
+        // query: retrieval.graph_context
+        UNWIND $hits AS hit
+        MATCH (t:Tweet {tweet_id: hit.tweet_id})
+
+        // Get related information
+        OPTIONAL MATCH (t)<-[:POSTED]-(u:User)
+        OPTIONAL MATCH (t)-[:HAS_SENTIMENT]->(s:Sentiment)
+        OPTIONAL MATCH (t)-[:BELONGS_TO_TOPIC]->(topic:Topic)
+
+        // Return results with the fused relevance score
+        RETURN
+            t.tweet_id AS tweet_id,
+            t.text AS tweet,
+            t.created_at AS created,
+            t.date AS date,
+            u.screen_name AS user,
+            t.retweet_count AS retweet_count,
+            t.like_count AS like_count,
+            s.label AS sentiment,
+            topic.name AS topic,
+            t.location AS location,
+            hit.semanticScore AS semanticScore,
+            hit.keywordScore AS keywordScore,
+            hit.relevance AS relevance
+
+        ORDER BY relevance DESC
+"""
+
+class Neo4jVectorBackend:
+    """
+    Vector search on the Neo4j server's `tweet_embeddings` index.
+    The vector index has no pre-filtering, so filtered searches fetch VECTOR_FILTER_OVERFETCH
+    times more neighbours and drop the ineligible ones. When fewer than `top_k` survive (a
+    narrow filter), the eligible tweets are ranked by exact cosine similarity instead, as long
+    as there are at most ANN_FILTER_EXACT_MAX of them; beyond that the survivors are returned.
+    """
+    name = "neo4j"
+    query = """
+        // query: retrieval.vector
+        CALL db.index.vector.queryNodes('tweet_embeddings', $topK, $embedding)
+        YIELD node, score
+        RETURN node.tweet_id AS tweet_id, score
+        """
+
+    def _query(self, filters):
+        if not filters:
+            return self.query, {}
+        return f"""
+        // query: retrieval.vector_filtered
+        CALL db.index.vector.queryNodes('tweet_embeddings', $fetchK, $embedding)
+        YIELD node AS t, score
+        WITH t, score WHERE {filters.cypher("t")}
+        RETURN t.tweet_id AS tweet_id, score
+        ORDER BY score DESC
+        LIMIT $topK
+        """, filters.to_params()
+
+    def _exact_query(self, filters):
+        # Reads at most exactLimit eligible tweets, and returns nothing when there are more
+        return f"""
+        // query: retrieval.vector_exact
+        MATCH (t:Tweet)
+        WHERE t.embedding IS NOT NULL AND {filters.cypher("t")}
+        WITH t LIMIT $exactLimit
+        WITH collect(t) AS eligible
+        WHERE size(eligible) <= $exactMax
+        UNWIND eligible AS t
+        WITH t, vector.similarity.cosine(t.embedding, $embedding) AS score
+        ORDER BY score DESC
+        LIMIT $topK
+        RETURN t.tweet_id AS tweet_id, score
+        """, filters.to_params()
+
+    @staticmethod
+    def _params(embedding, top_k):
+        return {"embedding": embedding, "topK": top_k, "fetchK": top_k * VECTOR_FILTER_OVERFETCH,
+                "exactMax": ANN_FILTER_EXACT_MAX, "exactLimit": ANN_FILTER_EXACT_MAX + 1}
+
+    def search(self, session, embedding, top_k, filters=None):
+        query, params = self._query(filters)
+        result = session.run(query, {**self._params(embedding, top_k), **params})
+        hits = [(record["tweet_id"], record["score"]) for record in result]
+        if filters and len(hits) < top_k:
+            query, params = self._exact_query(filters)
+            result = session.run(query, {**self._params(embedding, top_k), **params})
+            hits = [(record["tweet_id"], record["score"]) for record in result] or hits
+        return hits
+
+    async def search_async(self, async_driver, embedding, top_k, filters=None):
+        query, params = self._query(filters)
+        async with async_driver.session(database=NEO4J_DATABASE) as session:
+            result = await session.run(query, {**self._params(embedding, top_k), **params})
+            hits = [(record["tweet_id"], record["score"]) async for record in result]
+            if filters and len(hits) < top_k:
+                query, params = self._exact_query(filters)
+                result = await session.run(query, {**self._params(embedding, top_k), **params})
+                hits = [(record["tweet_id"], record["score"]) async for record in result] or hits
+            return hits
+
+    def embeddings(self, session, tweet_ids):
+        result = session.run("""
+        // query: retrieval.embeddings
+        UNWIND $ids AS id
+        MATCH (t:Tweet {tweet_id: id}) WHERE t.embedding IS NOT NULL
+        RETURN t.tweet_id AS tweet_id, t.embedding AS embedding
+        """, {"ids": list(tweet_ids)})
+        return {record["tweet_id"]: record["embedding"] for record in result}
+
+    def search_many(self, session, embeddings, top_k, filter_list=None):
+        filter_list = filter_list or [None] * len(embeddings)
+        hits = [[] for _ in embeddings]
+        unfiltered = [i for i, filters in enumerate(filter_list) if not filters]
+        filtered = [
+            {"i": i, "embedding": embeddings[i], **filter_list[i].to_params()}
+            for i, filters in enumerate(filter_list) if filters
+        ]
+        params = self._params(None, top_k)
+        records = []
+        if unfiltered:
+            records += session.run("""
+            // query: retrieval.vector_batch
+            UNWIND $rows AS i
+            CALL db.index.vector.queryNodes('tweet_embeddings', $topK, $embeddings[i])
+            YIELD node, score
+            RETURN i, node.tweet_id AS tweet_id, score
+            ORDER BY i, score DESC
+            """, {"rows": unfiltered, "embeddings": embeddings, "topK": top_k}).data()
+        if filtered:
+            records += session.run(f"""
+            // query: retrieval.vector_batch_filtered
+            UNWIND $items AS item
+            CALL {{
+                WITH item
+                CALL db.index.vector.queryNodes('tweet_embeddings', $fetchK, item.embedding)
+                YIELD node AS t, score
+                WITH t, score WHERE {ITEM_FILTER}
+                RETURN t.tweet_id AS tweet_id, score
+                ORDER BY score DESC
+                LIMIT $topK
+            }}
+            RETURN item.i AS i, tweet_id, score
+            ORDER BY i, score DESC
+            """, {**params, "items": filtered}).data()
+        for record in records:
+            hits[record["i"]].append((record["tweet_id"], record["score"]))
+
+        # Narrow filters: exact ranking of the eligible tweets, where there are few enough of them
+        short = [item for item in filtered if len(hits[item["i"]]) < top_k]
+        if short:
+            exact = {}
+            for record in session.run(f"""
+            // query: retrieval.vector_batch_exact
+            UNWIND $items AS item
+            CALL {{
+                WITH item
+                MATCH (t:Tweet)
+                WHERE t.embedding IS NOT NULL AND {ITEM_FILTER}
+                WITH t LIMIT $exactLimit
+                WITH item, collect(t) AS eligible
+                WHERE size(eligible) <= $exactMax
+                UNWIND eligible AS t
+                WITH t, vector.similarity.cosine(t.embedding, item.embedding) AS score
+                ORDER BY score DESC
+                LIMIT $topK
+                RETURN t.tweet_id AS tweet_id, score
+            }}
+            RETURN item.i AS i, tweet_id, score
+            ORDER BY i, score DESC
+            """, {**params, "items": short}).data():
+                exact.setdefault(record["i"], []).append((record["tweet_id"], record["score"]))
+            for i, exact_hits in exact.items():
+                hits[i] = exact_hits
+        return hits
+
+class LocalANNBackend:
+    """Vector search in the embedded ANN index, without a round trip to Neo4j."""
+    name = "local"
+
+    def __init__(self, index=None):
+        self.index = index or get_ann_index()
+
+    def search(self, session, embedding, top_k, filters=None):
+        return self.index.search(embedding, top_k, filters)
+
+    def search_many(self, session, embeddings, top_k, filter_list=None):
+        filter_list = filter_list or [None] * len(embeddings)
+        return [self.index.search(embedding, top_k, filters) for embedding, filters in zip(embeddings, filter_list)]
+
+    async def search_async(self, async_driver, embedding, top_k, filters=None):
+        return await asyncio.to_thread(self.index.search, embedding, top_k, filters)
+
+    def embeddings(self, session, tweet_ids):
+        return self.index.vectors_for(tweet_ids)
+
+RETRIEVAL_BACKENDS = {
+    "neo4j": Neo4jVectorBackend,
+    "local": LocalANNBackend,
+}
+
+def get_retrieval_backend(name=QA_RETRIEVAL_BACKEND):
+    """Create the configured retrieval backend."""
+    try:
+        return RETRIEVAL_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown retrieval backend '{name}', expected one of {sorted(RETRIEVAL_BACKENDS)}")
+
+def ensure_fulltext_index(session):
+    """Create the full-text index on tweet text if it does not exist yet."""
+    session.run(f"""
+    CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} IF NOT EXISTS
+    FOR (t:Tweet) ON EACH [t.text]
+    """)
+
+def ensure_filter_indexes(session):
+    """
+    Support filtered retrieval: a range index on Tweet.date. The `brands` list is set by the
+    loader; tweets loaded before it was are backfilled once by `testing/backfill_tweet_brands.py`.
+    """
+    session.run("CREATE INDEX tweet_date IF NOT EXISTS FOR (t:Tweet) ON (t.date)")
+
+def build_fulltext_query(keywords):
+    """OR the escaped keywords together as a Lucene query."""
+    terms = [LUCENE_SPECIAL_CHARS.sub(r"\\\1", k) for k in dict.fromkeys(keywords) if k]
+    return " OR ".join(terms)
+
+def fulltext_cypher(filters):
+    """Full-text query statement, dropping ineligible hits when `filters` is set."""
+    if not filters:
+        return f"""
+        // query: retrieval.fulltext
+        CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX_NAME}', $query, {{limit: $topK}})
+        YIELD node, score
+        RETURN node.tweet_id AS tweet_id, score
+        """
+    return f"""
+        // query: retrieval.fulltext_filtered
+        CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX_NAME}', $query, {{limit: $topK * {KEYWORD_FILTER_OVERFETCH}}})
+        YIELD node AS t, score
+        WHERE {filters.cypher("t")}
+        RETURN t.tweet_id AS tweet_id, score
+        LIMIT $topK
+        """
+
+def fulltext_search(session, keywords, top_k, filters=None):
+    """Return up to `top_k` (tweet_id, BM25 score) pairs for tweets matching any keyword."""
+    query = build_fulltext_query(keywords)
+    if not query:
+        return []
+    params = filters.to_params() if filters else {}
+    result = session.run(fulltext_cypher(filters), {"query": query, "topK": top_k, **params})
+    return [(record["tweet_id"], record["score"]) for record in result]
+
+async def fulltext_search_async(async_driver, keywords, top_k, filters=None):
+    """`fulltext_search` on the asyncio driver."""
+    query = build_fulltext_query(keywords)
+    if not query:
+        return []
+    params = filters.to_params() if filters else {}
+    async with async_driver.session(database=NEO4J_DATABASE) as session:
+        result = await session.run(fulltext_cypher(filters), {"query": query, "topK": top_k, **params})
+        return [(record["tweet_id"], record["score"]) async for record in result]
+
+def fulltext_search_many(session, keyword_lists, top_k, filter_list=None):
+    """`fulltext_search` for several keyword lists in one statement; returns one hit list per input."""
+    filter_list = filter_list or [None] * len(keyword_lists)
+    items = [
+        {
+            "i": i,
+            "query": build_fulltext_query(keywords),
+            "fetch": top_k * KEYWORD_FILTER_OVERFETCH if filters else top_k,
+            **(filters or RetrievalFilter()).to_params(),
+        }
+        for i, (keywords, filters) in enumerate(zip(keyword_lists, filter_list))
+    ]
+    items = [item for item in items if item["query"]]  # An empty Lucene query is an error
+    hits = [[] for _ in keyword_lists]
+    if not items:
+        return hits
+    result = session.run(f"""
+    UNWIND $items AS item
+    CALL {{
+        WITH item
+        CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX_NAME}', item.query, {{limit: item.fetch}})
+        YIELD node AS t, score
+        WITH t, score WHERE {ITEM_FILTER}
+        RETURN t.tweet_id AS tweet_id, score
+        ORDER BY score DESC
+        LIMIT $topK
+    }}
+    RETURN item.i AS i, tweet_id, score
+    ORDER BY i, score DESC
+    """, {"items": items, "topK": top_k})
+    for record in result:
+        hits[record["i"]].append((record["tweet_id"], record["score"]))
+    return hits
+
+def reciprocal_rank_fusion(vector_hits, keyword_hits, k=RRF_K, limit=50):
+    """
+    Merge two ranked (tweet_id, score) lists: each tweet scores sum(1 / (k + rank)) over the
+    lists it appears in. The original scores are kept for display.
+    """
+    fused = {}
+    for field, hits in (("semanticScore", vector_hits), ("keywordScore", keyword_hits)):
+        for rank, (tweet_id, score) in enumerate(hits, 1):
+            hit = fused.setdefault(tweet_id, {
+                "tweet_id": tweet_id, "semanticScore": 0.0, "keywordScore": 0.0, "relevance": 0.0
+            })
+            hit[field] = score
+            hit["relevance"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: hit["relevance"], reverse=True)[:limit]
+
+def hybrid_search(session, embedding, keywords, backend, top_k=100, limit=50, filters=None):
+    """
+    Run vector + full-text retrieval in an open Neo4j session and return the fused result rows,
+    restricted to the tweets matching `filters` (a RetrievalFilter) when given.
+    An empty `embedding` skips the vector search.
+    """
+    vector_hits = []
+    if embedding:
+        with span("retrieval.vector_search", backend=type(backend).__name__, filtered=bool(filters)):
+            vector_hits = backend.search(session, embedding, top_k, filters)
+    try:
+        with span("neo4j.fulltext_search"):
+            keyword_hits = fulltext_search(session, keywords, top_k, filters)
+    except Exception as e:
+        logger.warning(f"Full-text search failed, using vector hits only: {e}")
+        keyword_hits = []
+    hits = reciprocal_rank_fusion(vector_hits, keyword_hits, limit=limit)
+    if not hits:
+        return []
+    with span("neo4j.graph_context", rows=len(hits)):
+        return session.run(CONTEXT_QUERY, {"hits": hits}).data()
+
+def hybrid_search_many(session, embeddings, keyword_lists, backend, top_k=100, limit=50, filter_list=None):
+    """
+    `hybrid_search` for several questions at once (with one optional RetrievalFilter each);
+    returns one result list per embedding.
+    The graph context of every tweet retrieved for any question is fetched in one query and
+    each question's rows carry that question's own scores.
+    """
+    if not embeddings:
+        return []
+    with span("retrieval.vector_search", backend=type(backend).__name__, questions=len(embeddings)):
+        vector_hits = backend.search_many(session, embeddings, top_k, filter_list)
+    try:
+        with span("neo4j.fulltext_search", questions=len(embeddings)):
+            keyword_hits = fulltext_search_many(session, keyword_lists, top_k, filter_list)
+    except Exception as e:
+        logger.warning(f"Full-text search failed, using vector hits only: {e}")
+        keyword_hits = [[] for _ in embeddings]
+    fused = [
+        reciprocal_rank_fusion(vectors, keywords, limit=limit)
+        for vectors, keywords in zip(vector_hits, keyword_hits)
+    ]
+    unique_hits = list({hit["tweet_id"]: hit for hits in fused for hit in hits}.values())
+    if not unique_hits:
+        return [[] for _ in embeddings]
+    with span("neo4j.graph_context", rows=len(unique_hits)):
+        context = {row["tweet_id"]: row for row in session.run(CONTEXT_QUERY, {"hits": unique_hits}).data()}
+    return [
+        [{**context[hit["tweet_id"]], **hit} for hit in hits if hit["tweet_id"] in context]
+        for hits in fused
+    ]
+
+async def hybrid_search_async(async_driver, embedding, keywords, backend, top_k=100, limit=50, filters=None):
+    """`hybrid_search` on the asyncio driver, with the vector and full-text searches in parallel."""
+    async def vector_search():
+        if not embedding:
+            return []
+        with span("retrieval.vector_search", backend=type(backend).__name__, filtered=bool(filters)):
+            return await backend.search_async(async_driver, embedding, top_k, filters)
+
+    async def keyword_search():
+        try:
+            with span("neo4j.fulltext_search"):
+                return await fulltext_search_async(async_driver, keywords, top_k, filters)
+        except Exception as e:
+            logger.warning(f"Full-text search failed, using vector hits only: {e}")
+            return []
+
+    vector_hits, keyword_hits = await asyncio.gather(vector_search(), keyword_search())
+    hits = reciprocal_rank_fusion(vector_hits, keyword_hits, limit=limit)
+    if not hits:
+        return []
+    with span("neo4j.graph_context", rows=len(hits)):
+        async with async_driver.session(database=NEO4J_DATABASE) as session:
+            result = await session.run(CONTEXT_QUERY, {"hits": hits})
+            return await result.data()
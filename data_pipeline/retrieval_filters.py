@@ -0,0 +1,168 @@
+# retrieval_filters.py
+"""
+This module extracts brand and time-window constraints from a question, so retrieval can
+search only the eligible tweets instead of over-fetching global nearest neighbours.
+"Puma sentiment last week" becomes brands=["Puma"], since=<7 days ago>; tweets are matched
+on the brands they mention (DASHBOARD_BRANDS, case-insensitive substring as in the rollup)
+and on their DATE.
+"""
+
+import calendar
+import re
+from datetime import date, timedelta
+
+from config import DASHBOARD_BRANDS
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+RELATIVE_WINDOW = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b", re.IGNORECASE)
+SINGLE_WINDOW = re.compile(r"\b(?:last|past|previous)\s+(day|week|month|year)\b", re.IGNORECASE)
+MONTH_NAME = re.compile(rf"\b(?:in\s+)?({'|'.join(sorted(MONTHS, key=len, reverse=True))})\b(?:\s+(\d{{4}}))?", re.IGNORECASE)
+ISO_DATE = re.compile(r"\b(since|after|from|before|until|to|through|on)?\s*(\d{4}-\d{2}-\d{2})\b", re.IGNORECASE)
+DATE_RANGE = re.compile(r"\b(?:between|from)\s+(\d{4}-\d{2}-\d{2})\s+(?:and|to|until|through)\s+(\d{4}-\d{2}-\d{2})\b",
+                        re.IGNORECASE)
+START_KEYWORDS = ("since", "after", "from")
+END_KEYWORDS = ("before", "until", "to", "through")
+NAMED_WINDOW = re.compile(r"\b(?:today|yesterday|(?:this|last)\s+(?:week|month|year))\b", re.IGNORECASE)
+TIME_EXPRESSIONS = [RELATIVE_WINDOW, SINGLE_WINDOW, NAMED_WINDOW, DATE_RANGE, ISO_DATE, MONTH_NAME]
+
+WORD = re.compile(r"[a-z0-9]+")
+# Words that add no constraint of their own to a question about tweets
+FUNCTION_WORDS = frozenset("""
+a an the of for in on at about to by with from and or vs versus between across per each all any
+is are was were be been being do does did has have had there it its their they them this that these those
+i me my we our you your what whats which how who many much show give tell list get please can could would
+so far since after before until during over now currently overall total
+tweet tweets post posts mention mentions mentioned mentioning brand brands sportswear number count volume
+""".split())
+
+def brands_mentioned(text):
+    """DASHBOARD_BRANDS mentioned in `text`, in config order."""
+    if not isinstance(text, str):
+        return []
+    text = text.lower()
+    return [brand for brand in DASHBOARD_BRANDS if brand.lower() in text]
+
+def residual_terms(question, vocabulary=()):
+    """
+    Words of `question` that are not a brand, a time expression, a function word or in
+    `vocabulary`: the qualifiers ("running shoes", "Air Max", "recall") that a brand / time
+    RetrievalFilter cannot express.
+    """
+    text = re.sub(r"'s\b", " ", question.lower())  # Possessives ("Nike's")
+    for brand in DASHBOARD_BRANDS:
+        text = text.replace(brand.lower(), " ")
+    for pattern in TIME_EXPRESSIONS:
+        text = pattern.sub(" ", text)
+    return [word for word in WORD.findall(text)
+            if word not in FUNCTION_WORDS and word not in vocabulary and not word.isdigit()]
+
+def unresolved_dates(question, filters):
+    """Whether `question` has dates that `filters` (from extract_filters) could not turn into a window."""
+    return bool(ISO_DATE.search(question)) and not (filters.since or filters.until)
+
+class RetrievalFilter:
+    """Eligible-tweet constraints: any of `brands` mentioned, DATE within [since, until] (ISO strings)."""
+
+    def __init__(self, brands=(), since=None, until=None):
+        self.brands = list(brands)
+        self.since = since
+        self.until = until
+
+    def __bool__(self):
+        return bool(self.brands or self.since or self.until)
+
+    def __repr__(self):
+        return f"RetrievalFilter(brands={self.brands}, since={self.since}, until={self.until})"
+
+    def to_params(self):
+        return {"brands": self.brands, "since": self.since, "until": self.until}
+
+    def cypher(self, node="t"):
+        """WHERE conditions on `node` for the constraints that are set, using the to_params() names."""
+        conditions = []
+        if self.since:
+            conditions.append(f"{node}.date >= $since")
+        if self.until:
+            conditions.append(f"{node}.date <= $until")
+        if self.brands:
+            conditions.append(f"any(b IN coalesce({node}.brands, []) WHERE b IN $brands)")
+        return " AND ".join(conditions) or "true"
+
+    def within(self, other):
+        """
+        Whether every tweet this filter admits is admitted by `other` (a RetrievalFilter or None):
+        a subset of its brands and the same or a narrower window. Constraints left unset here
+        are taken to be `other`'s, as a follow-up question inherits them from the one before.
+        """
+        if other is None:
+            return True
+        if self.brands and other.brands and not set(self.brands) <= set(other.brands):
+            return False
+        if self.since and other.since and self.since < other.since:
+            return False
+        return not (self.until and other.until and self.until > other.until)
+
+    def matches(self, row):
+        """Whether a retrieved row (its `tweet` text and `date`) satisfies the constraints that are set."""
+        date = str(row.get("date") or "")
+        if self.since and not date >= self.since:
+            return False
+        if self.until and not (date and date <= self.until):
+            return False
+        return not self.brands or bool(set(brands_mentioned(row.get("tweet"))) & set(self.brands))
+
+def _month_window(month, year, today):
+    if year is None:
+        # A bare month name means its most recent occurrence
+        year = today.year if month <= today.month else today.year - 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day)
+
+def extract_filters(question, today=None):
+    """Build the RetrievalFilter implied by `question` (empty when it names no brand or period)."""
+    today = today or date.today()
+    text = question.lower()
+    since = until = None
+
+    if "today" in text:
+        since = until = today
+    elif "yesterday" in text:
+        since = until = today - timedelta(days=1)
+    elif re.search(r"\blast year\b", text):
+        since, until = date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    elif match := RELATIVE_WINDOW.search(text):
+        since = today - timedelta(days=int(match.group(1)) * UNIT_DAYS[match.group(2).lower()])
+    elif match := SINGLE_WINDOW.search(text):
+        since = today - timedelta(days=UNIT_DAYS[match.group(1).lower()])
+    elif "this week" in text:
+        since = today - timedelta(days=today.weekday())
+    elif "this month" in text:
+        since = today.replace(day=1)
+    elif "this year" in text:
+        since = today.replace(month=1, day=1)
+    elif match := DATE_RANGE.search(text):
+        # "between X and Y", "from X to Y"
+        since, until = sorted(date.fromisoformat(value) for value in match.groups())
+    elif matches := ISO_DATE.findall(text):
+        starts = [date.fromisoformat(value) for keyword, value in matches if keyword.lower() in START_KEYWORDS]
+        ends = [date.fromisoformat(value) for keyword, value in matches if keyword.lower() in END_KEYWORDS]
+        if len(matches) == 1 and not starts and not ends:
+            since = until = date.fromisoformat(matches[0][1])  # A single date ("on 2026-01-05") is that day
+        elif len(starts) + len(ends) == len(matches) and len(starts) <= 1 and len(ends) <= 1:
+            since = starts[0] if starts else None
+            until = ends[0] if ends else None
+        # Otherwise several dates that cannot be told apart: no time window rather than a guess
+    elif (match := MONTH_NAME.search(question)) and (match.group(1).lower() not in ("may", "mar") or match.group(2)
+                                                      or re.search(rf"\bin\s+{match.group(1).lower()}\b", text)):
+        # "may" and "mar" are also ordinary words, so they need a year or a leading "in"
+        since, until = _month_window(MONTHS[match.group(1).lower()], int(match.group(2)) if match.group(2) else None, today)
+
+    return RetrievalFilter(
+        brands=brands_mentioned(question),
+        since=since.isoformat() if since else None,
+        until=until.isoformat() if until else None,
+    )
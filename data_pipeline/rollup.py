@@ -0,0 +1,112 @@
+# rollup.py
+"""
+This module maintains the dashboard rollup table in Snowflake.
+The rollup aggregates FINAL_TWEETS at (date, brand, sentiment, topic) grain with tweet,
+like and retweet counts. It is updated incrementally with only the rows inserted by each
+enrichment run, so dashboard aggregates no longer scan the raw tweets.
+"""
+
+import json
+from config import SNOWFLAKE_ROLLUP_TABLE, DASHBOARD_BRANDS
+from data_pipeline.tracing import span
+
+def brand_case_sql(column="TEXT"):
+    """SQL expression assigning each tweet to the first brand it mentions, or 'Other'."""
+    whens = " ".join(f"WHEN {column} ILIKE '%{brand}%' THEN '{brand}'" for brand in DASHBOARD_BRANDS)
+    return f"CASE {whens} ELSE 'Other' END"
+
+def rollup_source_sql(where_clause=""):
+    """Aggregate FINAL_TWEETS rows to rollup grain."""
+    return f"""
+    SELECT
+        DATE,
+        {brand_case_sql()} AS BRAND,
+        SENTIMENT,
+        TOPIC,
+        COUNT(*) AS TWEET_COUNT,
+        SUM(LIKE_COUNT) AS LIKE_COUNT,
+        SUM(RETWEET_COUNT) AS RETWEET_COUNT
+    FROM FINAL_TWEETS
+    {where_clause}
+    GROUP BY 1, 2, 3, 4
+    """
+
+def ensure_rollup_table(cursor):
+    """Create the rollup table if it does not exist yet."""
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SNOWFLAKE_ROLLUP_TABLE} (
+        DATE DATE,
+        BRAND VARCHAR,
+        SENTIMENT VARCHAR,
+        TOPIC VARCHAR,
+        TWEET_COUNT NUMBER,
+        LIKE_COUNT NUMBER,
+        RETWEET_COUNT NUMBER
+    )
+    """)
+
+def update_dashboard_rollup(conn, tweet_ids):
+    """
+    Fold newly inserted FINAL_TWEETS rows into the rollup table.
+    Only the given tweet IDs are aggregated, so the cost depends on the size of the load,
+    not on the size of FINAL_TWEETS.
+    """
+    tweet_ids = [str(tweet_id) for tweet_id in tweet_ids]
+    if not tweet_ids:
+        return
+
+    print(f"🔁 Updating {SNOWFLAKE_ROLLUP_TABLE} with {len(tweet_ids)} new tweet(s)...")
+    cursor = conn.cursor()
+    try:
+        ensure_rollup_table(cursor)
+        source = rollup_source_sql(
+            "WHERE TWEET_ID IN (SELECT VALUE::STRING FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))"
+        )
+        with span("snowflake.merge_rollup", rows=len(tweet_ids)):
+            cursor.execute(f"""
+        MERGE INTO {SNOWFLAKE_ROLLUP_TABLE} r
+        USING ({source}) s
+        ON r.DATE = s.DATE
+            AND r.BRAND = s.BRAND
+            AND EQUAL_NULL(r.SENTIMENT, s.SENTIMENT)
+            AND EQUAL_NULL(r.TOPIC, s.TOPIC)
+        WHEN MATCHED THEN UPDATE SET
+            r.TWEET_COUNT = r.TWEET_COUNT + s.TWEET_COUNT,
+            r.LIKE_COUNT = r.LIKE_COUNT + s.LIKE_COUNT,
+            r.RETWEET_COUNT = r.RETWEET_COUNT + s.RETWEET_COUNT
+        WHEN NOT MATCHED THEN INSERT (DATE, BRAND, SENTIMENT, TOPIC, TWEET_COUNT, LIKE_COUNT, RETWEET_COUNT)
+            VALUES (s.DATE, s.BRAND, s.SENTIMENT, s.TOPIC, s.TWEET_COUNT, s.LIKE_COUNT, s.RETWEET_COUNT)
+        """, (json.dumps(tweet_ids),))
+            conn.commit()
+        print(f"✅ {SNOWFLAKE_ROLLUP_TABLE} updated.")
+    except Exception as e:
+        print(f"❌ Failed to update {SNOWFLAKE_ROLLUP_TABLE}: {str(e)}")
+        conn.rollback()
+    finally:
+        cursor.close()
+
+def rebuild_dashboard_rollup(conn):
+    """Rebuild the rollup table from scratch (initial backfill or after a schema change)."""
+    print(f"🔁 Rebuilding {SNOWFLAKE_ROLLUP_TABLE} from FINAL_TWEETS...")
+    cursor = conn.cursor()
+    try:
+        ensure_rollup_table(cursor)
+        cursor.execute("BEGIN")
+        cursor.execute(f"DELETE FROM {SNOWFLAKE_ROLLUP_TABLE}")
+        cursor.execute(f"""
+        INSERT INTO {SNOWFLAKE_ROLLUP_TABLE} (DATE, BRAND, SENTIMENT, TOPIC, TWEET_COUNT, LIKE_COUNT, RETWEET_COUNT)
+        {rollup_source_sql()}
+        """)
+        conn.commit()
+        print(f"✅ {SNOWFLAKE_ROLLUP_TABLE} rebuilt.")
+    except Exception as e:
+        print(f"❌ Failed to rebuild {SNOWFLAKE_ROLLUP_TABLE}: {str(e)}")
+        conn.rollback()
+    finally:
+        cursor.close()
+
+if __name__ == "__main__":
+    from connectors.snowflake_connector import pooled_connection, query_stage
+
+    with query_stage("rollup_rebuild"), pooled_connection() as conn:
+        rebuild_dashboard_rollup(conn)
@@ -0,0 +1,197 @@
+# semantic_cache.py
+"""
+This module provides a semantic answer cache for the QA systems.
+Questions are looked up by embedding similarity, so different phrasings of the same
+question ("how do people feel about Nike", "Nike sentiment?") reuse one stored answer
+instead of repeating the graph query and the LLM completion. Entries are tagged with
+the data version token and stop matching once new tweets are loaded, and with the
+retrieval filter of their question (brands and resolved time window), so "Nike sentiment
+this month" never reuses the answer for last month or for Adidas. Relative windows
+("last 7 days") resolve against today, so their entries stop matching the next day.
+The cache directory is shared by every process answering questions (apps, QA service,
+batch runs): writers take an exclusive lock file and reload entries other processes
+saved before adding their own, and readers pick up other processes' entries on lookup.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes still merge, but are not serialized across processes
+    fcntl = None
+
+import numpy as np
+from data_pipeline.conversation import filter_key
+from data_pipeline.data_version import get_data_version
+from data_pipeline.retrieval_filters import extract_filters
+from config import QA_CACHE_PATH, QA_CACHE_SIMILARITY_THRESHOLD, QA_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+def question_filter_key(question):
+    """JSON form of the retrieval filter `question` implies, as stored with its cache entry."""
+    return json.dumps(filter_key(extract_filters(question or "")), sort_keys=True)
+
+class SemanticAnswerCache:
+    def __init__(self, path=QA_CACHE_PATH, threshold=QA_CACHE_SIMILARITY_THRESHOLD, max_entries=QA_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries_path = os.path.join(path, "entries.json")
+        self.embeddings_path = os.path.join(path, "embeddings.npy")
+        self.lock_path = os.path.join(path, "write.lock")
+        self._lock = threading.Lock()
+        self._disk_state = None   # (mtime_ns, size) of the entries file when last loaded or saved
+        self._entries = []        # [{"question", "filters", "result", "version", "created_at"}]
+        self._embeddings = None   # float32 matrix of unit-length question embeddings, one row per entry
+        self._latency = {"hit": [], "miss": []}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.entries_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """Read the entries saved on disk, if they changed since this process last loaded or saved them."""
+        state = self._stat()
+        if state is None or state == self._disk_state:
+            return
+        try:
+            with open(self.entries_path) as f:
+                entries = json.load(f)
+            embeddings = np.load(self.embeddings_path)
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            return
+        if len(entries) == len(embeddings):  # Otherwise another process is midway through a save
+            self._entries = entries
+            self._embeddings = embeddings.astype(np.float32) if len(entries) else None
+            self._disk_state = state
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize read-modify-write cycles with other processes sharing the cache directory."""
+        os.makedirs(self.path, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save(self):
+        """Write the entries. Caller must hold both locks and have called _load first."""
+        suffix = f".{os.getpid()}.tmp"
+        with open(self.entries_path + suffix, "w") as f:
+            json.dump(self._entries, f, default=str)
+        with open(self.embeddings_path + suffix, "wb") as f:
+            np.save(f, self._embeddings if self._embeddings is not None else np.zeros((0, 0), dtype=np.float32))
+        os.replace(self.embeddings_path + suffix, self.embeddings_path)
+        os.replace(self.entries_path + suffix, self.entries_path)
+        self._disk_state = self._stat()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop_stale(self, version):
+        """Remove entries from older data versions. Caller must hold the lock."""
+        if all(entry["version"] == version for entry in self._entries):
+            return
+        with self._file_lock():
+            self._load()
+            keep = [i for i, entry in enumerate(self._entries) if entry["version"] == version]
+            if len(keep) == len(self._entries):
+                return
+            self._entries = [self._entries[i] for i in keep]
+            self._embeddings = self._embeddings[keep] if keep else None
+            self._save()
+
+    def lookup(self, embedding, question=None):
+        """
+        Return the cached result for the most similar previous question with the same
+        retrieval filter as `question`, or None.
+        """
+        if not embedding:
+            return None
+        query = self._normalize(embedding)
+        filters = question_filter_key(question)
+        with self._lock:
+            self._load()  # Entries other processes added since
+            self._drop_stale(get_data_version())
+            if self._embeddings is None or not len(self._embeddings) or self._embeddings.shape[1] != len(query):
+                # Nothing cached yet, or the entries were embedded under another embedding profile
+                return None
+            similarities = self._embeddings @ query
+            candidates = [i for i, entry in enumerate(self._entries) if entry.get("filters") == filters]
+            if not candidates:
+                return None
+            best = max(candidates, key=lambda i: similarities[i])
+            if similarities[best] < self.threshold:
+                return None
+            entry = self._entries[best]
+        logger.info(f"Semantic cache hit ({similarities[best]:.3f}) for: {entry['question']}")
+        return entry["result"]
+
+    def add(self, question, embedding, result):
+        """Store the result of a freshly answered question."""
+        if not embedding:
+            return
+        vector = self._normalize(embedding)[np.newaxis, :]
+        with self._lock, self._file_lock():
+            self._load()  # Merge with what other processes saved, so their entries are not overwritten
+            if self._embeddings is not None and self._embeddings.shape[1] != vector.shape[1]:
+                # Embedding profile changed: entries from the old one can never match again
+                self._entries, self._embeddings = [], None
+            self._entries.append({
+                "question": question,
+                "filters": question_filter_key(question),
+                "result": result,
+                "version": get_data_version(),
+                "created_at": time.time(),
+            })
+            self._embeddings = vector if self._embeddings is None else np.vstack([self._embeddings, vector])
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+                self._embeddings = self._embeddings[-self.max_entries:]
+            self._save()
+
+    def record(self, hit, seconds):
+        """Record the end-to-end latency of a question answered with (hit) or without (miss) the cache."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            samples = self._latency["hit" if hit else "miss"]
+            samples.append(seconds)
+            del samples[:-1000]  # Keep a bounded window of recent samples
+
+    def stats(self):
+        """Hit rate and median/p95 latency for hits and misses."""
+        with self._lock:
+            report = {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+            }
+            for kind, samples in self._latency.items():
+                if samples:
+                    report[f"{kind}_latency_p50"] = float(np.percentile(samples, 50))
+                    report[f"{kind}_latency_p95"] = float(np.percentile(samples, 95))
+        return report
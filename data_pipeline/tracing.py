@@ -0,0 +1,224 @@
+# tracing.py
+"""
+This module provides lightweight tracing and metrics for the pipeline and the QA systems.
+`span(name)` is a context manager that times a block, records the duration in a per-span
+histogram (and failures in an error counter) and links nested spans into one trace.
+Metrics are rendered in the Prometheus text format, either written to METRICS_FILE_PATH
+(for a textfile collector) or served on a local /metrics endpoint. When TRACE_LOG_PATH is
+set, every finished span is also appended there as an OTLP/JSON `ExportTraceServiceRequest`
+line that OpenTelemetry collectors can ingest.
+"""
+
+import contextvars
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import TRACING_ENABLED, METRICS_FILE_PATH, TRACE_LOG_PATH, TRACE_SERVICE_NAME
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from single queries to whole enrichment runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.setdefault(label, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, label_name):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="+Inf"}} {series[-1]}')
+                lines.append(f'{self.name}_sum{{{label_name}="{label}"}} {series[-2]}')
+                lines.append(f'{self.name}_count{{{label_name}="{label}"}} {series[-1]}')
+        return lines
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label, amount=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self, label_name):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{label_name}="{label}"}} {value}')
+        return lines
+
+SPAN_DURATION = Histogram("pipeline_span_duration_seconds", "Duration of traced pipeline and QA stages.")
+SPAN_ERRORS = Counter("pipeline_span_errors_total", "Traced stages that raised an exception.")
+
+# (metric, label name) pairs rendered by render_prometheus
+_METRICS = [(SPAN_DURATION, "span"), (SPAN_ERRORS, "span")]
+
+def register_metric(metric, label_name):
+    """Export a module-level Histogram or Counter alongside the span metrics."""
+    _METRICS.append((metric, label_name))
+    return metric
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_trace_log_lock = threading.Lock()
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _export_span(record, start_ns, end_ns, error):
+    """Append one finished span to TRACE_LOG_PATH as an OTLP/JSON line."""
+    otlp_span = {
+        "traceId": record["trace_id"],
+        "spanId": record["span_id"],
+        "name": record["name"],
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in record["attributes"].items()],
+        "status": {"code": 2, "message": str(error)} if error else {"code": 1},
+    }
+    if record["parent_span_id"]:
+        otlp_span["parentSpanId"] = record["parent_span_id"]
+    line = json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [otlp_span]}],
+    }]})
+    try:
+        with _trace_log_lock:
+            os.makedirs(os.path.dirname(TRACE_LOG_PATH) or ".", exist_ok=True)
+            with open(TRACE_LOG_PATH, "a") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write trace log: {e}")
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a named span. Yields the span's attribute dict so the block can add
+    attributes (e.g. row counts) before it ends.
+    """
+    if not TRACING_ENABLED:
+        yield dict(attributes)
+        return
+    parent = _current_span.get()
+    record = {
+        "name": name,
+        "trace_id": parent["trace_id"] if parent else secrets.token_hex(16),
+        "span_id": secrets.token_hex(8),
+        "parent_span_id": parent["span_id"] if parent else None,
+        "attributes": dict(attributes),
+    }
+    token = _current_span.set(record)
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield record["attributes"]
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        SPAN_DURATION.observe(name, duration)
+        if error:
+            SPAN_ERRORS.inc(name)
+        if TRACE_LOG_PATH:
+            _export_span(record, start_ns, start_ns + int(duration * 1e9), error)
+
+def traced(name):
+    """Decorator form of `span` for plain and async functions."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = [line for metric, label_name in _METRICS for line in metric.render(label_name)]
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path=METRICS_FILE_PATH):
+    """Write the current metrics to `path` (atomically, for a node_exporter textfile collector)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(render_prometheus())
+    os.replace(path + ".tmp", path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood stderr
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port):
+    """Serve /metrics on `port` from a daemon thread, once per process. Returns False if it could not start."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return True
+        if not port:
+            return False
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError as e:
+            # Another app on this host already owns the port
+            logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+            return False
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        logger.info(f"Metrics served on http://127.0.0.1:{port}/metrics")
+        return True
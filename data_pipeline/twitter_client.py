@@ -11,7 +11,8 @@ from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 from twikit import Client
 from data_pipeline.utils import log_error, apply_delay, load_existing_tweet_ids, process_tweet
-from connectors.snowflake_connector import get_connection
+from data_pipeline.tracing import span, traced
+from connectors.snowflake_connector import pooled_connection, tag_queries
 import snowflake.connector
 from config import *
 
@@ -56,13 +57,16 @@ async def fetch_tweets(client: Client):
     """
     print(f"{get_eastern_time()} - Fetching tweets")
     try:
-        tweets_result = await client.search_tweet(QUERY, product="Latest")  # Ensures latest tweets are fetched
+        with span("scrape.fetch_page", page=1):
+            tweets_result = await client.search_tweet(QUERY, product="Latest")  # Ensures latest tweets are fetched
         return tweets_result
     except Exception as e:
         log_error("fetch_tweets", e)
         print(f"❌ Error fetching tweets: {e}")
         return []
 
+@traced("scrape_tweets")
+@tag_queries("scrape_tweets")
 async def scrape_tweets(client: Client):
     """Modified version for Snowflake inserts with batch processing and timestamp logging."""
     tweet_count = 0
@@ -73,7 +77,7 @@ async def scrape_tweets(client: Client):
     print(f"🕒 Scraping started at: {scraping_start_time}")
 
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cur:
                 tweets_result = await fetch_tweets(client)
 
@@ -107,14 +111,15 @@ async def scrape_tweets(client: Client):
 
                     if batch_data:
                         try:
-                            cur.executemany(
-                                f"""
-                                INSERT INTO {SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.STAGING_TWEETS
-                                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                                """, 
-                                batch_data
-                            )
-                            conn.commit()
+                            with span("snowflake.insert_staging_tweets", rows=len(batch_data)):
+                                cur.executemany(
+                                    f"""
+                                    INSERT INTO {SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.STAGING_TWEETS
+                                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                                    """, 
+                                    batch_data
+                                )
+                                conn.commit()
                             print(f"📦 Batch complete. Inserted {len(batch_data)} tweets.")
                         except snowflake.connector.errors.ProgrammingError as e:
                             print(f"❌ Batch Insert Failed {e.msg}")
@@ -133,7 +138,8 @@ async def scrape_tweets(client: Client):
                     # Pagination logic
                     if tweets_result.next_cursor:
                         try:
-                            tweets_result = await tweets_result.next()
+                            with span("scrape.fetch_page"):
+                                tweets_result = await tweets_result.next()
 
                         except Exception as e:
                         
@@ -154,11 +160,12 @@ async def scrape_tweets(client: Client):
         print(f"🚀 Initiating tweet cleaning task at: {cleaning_start_time}")
 
         # ✅ Execute Cleaning Task after all data is fetched
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cur:
                 try:
-                    cur.execute("EXECUTE TASK TWEET_CLEANING_TASK;")
-                    conn.commit()
+                    with span("snowflake.execute_cleaning_task"):
+                        cur.execute("EXECUTE TASK TWEET_CLEANING_TASK;")
+                        conn.commit()
 
                     # ✅ Log when cleaning task execution ends
                     cleaning_end_time = get_eastern_time()
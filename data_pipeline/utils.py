@@ -12,7 +12,8 @@ import os
 import re
 from datetime import datetime, timezone
 from config import *
-from connectors.snowflake_connector import get_connection
+from connectors.snowflake_connector import pooled_cursor
+from data_pipeline.tracing import span
 import logging
 import pytz
 from dateutil import parser
@@ -29,13 +30,12 @@ async def apply_delay(delay_range: tuple):
 def load_existing_tweet_ids() -> set:
     """Fetch existing tweet IDs from Snowflake"""
     try:
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(f"""
-                    SELECT TWEET_ID 
-                    FROM {SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.{SNOWFLAKE_STAGE_TABLE}
-                """)
-                return {str(row[0]) for row in cur.fetchall()}
+        with pooled_cursor() as cur, span("snowflake.load_existing_tweet_ids"):
+            cur.execute(f"""
+                SELECT TWEET_ID 
+                FROM {SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.{SNOWFLAKE_STAGE_TABLE}
+            """)
+            return {str(row[0]) for row in cur.fetchall()}
     except Exception as e:
         logging.error(f"Failed to load tweet IDs: {str(e)}")
         return set()
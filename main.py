@@ -3,17 +3,45 @@ from data_pipeline.twitter_client import authenticate, scrape_tweets
 from data_pipeline.utils import log_error  # Added for error handling
 from data_pipeline.enriched_tweets import process_tweets
 from data_pipeline.data_loading_neo4j import load_tweets_data_into_neo4j
+from data_pipeline.data_version import bump_data_version
+from data_pipeline.ann_index import get_ann_index
+from data_pipeline.graph_summaries import refresh_graph_summaries
+from data_pipeline.tracing import span, write_metrics
+from connectors.neo4j_connector import get_driver
+from connectors.snowflake_connector import start_run
+from visualization.local_store import get_local_store
+from visualization.queries import prewarm_dashboard_cache
+from config import QA_RETRIEVAL_BACKEND
 
 async def main():
     """Main entry point"""
     try:
-        client = await authenticate()
-        if client:
-            await scrape_tweets(client)
-            process_tweets()
-            load_tweets_data_into_neo4j()
+        run_id = start_run()  # QUERY_TAG run ID of this run's Snowflake statements
+        with span("pipeline_run", run_id=run_id):
+            await run_pipeline()
     except Exception as e:
         log_error("main", e)
+    finally:
+        write_metrics()  # Picked up by the Prometheus textfile collector
+
+async def run_pipeline():
+    """Scrape, enrich and load one batch of tweets, then refresh the derived stores."""
+    client = await authenticate()
+    if client:
+        await scrape_tweets(client)
+        process_tweets()
+        load_tweets_data_into_neo4j()
+        get_local_store().sync()  # Refresh the dashboards' local replica
+        bump_data_version()       # Invalidate caches built on the previous load
+
+        neo4j_driver = get_driver()
+        try:
+            if QA_RETRIEVAL_BACKEND == "local":
+                get_ann_index().sync_from_neo4j(neo4j_driver)  # Add the new tweets to the ANN index
+            refresh_graph_summaries(neo4j_driver)  # Recompute the summaries the new tweets belong to
+            prewarm_dashboard_cache(neo4j_driver)
+        finally:
+            neo4j_driver.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
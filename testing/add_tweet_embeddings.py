@@ -4,6 +4,7 @@ import asyncio
 import configparser
 import openai
 from connectors.neo4j_connector import get_driver
+from data_pipeline.embedding_profile import embedding_request_params, vector_index_statement
 from config import NEO4J_DATABASE
 import logging
 
@@ -45,17 +46,7 @@ async def create_vector_index():
         
         # Create the index
         print("Creating new vector index...")
-        session.run("""
-        CREATE VECTOR INDEX tweet_embeddings
-        FOR (t:Tweet)
-        ON (t.embedding)
-        OPTIONS {
-            indexConfig: {
-                `vector.dimensions`: 1536,
-                `vector.similarity_function`: 'cosine'
-            }
-        }
-        """)
+        session.run(vector_index_statement())
         print("Vector index 'tweet_embeddings' created successfully")
         logging.info("Vector index 'tweet_embeddings' created successfully")
 
@@ -80,7 +71,7 @@ async def generate_embeddings(texts):
         # For older OpenAI package
         response = openai.Embedding.create(
             input=texts,
-            model="text-embedding-3-small"
+            **embedding_request_params()
         )
         print(f"Successfully generated {len(response['data'])} embeddings")
         return [data["embedding"] for data in response["data"]]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# backfill_tweet_brands.py
+"""
+Sets the `brands` list on Tweet nodes loaded before the loader started writing it.
+Filtered retrieval (`data_pipeline.retrieval_filters`) and the graph summaries match tweets
+on `Tweet.brands`, so tweets without it are never retrieved for a brand question and are
+missing from brand summaries. Brands are matched on the tweet text the way the loader
+matches them (DASHBOARD_BRANDS, case-insensitive substring).
+
+1. Neo4j: tweets without `brands` get it in batches, one transaction per batch.
+2. The data version is bumped (answer and dashboard caches) and the graph summaries are
+   rebuilt, so both pick up the backfilled tweets.
+
+The backfill is idempotent: an interrupted run can simply be repeated.
+
+Usage:
+    python -m testing.backfill_tweet_brands --dry-run
+    python -m testing.backfill_tweet_brands [--skip-summaries] [--batch-size 10000]
+"""
+
+import argparse
+
+from connectors.neo4j_connector import get_driver
+from data_pipeline.data_version import bump_data_version
+from data_pipeline.graph_summaries import refresh_graph_summaries
+from config import NEO4J_DATABASE, DASHBOARD_BRANDS
+
+def missing_brands(session):
+    """Number of tweets without a `brands` list."""
+    return session.run("MATCH (t:Tweet) WHERE t.brands IS NULL RETURN count(t) AS missing").single()["missing"]
+
+def backfill_neo4j(session, batch_size):
+    """Set `brands` on every tweet without it; returns the number of tweets updated."""
+    updated = 0
+    while True:
+        # Updated tweets no longer match, so each batch picks up where the last one stopped
+        count = session.run("""
+        MATCH (t:Tweet) WHERE t.brands IS NULL
+        WITH t LIMIT $limit
+        SET t.brands = [b IN $brands WHERE toLower(coalesce(t.text, '')) CONTAINS toLower(b)]
+        RETURN count(t) AS updated
+        """, brands=DASHBOARD_BRANDS, limit=batch_size).single()["updated"]
+        if not count:
+            return updated
+        updated += count
+        print(f"  {updated} tweet(s) given a brands list")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many tweets lack a brands list")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Tweets updated per transaction")
+    parser.add_argument("--skip-summaries", action="store_true", help="Do not rebuild the graph summaries")
+    args = parser.parse_args()
+
+    driver = get_driver()
+    try:
+        with driver.session(database=NEO4J_DATABASE) as session:
+            missing = missing_brands(session)
+            print(f"Neo4j: {missing} tweet(s) without a brands list")
+            if args.dry_run or not missing:
+                return
+            updated = backfill_neo4j(session, args.batch_size)
+            print(f"✅ Neo4j: {updated} tweet(s) given a brands list")
+
+        bump_data_version()  # Cached answers were retrieved without the backfilled tweets
+        if not args.skip_summaries:
+            refresh_graph_summaries(driver, full=True)
+    finally:
+        driver.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# embedding_recall_report.py
+"""
+Recall-vs-latency report for embedding profiles.
+A sample of full-size tweet embeddings is split into a corpus and held-out queries; the
+baseline is the exact top-k of every query over the full-size float vectors. Each profile
+(dimensions x ANN quantization) is then loaded into a fresh `TweetANNIndex` and measured on:
+
+- recall@k against the baseline
+- p50/p95 search latency
+- bytes per tweet: scanned by the ANN index, stored in Neo4j, and stored as JSON in Snowflake
+
+Run it on the full-size embeddings, i.e. before `testing.migrate_embeddings` truncates them.
+Synthetic vectors (--synthetic) only exercise the tooling; decide on real embeddings.
+
+Usage:
+    python -m testing.embedding_recall_report --limit 50000
+    python -m testing.embedding_recall_report --fixture tweets.json --dimensions 1536,512,256
+    python -m testing.embedding_recall_report --synthetic 20000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from data_pipeline.ann_index import TweetANNIndex, best_positions
+from data_pipeline.embedding_profile import embedding_json, truncate_rows
+from config import NEO4J_DATABASE, ANN_MIN_TRAIN_SIZE
+
+RESULTS_DIR = os.path.join("data", "benchmarks")
+JSON_SAMPLE_SIZE = 200  # Rows serialized to estimate the Snowflake JSON size
+
+def load_neo4j(limit):
+    from connectors.neo4j_connector import get_driver
+    driver = get_driver()
+    try:
+        with driver.session(database=NEO4J_DATABASE) as session:
+            records = session.run("""
+            MATCH (t:Tweet) WHERE t.embedding IS NOT NULL
+            RETURN t.tweet_id AS tweet_id, t.embedding AS embedding
+            LIMIT $limit
+            """, limit=limit).data()
+    finally:
+        driver.close()
+    return [r["tweet_id"] for r in records], [r["embedding"] for r in records]
+
+def load_fixture(path, limit):
+    with open(path) as f:
+        tweets = [tweet for tweet in json.load(f) if tweet.get("embedding")][:limit]
+    return [tweet["tweet_id"] for tweet in tweets], [tweet["embedding"] for tweet in tweets]
+
+def synthetic_embeddings(count, dim=1536, clusters=200, seed=0):
+    """Clustered vectors whose variance decays along the dimensions, like shortened-embedding models."""
+    rng = np.random.default_rng(seed)
+    decay = 1.0 / np.sqrt(1.0 + np.arange(dim) / 64.0)
+    centers = rng.standard_normal((clusters, dim)) * decay
+    vectors = centers[rng.integers(clusters, size=count)] + 0.6 * rng.standard_normal((count, dim)) * decay
+    return [str(i) for i in range(count)], vectors.astype(np.float32)
+
+def exact_top_k(corpus, queries, k):
+    return [best_positions(corpus @ query, k) for query in queries]
+
+def measure_profile(ids, corpus, queries, truth, k, dimensions, quantization, exact):
+    """Recall, latency and sizes of one profile."""
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = TweetANNIndex(path=index_dir, dimensions=dimensions, quantization=quantization,
+                              min_train_size=len(ids) + 1 if exact else ANN_MIN_TRAIN_SIZE)
+        start = time.perf_counter()
+        index.add(ids, corpus)
+        build_seconds = time.perf_counter() - start
+
+        position = {tweet_id: i for i, tweet_id in enumerate(ids)}
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            hits = index.search(query, k)
+            latencies.append(time.perf_counter() - start)
+            found = {position[tweet_id] for tweet_id, _ in hits}
+            recalls.append(len(found & set(expected.tolist())) / len(expected))
+
+    sample = truncate_rows(corpus[:JSON_SAMPLE_SIZE], dimensions)
+    return {
+        "dimensions": dimensions,
+        "quantization": quantization,
+        f"recall_at_{k}": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "build_seconds": build_seconds,
+        "ann_scanned_bytes": dimensions + 4 if quantization == "int8" else dimensions * 4,
+        "neo4j_bytes": dimensions * 4,
+        "snowflake_json_bytes": float(np.mean([len(embedding_json(row)) for row in sample])),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="JSON list of tweets {tweet_id, embedding, ...} instead of Neo4j")
+    parser.add_argument("--synthetic", type=int, help="Use this many synthetic vectors instead of Neo4j")
+    parser.add_argument("--limit", type=int, default=50000, help="Embeddings loaded from Neo4j or the fixture")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out embeddings used as queries")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--dimensions", default="1536,1024,768,512,256", help="Comma-separated dimensions")
+    parser.add_argument("--quantization", default="none,int8", help="Comma-separated ANN quantizations")
+    parser.add_argument("--exact", action="store_true", help="Disable IVF so only the profile affects recall")
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/embedding_recall_<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        ids, vectors = synthetic_embeddings(args.synthetic)
+        source = f"synthetic ({args.synthetic})"
+    elif args.fixture:
+        ids, vectors = load_fixture(args.fixture, args.limit)
+        source = args.fixture
+    else:
+        ids, vectors = load_neo4j(args.limit)
+        source = "neo4j"
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) <= args.queries:
+        raise SystemExit(f"Need more than {args.queries} embeddings, found {len(vectors)}")
+    full_dim = vectors.shape[1]
+
+    # Held-out queries, so no query finds itself in the corpus
+    order = np.random.default_rng(0).permutation(len(vectors))
+    query_rows, corpus_rows = order[:args.queries], np.sort(order[args.queries:])
+    corpus = truncate_rows(vectors[corpus_rows], full_dim)
+    queries = truncate_rows(vectors[query_rows], full_dim)
+    corpus_ids = [ids[i] for i in corpus_rows]
+    truth = exact_top_k(corpus, queries, args.k)
+    print(f"{len(corpus)} embeddings ({full_dim} dims) from {source}, {len(queries)} queries, "
+          f"baseline: exact top-{args.k} at {full_dim} dims")
+
+    results = []
+    for dimensions in [int(d) for d in args.dimensions.split(",")]:
+        if dimensions > full_dim:
+            print(f"Skipping {dimensions} dims (embeddings have {full_dim})")
+            continue
+        for quantization in args.quantization.split(","):
+            result = measure_profile(corpus_ids, corpus, queries, truth, args.k, dimensions, quantization, args.exact)
+            results.append(result)
+            print(f"{dimensions:>5} dims {quantization:<5} recall@{args.k} {result[f'recall_at_{args.k}']:.3f}  "
+                  f"p50 {result['p50_ms']:.2f}ms  p95 {result['p95_ms']:.2f}ms  "
+                  f"scan {result['ann_scanned_bytes']}B  neo4j {result['neo4j_bytes']}B  "
+                  f"snowflake {result['snowflake_json_bytes']:.0f}B")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "corpus_size": len(corpus),
+        "queries": len(queries),
+        "k": args.k,
+        "baseline_dimensions": full_dim,
+        "exact": args.exact,
+        "profiles": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"embedding_recall_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+if __name__ == "__main__":
+    main()
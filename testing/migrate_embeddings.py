@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# migrate_embeddings.py
+"""
+Moves stored tweet embeddings to the configured embedding profile (EMBEDDING_DIMENSIONS).
+text-embedding-3 embeddings can be shortened by keeping their first N components and
+re-normalizing, so no embedding is requested again:
+
+1. Neo4j: the `tweet_embeddings` vector index is dropped if its dimensions differ, every
+   longer `Tweet.embedding` is truncated in batches, and the index is re-created.
+2. Snowflake: FINAL_TWEETS.EMBEDDING is truncated and rounded in a single UPDATE.
+3. The data version is bumped (answer and dashboard caches) and the local ANN index is
+   rebuilt.
+
+Tweets whose stored embedding is shorter than the profile cannot be migrated this way and
+are only counted. The migration is idempotent: an interrupted run can simply be repeated.
+
+Usage:
+    python -m testing.migrate_embeddings --dry-run
+    python -m testing.migrate_embeddings [--skip-snowflake] [--skip-ann] [--batch-size 1000]
+"""
+
+import argparse
+
+from connectors.neo4j_connector import get_driver
+from connectors.snowflake_connector import pooled_connection
+from data_pipeline.ann_index import get_ann_index
+from data_pipeline.data_version import bump_data_version
+from data_pipeline.embedding_profile import VECTOR_INDEX_NAME, truncate_rows, vector_index_statement
+from config import NEO4J_DATABASE, EMBEDDING_DIMENSIONS, EMBEDDING_JSON_DECIMALS
+
+# Truncate, re-normalize and round every longer embedding server-side
+SNOWFLAKE_TRUNCATE_SQL = """
+UPDATE FINAL_TWEETS f
+SET EMBEDDING = t.EMBEDDING
+FROM (
+    SELECT TWEET_ID,
+           ARRAY_AGG(ROUND(VALUE::FLOAT / NULLIF(NORM, 0), %(decimals)s)) WITHIN GROUP (ORDER BY IDX)::VARIANT AS EMBEDDING
+    FROM (
+        SELECT ft.TWEET_ID, e.INDEX AS IDX, e.VALUE,
+               SQRT(SUM(SQUARE(e.VALUE::FLOAT)) OVER (PARTITION BY ft.TWEET_ID)) AS NORM
+        FROM FINAL_TWEETS ft, LATERAL FLATTEN(INPUT => ft.EMBEDDING) e
+        WHERE ARRAY_SIZE(ft.EMBEDDING) > %(dimensions)s AND e.INDEX < %(dimensions)s
+    )
+    GROUP BY TWEET_ID
+) t
+WHERE f.TWEET_ID = t.TWEET_ID
+"""
+
+def neo4j_embedding_sizes(session, dimensions):
+    """Counts of Tweet embeddings longer than, equal to and shorter than `dimensions`."""
+    record = session.run("""
+    MATCH (t:Tweet) WHERE t.embedding IS NOT NULL
+    WITH size(t.embedding) AS size
+    RETURN sum(CASE WHEN size > $dims THEN 1 ELSE 0 END) AS longer,
+           sum(CASE WHEN size = $dims THEN 1 ELSE 0 END) AS current,
+           sum(CASE WHEN size < $dims THEN 1 ELSE 0 END) AS shorter
+    """, dims=dimensions).single()
+    return {"longer": record["longer"] or 0, "current": record["current"] or 0, "shorter": record["shorter"] or 0}
+
+def vector_index_dimensions(session):
+    """Dimensions of the existing vector index, or None if it does not exist."""
+    record = session.run("""
+    SHOW INDEXES YIELD name, type, options
+    WHERE name = $name AND type = 'VECTOR'
+    RETURN options.indexConfig['vector.dimensions'] AS dimensions
+    """, name=VECTOR_INDEX_NAME).single()
+    return record["dimensions"] if record else None
+
+def migrate_neo4j(session, dimensions, batch_size):
+    """Truncate every longer Tweet embedding; returns the number of tweets rewritten."""
+    migrated = 0
+    while True:
+        # Rewritten tweets no longer match, so each batch picks up where the last one stopped
+        records = session.run("""
+        MATCH (t:Tweet) WHERE t.embedding IS NOT NULL AND size(t.embedding) > $dims
+        RETURN t.tweet_id AS tweet_id, t.embedding AS embedding
+        LIMIT $limit
+        """, dims=dimensions, limit=batch_size).data()
+        if not records:
+            return migrated
+        vectors = truncate_rows([record["embedding"] for record in records], dimensions)
+        session.run("""
+        UNWIND $rows AS row
+        MATCH (t:Tweet {tweet_id: row.tweet_id})
+        CALL db.create.setNodeVectorProperty(t, 'embedding', row.embedding)
+        """, rows=[{"tweet_id": record["tweet_id"], "embedding": vector.tolist()}
+                   for record, vector in zip(records, vectors)])
+        migrated += len(records)
+        print(f"  {migrated} tweet embedding(s) truncated in Neo4j")
+
+def migrate_snowflake(dimensions, dry_run):
+    """Truncate longer FINAL_TWEETS embeddings; returns the number of rows affected (or to affect)."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM FINAL_TWEETS WHERE ARRAY_SIZE(EMBEDDING) > %(dimensions)s",
+                           {"dimensions": dimensions})
+            longer = cursor.fetchone()[0]
+            if dry_run or not longer:
+                return longer
+            cursor.execute(SNOWFLAKE_TRUNCATE_SQL, {"dimensions": dimensions, "decimals": EMBEDDING_JSON_DECIMALS})
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Neo4j tweets rewritten per transaction")
+    parser.add_argument("--skip-snowflake", action="store_true", help="Leave FINAL_TWEETS.EMBEDDING unchanged")
+    parser.add_argument("--skip-ann", action="store_true", help="Do not rebuild the local ANN index")
+    args = parser.parse_args()
+
+    print(f"Embedding profile: {EMBEDDING_DIMENSIONS} dimensions")
+    driver = get_driver()
+    try:
+        with driver.session(database=NEO4J_DATABASE) as session:
+            sizes = neo4j_embedding_sizes(session, EMBEDDING_DIMENSIONS)
+            index_dimensions = vector_index_dimensions(session)
+            print(f"Neo4j: {sizes['longer']} to truncate, {sizes['current']} already migrated, "
+                  f"{sizes['shorter']} shorter than the profile (need re-embedding)")
+            print(f"Neo4j vector index '{VECTOR_INDEX_NAME}': {index_dimensions or 'missing'} dimensions")
+
+            if not args.dry_run:
+                if index_dimensions is not None and index_dimensions != EMBEDDING_DIMENSIONS:
+                    # The index rejects vectors of another size, so it goes before the rewrite
+                    session.run(f"DROP INDEX {VECTOR_INDEX_NAME}")
+                    print(f"🗑️ Dropped {index_dimensions}-dim vector index")
+                migrated = migrate_neo4j(session, EMBEDDING_DIMENSIONS, args.batch_size)
+                session.run(vector_index_statement(EMBEDDING_DIMENSIONS))
+                print(f"✅ Neo4j: {migrated} embedding(s) truncated, vector index has {EMBEDDING_DIMENSIONS} dimensions")
+
+        if not args.skip_snowflake:
+            rows = migrate_snowflake(EMBEDDING_DIMENSIONS, args.dry_run)
+            if args.dry_run:
+                print(f"Snowflake: {rows} row(s) to truncate")
+            else:
+                print(f"✅ Snowflake: {rows} row(s) truncated")
+
+        if args.dry_run:
+            return
+        bump_data_version()  # Cached answers and panels were built on the old embeddings
+        if not args.skip_ann:
+            get_ann_index().rebuild_from_neo4j(driver)
+    finally:
+        driver.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# neo4j_profile_report.py
+"""
+Growth report for the Cypher profiles captured with NEO4J_PROFILE_SAMPLE_RATE > 0.
+Profiles are grouped by query name (see `connectors.neo4j_profiling`). For every query:
+
+- samples, median db hits / rows / elapsed time, and how often each flag was seen
+  (label_scan, all_nodes_scan, eager, cartesian_product)
+- growth: profiles are ordered by the Tweet count recorded with them, and the median db hits
+  of the largest third are compared with the smallest third. The exponent
+  log(db hit growth) / log(graph growth) is ~0 for index lookups, ~1 for scans and above 1
+  for shapes that get worse than linearly.
+
+Queries whose exponent exceeds --threshold are listed as regressing, worst first. The
+exponent needs profiles from at least two graph sizes, so leave sampling on across loads.
+
+Usage:
+    python -m testing.neo4j_profile_report
+    python -m testing.neo4j_profile_report --path profiles.jsonl --threshold 0.3 --output report.json
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+from config import NEO4J_PROFILE_PATH
+
+RESULTS_DIR = os.path.join("data", "benchmarks")
+
+def load_profiles(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def growth_exponent(profiles):
+    """Scaling of median db hits with graph size between the smallest and largest third, or None."""
+    ordered = sorted(profiles, key=lambda p: p["tweets"])
+    third = len(ordered) // 3
+    if third == 0:
+        return None
+    small, large = ordered[:third], ordered[-third:]
+    small_size = float(np.median([p["tweets"] for p in small]))
+    large_size = float(np.median([p["tweets"] for p in large]))
+    if small_size <= 0 or large_size <= small_size * 1.1:
+        return None  # The graph did not grow enough between the samples
+    small_hits = float(np.median([p["db_hits"] for p in small]))
+    large_hits = float(np.median([p["db_hits"] for p in large]))
+    return math.log(max(large_hits, 1.0) / max(small_hits, 1.0)) / math.log(large_size / small_size)
+
+def summarize_query(name, profiles):
+    flags = Counter(flag for p in profiles for flag in p.get("flags", []))
+    return {
+        "name": name,
+        "samples": len(profiles),
+        "median_db_hits": float(np.median([p["db_hits"] for p in profiles])),
+        "median_rows": float(np.median([p["rows"] for p in profiles])),
+        "median_elapsed_ms": float(np.median([p["elapsed_ms"] for p in profiles])),
+        "tweets": [min(p["tweets"] for p in profiles), max(p["tweets"] for p in profiles)],
+        "flags": {flag: count / len(profiles) for flag, count in sorted(flags.items())},
+        "operators": sorted({op for p in profiles for op in p.get("operators", [])}),
+        "growth_exponent": growth_exponent(profiles),
+        "shape": profiles[-1].get("shape", ""),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=NEO4J_PROFILE_PATH, help="Profile log (default: NEO4J_PROFILE_PATH)")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Growth exponent above which a query regresses")
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/neo4j_profiles_<timestamp>.json)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"No profiles at {args.path}; set NEO4J_PROFILE_SAMPLE_RATE > 0 to capture some")
+    by_name = defaultdict(list)
+    for profile in load_profiles(args.path):
+        by_name[profile["name"]].append(profile)
+
+    queries = [summarize_query(name, profiles) for name, profiles in by_name.items()]
+    queries.sort(key=lambda q: (q["growth_exponent"] is None, -(q["growth_exponent"] or 0), -q["median_db_hits"]))
+    print(f"{sum(q['samples'] for q in queries)} profiles of {len(queries)} queries from {args.path}")
+    for q in queries:
+        growth = "   n/a" if q["growth_exponent"] is None else f"{q['growth_exponent']:6.2f}"
+        flags = ", ".join(f"{flag} {share:.0%}" for flag, share in q["flags"].items()) or "-"
+        print(f"{q['name']:<36} n={q['samples']:<5} growth {growth}  db hits {q['median_db_hits']:>10.0f}  "
+              f"rows {q['median_rows']:>7.0f}  {q['median_elapsed_ms']:>8.1f}ms  "
+              f"tweets {q['tweets'][0]}-{q['tweets'][1]}  flags: {flags}")
+
+    regressing = [q["name"] for q in queries if q["growth_exponent"] is not None and q["growth_exponent"] > args.threshold]
+    if regressing:
+        print(f"Regressing as the graph grows (exponent > {args.threshold}): {', '.join(regressing)}")
+    else:
+        print("No query shape regresses as the graph grows")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source": args.path,
+        "threshold": args.threshold,
+        "regressing": regressing,
+        "queries": queries,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"neo4j_profiles_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+if __name__ == "__main__":
+    main()
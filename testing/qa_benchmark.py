@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# qa_benchmark.py
+"""
+Offline latency benchmark for the QA pipeline.
+Replays a question corpus through `StreamingQAPipeline` with OpenAI and Neo4j replaced by
+deterministic stubs with configurable latency, and reports p50/p95/p99 per stage
+(keywords, embedding, retrieval, answer, follow-ups) plus throughput at N concurrent users.
+Retrieval runs the real ANN index and rank fusion over a fixture of tweets.
+
+Usage:
+    python -m testing.qa_benchmark --users 8 --rounds 5
+    python -m testing.qa_benchmark --fixture tweets.json --compare data/benchmarks/previous.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from data_pipeline.ann_index import TweetANNIndex
+from data_pipeline.qa_streaming import StreamingQAPipeline
+from data_pipeline.retrieval import reciprocal_rank_fusion
+
+STAGES = ["keywords", "embedding", "retrieval", "time_to_first_token", "answer", "followups", "total"]
+RESULTS_DIR = os.path.join("data", "benchmarks")
+EMBEDDING_DIM = 1536
+
+DEFAULT_QUESTIONS = [
+    "What do people think about Nike's new running shoes?",
+    "How is Adidas marketing perceived on Twitter?",
+    "Which brand has the most positive sentiment this month?",
+    "What are customers complaining about with Puma?",
+    "How do Nike and Adidas compare on sustainability?",
+    "Which influencers are driving Under Armour engagement?",
+    "What are the trending sneaker releases?",
+    "Is New Balance gaining popularity?",
+]
+
+BRANDS = ["Nike", "Adidas", "Puma", "Under Armour", "New Balance"]
+SUBJECTS = ["running shoes", "new collection", "customer service", "sneaker drop", "ad campaign", "store", "sizing"]
+OPINIONS = ["love the", "hate the", "not sure about the", "really impressed by the", "disappointed with the"]
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Deterministic unit vector for a text: the same text always embeds to the same vector."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def synthetic_tweets(count, seed=0):
+    """Fixture-like tweets for runs without a recorded fixture."""
+    rng = random.Random(seed)
+    tweets = []
+    for i in range(count):
+        text = f"{rng.choice(OPINIONS).capitalize()} {rng.choice(BRANDS)} {rng.choice(SUBJECTS)} #{rng.choice(BRANDS).replace(' ', '')}"
+        tweets.append({
+            "tweet_id": str(i),
+            "tweet": text,
+            "user": f"user{rng.randrange(count // 4 + 1)}",
+            "sentiment": rng.choice(["Positive", "Neutral", "Negative"]),
+            "topic": "Brand Mentions & Engagement",
+            "like_count": rng.randrange(500),
+            "retweet_count": rng.randrange(100),
+        })
+    return tweets
+
+class FakeOpenAI:
+    """Deterministic stand-in for the embedding and chat endpoints, with configurable latency."""
+
+    def __init__(self, embedding_latency, first_token_latency, token_latency, answer_tokens):
+        self.embedding_latency = embedding_latency
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+
+    def embed(self, text):
+        time.sleep(self.embedding_latency)
+        return fake_embedding(text)
+
+    def chat_stream(self, messages, temperature=0.0):
+        prompt = messages[-1]["content"]
+        words = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        time.sleep(self.first_token_latency)
+        for i in range(self.answer_tokens):
+            if i:
+                time.sleep(self.token_latency)
+            # Follow-up prompts get three short lines back, answers a run of words
+            yield f"{words[i % len(words)]}{chr(10) if temperature and i % 5 == 4 else ' '}"
+
+class FixtureGraph:
+    """Fixture-backed retrieval: the real ANN index and rank fusion over in-memory tweets."""
+
+    def __init__(self, tweets, latency, index_dir):
+        self.latency = latency
+        self.tweets = {tweet["tweet_id"]: tweet for tweet in tweets}
+        self.index = TweetANNIndex(path=index_dir)
+        self.index.add(
+            [tweet["tweet_id"] for tweet in tweets],
+            [tweet.get("embedding") or fake_embedding(tweet["tweet"]) for tweet in tweets],
+        )
+
+    def search(self, embedding, keywords, top_k=100, limit=50):
+        time.sleep(self.latency)  # Simulated round trip to the graph
+        vector_hits = self.index.search(embedding, top_k)
+        keyword_hits = []
+        for tweet_id, tweet in self.tweets.items():
+            score = sum(1 for k in keywords if k in tweet["tweet"].lower())
+            if score:
+                keyword_hits.append((tweet_id, float(score)))
+        keyword_hits.sort(key=lambda hit: hit[1], reverse=True)
+        fused = reciprocal_rank_fusion(vector_hits, keyword_hits[:top_k], limit=limit)
+        return [{**self.tweets[hit["tweet_id"]], **hit} for hit in fused]
+
+class StubQASystem:
+    """The QA system interface used by StreamingQAPipeline, backed by the stubs."""
+
+    def __init__(self, openai_stub, graph):
+        self.openai = openai_stub
+        self.graph = graph
+
+    def extract_keywords(self, text):
+        stopwords = {"a", "an", "the", "and", "or", "what", "how", "is", "are", "do", "about", "with", "which", "on", "of"}
+        return [w.strip("?.,'s").lower() for w in text.split() if w.strip("?.,'s").lower() not in stopwords]
+
+    def generate_embeddings(self, text, deadline=None):
+        return self.openai.embed(text)
+
+    def query_knowledge_graph(self, question, embedding, keywords=None):
+        return self.graph.search(embedding, keywords or self.extract_keywords(question))
+
+def percentiles(samples):
+    if not samples:
+        return None
+    return {
+        "count": len(samples),
+        "mean": float(np.mean(samples)),
+        "p50": float(np.percentile(samples, 50)),
+        "p95": float(np.percentile(samples, 95)),
+        "p99": float(np.percentile(samples, 99)),
+    }
+
+def run_benchmark(pipeline, questions, users):
+    """Answer every question with `users` concurrent workers; returns per-question timings and wall time."""
+    def answer(question):
+        return asyncio.run(pipeline.run(question, lambda token: None))["timings"]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        timings = list(executor.map(answer, questions))
+    return timings, time.perf_counter() - start
+
+def compare(report, baseline_path):
+    """Print the p50/p95 change of each stage against a previous report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path}:")
+    for stage in STAGES:
+        now, before = report["stages"].get(stage), baseline["stages"].get(stage)
+        if not now or not before:
+            continue
+        deltas = ", ".join(
+            f"{p} {(now[p] - before[p]) * 1000:+.1f}ms" for p in ("p50", "p95")
+        )
+        print(f"  {stage:<20} {deltas}")
+    print(f"  {'throughput':<20} {report['throughput_qps'] - baseline['throughput_qps']:+.2f} q/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", help="File with one question per line (default: built-in corpus)")
+    parser.add_argument("--fixture", help="JSON list of tweets {tweet_id, tweet, user, sentiment, ..., embedding?}")
+    parser.add_argument("--tweets", type=int, default=5000, help="Synthetic tweets when no fixture is given")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent users")
+    parser.add_argument("--rounds", type=int, default=3, help="Times the corpus is replayed")
+    parser.add_argument("--embedding-latency", type=float, default=0.15)
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    parser.add_argument("--first-token-latency", type=float, default=0.4)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/qa_benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = DEFAULT_QUESTIONS
+    if args.fixture:
+        with open(args.fixture) as f:
+            tweets = json.load(f)
+    else:
+        tweets = synthetic_tweets(args.tweets)
+
+    openai_stub = FakeOpenAI(args.embedding_latency, args.first_token_latency, args.token_latency, args.answer_tokens)
+    with tempfile.TemporaryDirectory() as index_dir:
+        graph = FixtureGraph(tweets, args.graph_latency, index_dir)
+        pipeline = StreamingQAPipeline(StubQASystem(openai_stub, graph), chat_stream=openai_stub.chat_stream)
+        timings, wall_seconds = run_benchmark(pipeline, questions * args.rounds, args.users)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "questions": len(questions) * args.rounds,
+        "tweets": len(tweets),
+        "wall_seconds": wall_seconds,
+        "throughput_qps": len(timings) / wall_seconds,
+        "stages": {stage: percentiles([t[stage] for t in timings if stage in t]) for stage in STAGES},
+    }
+
+    print(f"{report['questions']} questions, {args.users} concurrent users, {len(tweets)} tweets")
+    print(f"{'stage':<22}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, stats in report["stages"].items():
+        if stats:
+            print(f"{stage:<22}" + "".join(f"{stats[p] * 1000:>8.1f}ms" for p in ("p50", "p95", "p99")))
+    print(f"Throughput: {report['throughput_qps']:.2f} questions/s")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"qa_benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# query_history.py
+"""
+Per-stage aggregation of Snowflake QUERY_HISTORY rows, for `testing.snowflake_query_report`.
+Rows are dicts keyed by QUERY_HISTORY column names, as returned by a DictCursor or stored in
+a recorded fixture. Nothing here imports config or the Snowflake connector, so a fixture
+can be reported on (and tested) without credentials.
+"""
+
+import json
+from collections import defaultdict
+
+import numpy as np
+
+# Times in QUERY_HISTORY are milliseconds
+QUEUED_COLUMNS = ["QUEUED_PROVISIONING_TIME", "QUEUED_REPAIR_TIME", "QUEUED_OVERLOAD_TIME"]
+
+def parse_query_tag(tag, app=None):
+    """
+    The {app, stage, run_id} dict of a QUERY_TAG set by
+    `connectors.snowflake_connector.current_query_tag` (for `app`, when given), or None.
+    """
+    try:
+        parsed = json.loads(tag) if tag else None
+    except ValueError:
+        return None
+    if not isinstance(parsed, dict) or "stage" not in parsed or "run_id" not in parsed:
+        return None
+    if app is not None and parsed.get("app") != app:
+        return None
+    return parsed
+
+def load_fixture(path):
+    with open(path) as f:
+        return json.load(f)
+
+def tagged_rows(rows, app=None):
+    """(tag, row) for the rows whose QUERY_TAG was set by the app."""
+    return [(tag, row) for row in rows for tag in [parse_query_tag(row.get("QUERY_TAG"), app)] if tag]
+
+def latest_run_id(tagged):
+    """Run ID of the most recently started tagged statement, ignoring the report's own."""
+    runs = [(str(row["START_TIME"]), tag["run_id"]) for tag, row in tagged if tag["stage"] != "query_report"]
+    return max(runs)[1] if runs else None
+
+def summarize_stage(stage, rows):
+    def total(column):
+        return sum(row.get(column) or 0 for row in rows)
+
+    summary = {
+        "stage": stage,
+        "statements": len(rows),
+        "failed": sum(1 for row in rows if row.get("EXECUTION_STATUS", "SUCCESS") != "SUCCESS"),
+        "bytes_scanned": total("BYTES_SCANNED"),
+        "rows_produced": total("ROWS_PRODUCED"),
+        "elapsed_s": total("TOTAL_ELAPSED_TIME") / 1000,
+        "compilation_s": total("COMPILATION_TIME") / 1000,
+        "execution_s": total("EXECUTION_TIME") / 1000,
+        "queued_s": sum(total(column) for column in QUEUED_COLUMNS) / 1000,
+        "blocked_s": total("TRANSACTION_BLOCKED_TIME") / 1000,
+        "p95_elapsed_s": float(np.percentile([row.get("TOTAL_ELAPSED_TIME") or 0 for row in rows], 95)) / 1000,
+        "warehouses": sorted({row["WAREHOUSE_NAME"] for row in rows if row.get("WAREHOUSE_NAME")}),
+    }
+    if any("CREDITS_USED_CLOUD_SERVICES" in row for row in rows):
+        summary["cloud_services_credits"] = total("CREDITS_USED_CLOUD_SERVICES")
+    return summary
+
+def summarize_run(rows, run_id=None, app=None):
+    """Per-stage summaries of one run (the latest when `run_id` is None), most expensive first."""
+    tagged = tagged_rows(rows, app)
+    run_id = run_id or latest_run_id(tagged)
+    by_stage = defaultdict(list)
+    for tag, row in tagged:
+        if tag["run_id"] == run_id:
+            by_stage[tag["stage"]].append(row)
+    stages = [summarize_stage(stage, stage_rows) for stage, stage_rows in by_stage.items()]
+    stages.sort(key=lambda s: s["elapsed_s"], reverse=True)
+    return run_id, stages
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024:
+            return f"{count:.0f}{unit}"
+        count /= 1024
+    return f"{count:.1f}TB"
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# snowflake_query_report.py
+"""
+Per-stage Snowflake cost/latency report for one pipeline run.
+Statements carry QUERY_TAG = {"app", "stage", "run_id"} (see connectors.snowflake_connector),
+so QUERY_HISTORY can be grouped by stage. For every stage of the run:
+
+- statements and failures
+- bytes scanned and rows produced
+- compilation, execution and queued time (provisioning + repair + overload), plus time
+  blocked on transactions, each summed in seconds
+- p95 of total elapsed time
+- cloud services credits (ACCOUNT_USAGE only)
+
+History comes from INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER (last 7 days, available
+immediately) or, with --account-usage, SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY (365 days, up to
+45 minutes behind). --record saves the fetched rows as a fixture; --fixture reports on a
+recorded fixture without connecting or reading config.ini, which is how the report is checked
+offline (tests/fixtures/query_history.json). The aggregation lives in `testing.query_history`.
+
+Usage:
+    python -m testing.snowflake_query_report                      # Latest run of the last day
+    python -m testing.snowflake_query_report --run-id 20261019T040000-a1b2c3 --hours 48
+    python -m testing.snowflake_query_report --record history.json
+    python -m testing.snowflake_query_report --fixture history.json
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+from testing.query_history import format_bytes, load_fixture, summarize_run
+
+RESULTS_DIR = os.path.join("data", "benchmarks")
+
+HISTORY_COLUMNS = [
+    "QUERY_ID", "QUERY_TAG", "QUERY_TYPE", "EXECUTION_STATUS", "START_TIME", "TOTAL_ELAPSED_TIME",
+    "COMPILATION_TIME", "EXECUTION_TIME", "QUEUED_PROVISIONING_TIME", "QUEUED_REPAIR_TIME",
+    "QUEUED_OVERLOAD_TIME", "TRANSACTION_BLOCKED_TIME", "BYTES_SCANNED", "ROWS_PRODUCED", "WAREHOUSE_NAME",
+]
+
+def history_query(account_usage):
+    """QUERY_HISTORY statement for the app's tagged statements; parameters: hours, user, tag_pattern."""
+    columns = ", ".join(HISTORY_COLUMNS)
+    if account_usage:
+        return f"""
+        SELECT {columns}, CREDITS_USED_CLOUD_SERVICES
+        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+        WHERE START_TIME >= DATEADD('hour', -%(hours)s, CURRENT_TIMESTAMP())
+          AND USER_NAME = UPPER(%(user)s)
+          AND QUERY_TAG LIKE %(tag_pattern)s
+        ORDER BY START_TIME
+        """
+    return f"""
+    SELECT {columns}
+    FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(
+        USER_NAME => UPPER(%(user)s),
+        END_TIME_RANGE_START => DATEADD('hour', -%(hours)s, CURRENT_TIMESTAMP()),
+        RESULT_LIMIT => 10000))
+    WHERE QUERY_TAG LIKE %(tag_pattern)s
+    ORDER BY START_TIME
+    """
+
+def fetch_history(hours, account_usage):
+    """The app's tagged QUERY_HISTORY rows of the last `hours`, and the app name they are tagged with."""
+    # Imported here so --fixture runs without credentials or the Snowflake connector
+    from connectors.snowflake_connector import pooled_cursor, query_stage
+    from config import SNOWFLAKE_USER, SNOWFLAKE_QUERY_TAG_APP
+    import snowflake.connector
+
+    params = {"hours": hours, "user": SNOWFLAKE_USER, "tag_pattern": f'%"app":"{SNOWFLAKE_QUERY_TAG_APP}"%'}
+    with query_stage("query_report"), pooled_cursor(snowflake.connector.DictCursor) as cur:
+        cur.execute(history_query(account_usage), params)
+        return cur.fetchall(), SNOWFLAKE_QUERY_TAG_APP
+
+def record_fixture(rows, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(rows, f, indent=2, default=str)  # Timestamps as strings
+    print(f"Recorded {len(rows)} QUERY_HISTORY rows to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-id", help="Run to report on (default: the latest tagged run)")
+    parser.add_argument("--hours", type=int, default=24, help="QUERY_HISTORY window to search")
+    parser.add_argument("--account-usage", action="store_true", help="Use ACCOUNT_USAGE (credits, 365 days, delayed)")
+    parser.add_argument("--fixture", help="Report on recorded QUERY_HISTORY rows instead of Snowflake")
+    parser.add_argument("--record", help="Save the fetched QUERY_HISTORY rows to this fixture")
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/snowflake_queries_<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.fixture:
+        rows, app = load_fixture(args.fixture), None  # Recorded rows were already selected by app
+        source = args.fixture
+    else:
+        rows, app = fetch_history(args.hours, args.account_usage)
+        source = "account_usage" if args.account_usage else "information_schema"
+        if args.record:
+            record_fixture(rows, args.record)
+
+    run_id, stages = summarize_run(rows, args.run_id, app)
+    if not stages:
+        raise SystemExit(f"No tagged statements for run {run_id or '(none found)'} in {source}")
+    print(f"Run {run_id}: {sum(s['statements'] for s in stages)} statements from {source}")
+    for s in stages:
+        credits = f"  credits {s['cloud_services_credits']:.4f}" if "cloud_services_credits" in s else ""
+        print(f"{s['stage']:<18} n={s['statements']:<5} failed {s['failed']:<3} scanned {format_bytes(s['bytes_scanned']):>8}  "
+              f"compile {s['compilation_s']:7.2f}s  execute {s['execution_s']:8.2f}s  queued {s['queued_s']:7.2f}s  "
+              f"blocked {s['blocked_s']:6.2f}s  p95 {s['p95_elapsed_s']:6.2f}s{credits}")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "run_id": run_id,
+        "stages": stages,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"snowflake_queries_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# startup_benchmark.py
+"""
+Cold-start import benchmark for the project's entry points.
+Each entry point is imported in a fresh interpreter under `python -X importtime`, and the
+report gives the total import time (median over --repeat runs) and the top-level packages
+that account for most of it, so a heavy dependency creeping back into a startup path
+(torch, transformers, spaCy, ...) shows up as a regression.
+
+The Streamlit apps execute their UI at import, so they are measured by the imports they
+make before rendering rather than by importing the app scripts themselves.
+
+Usage:
+    python -m testing.startup_benchmark
+    python -m testing.startup_benchmark --entry main --repeat 5 --compare data/benchmarks/previous.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+RESULTS_DIR = os.path.join("data", "benchmarks")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> import statement run in a fresh interpreter
+ENTRY_POINTS = {
+    "main": "import main",
+    "scraper": "import data_pipeline.twitter_client",
+    "utils": "import data_pipeline.utils",
+    "enrichment": "import data_pipeline.enriched_tweets",
+    "neo4j_loader": "import data_pipeline.data_loading_neo4j",
+    "qa_system": "import data_pipeline.llm_qa",
+    "dashboard": "import streamlit, plotly.express, visualization.queries",
+    "qa_app": "import streamlit, openai, neo4j, data_pipeline.retrieval, data_pipeline.qa_streaming",
+}
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into (total seconds, {top-level package: seconds}).
+    The total is the sum of the cumulative times of the outermost imports; packages are
+    charged the self time of every module under them.
+    """
+    total_us = 0
+    by_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total_us += int(cumulative_us)
+        by_package[module.split(".")[0]] += int(self_us)
+    return total_us / 1e6, {package: us / 1e6 for package, us in by_package.items()}
+
+def measure(statement):
+    """Import time of `statement` in a fresh interpreter, or raise RuntimeError if it fails."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        error_lines = [l for l in completed.stderr.splitlines() if not l.startswith("import time:")]
+        raise RuntimeError(error_lines[-1] if error_lines else f"exit code {completed.returncode}")
+    return parse_importtime(completed.stderr)
+
+def benchmark_entry(statement, repeat, top):
+    totals, packages = [], defaultdict(list)
+    for _ in range(repeat):
+        total, by_package = measure(statement)
+        totals.append(total)
+        for package, seconds in by_package.items():
+            packages[package].append(seconds)
+    heaviest = sorted(
+        ((package, statistics.median(samples)) for package, samples in packages.items()),
+        key=lambda item: item[1], reverse=True,
+    )[:top]
+    return {
+        "statement": statement,
+        "median_seconds": statistics.median(totals),
+        "min_seconds": min(totals),
+        "heaviest_packages": dict(heaviest),
+    }
+
+def compare(report, baseline_path):
+    """Print the change of each entry point's median import time against a previous report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path}:")
+    for name, result in report["entry_points"].items():
+        before = baseline["entry_points"].get(name)
+        if "median_seconds" not in result or not before or "median_seconds" not in before:
+            continue
+        delta = (result["median_seconds"] - before["median_seconds"]) * 1000
+        print(f"  {name:<14} {delta:+.0f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", action="append", choices=sorted(ENTRY_POINTS),
+                        help="Entry point to measure (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages listed per entry point")
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/startup_<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "entry_points": {},
+    }
+    for name in args.entry or ENTRY_POINTS:
+        try:
+            result = benchmark_entry(ENTRY_POINTS[name], args.repeat, args.top)
+        except RuntimeError as e:
+            # Usually a dependency that is not installed in this environment
+            report["entry_points"][name] = {"statement": ENTRY_POINTS[name], "error": str(e)}
+            print(f"{name:<14} failed: {e}")
+            continue
+        report["entry_points"][name] = result
+        packages = ", ".join(f"{p} {s * 1000:.0f}ms" for p, s in result["heaviest_packages"].items())
+        print(f"{name:<14} {result['median_seconds'] * 1000:>8.0f}ms  ({packages})")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
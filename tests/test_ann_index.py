@@ -0,0 +1,47 @@
+# test_ann_index.py
+from data_pipeline.ann_index import TweetANNIndex
+
+class FakeGraph:
+    """Tweets with a loaded_at timestamp; records the parameters of every sync query."""
+
+    def __init__(self):
+        self.tweets = []
+        self.syncs = []
+
+    def load(self, tweet_id, loaded_at, embedding):
+        self.tweets.append({"tweet_id": tweet_id, "embedding": embedding, "text": "nike", "date": "2025-03-01",
+                            "loaded_at": loaded_at})
+
+    def session(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query, since=None, **kwargs):
+        if "CREATE INDEX" in query:
+            return []
+        self.syncs.append(since)
+        return [t for t in self.tweets if since is None or "$since" not in query or t["loaded_at"] >= since]
+
+def test_sync_reads_only_tweets_loaded_since_the_watermark(tmp_path):
+    graph = FakeGraph()
+    graph.load("1", 1000, [1.0, 0.0])
+    graph.load("2", 2000, [0.0, 1.0])
+    index = TweetANNIndex(path=str(tmp_path), dimensions=2)
+    assert index.sync_from_neo4j(graph) == 2
+    assert index.synced_until == 2000
+
+    graph.load("3", 3000, [1.0, 1.0])
+    assert index.sync_from_neo4j(graph) == 1
+    assert graph.syncs == [None, 2000]
+    assert index.synced_until == 3000
+
+    # A new process resumes from the stored watermark
+    reopened = TweetANNIndex(path=str(tmp_path), dimensions=2)
+    assert reopened.sync_from_neo4j(graph) == 0
+    assert graph.syncs[-1] == 3000
+    assert reopened.count == 3
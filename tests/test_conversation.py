@@ -0,0 +1,33 @@
+# test_conversation.py
+from data_pipeline.conversation import ConversationRetrieval
+from data_pipeline.retrieval_filters import RetrievalFilter
+
+ROWS = [
+    {"tweet_id": "1", "tweet": "Nike running shoes are great", "date": "2024-03-02"},
+    {"tweet_id": "2", "tweet": "Nike running shoes keep selling out", "date": "2024-03-20"},
+    {"tweet_id": "3", "tweet": "Adidas running shoes are comfy", "date": "2024-03-21"},
+]
+EMBEDDINGS = {"1": [1.0, 0.0], "2": [0.9, 0.1], "3": [0.8, 0.2]}
+MARCH = RetrievalFilter(brands=["Nike", "Adidas"], since="2024-03-01", until="2024-03-31")
+
+def conversation():
+    retrieval = ConversationRetrieval(min_similarity=0.5, min_coverage=1, max_reuses=5)
+    retrieval.remember(ROWS, EMBEDDINGS, MARCH)
+    return retrieval
+
+def reranked(filters):
+    rows = conversation().rerank([1.0, 0.0], ["running"], filters)
+    return None if rows is None else sorted(row["tweet_id"] for row in rows)
+
+def test_follow_up_without_filters_reuses_every_candidate():
+    assert reranked(None) == ["1", "2", "3"]
+
+def test_narrower_follow_up_keeps_the_candidates_it_admits():
+    assert reranked(RetrievalFilter(brands=["Nike"])) == ["1", "2"]
+    assert reranked(RetrievalFilter(since="2024-03-15", until="2024-03-31")) == ["2", "3"]
+    assert reranked(RetrievalFilter(brands=["Adidas"], since="2024-03-15")) == ["3"]
+
+def test_wider_or_other_filters_query_the_graph():
+    assert reranked(RetrievalFilter(brands=["Puma"])) is None
+    assert reranked(RetrievalFilter(since="2024-02-01")) is None
+    assert reranked(RetrievalFilter(until="2024-04-30")) is None
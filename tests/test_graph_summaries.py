@@ -0,0 +1,47 @@
+# test_graph_summaries.py
+from datetime import date
+
+from data_pipeline.graph_summaries import covers_residual, dirty_condition, summarize, summary_request
+
+TODAY = date(2025, 3, 15)
+
+def tweet(tweet_id, likes, sentiment="Positive", topic="Running", hashtags=(), cluster=None):
+    return {"tweet_id": tweet_id, "date": f"2025-03-{tweet_id:02d}", "brands": ["Nike"], "topic": topic,
+            "hashtags": list(hashtags), "sentiment": sentiment, "like_count": likes, "retweet_count": 0,
+            "cluster": cluster or tweet_id}
+
+def test_adding_new_tweets_matches_a_full_recompute():
+    old = [tweet(1, 5), tweet(2, 50, "Negative"), tweet(3, 1, topic="Football", hashtags=["justdoit"])]
+    new = [tweet(4, 20, "Neutral", hashtags=["justdoit"]), tweet(5, 60, cluster=2)]
+    key = ("brand", "Nike", "all")
+    base, base_ids = summarize(key, old, representatives=2)
+    base_representatives = [t for t in old if t["tweet_id"] in base_ids]
+
+    merged, merged_ids = summarize(key, new, base, base_representatives, representatives=2)
+    full, full_ids = summarize(key, old + new, representatives=2)
+    for field in ("tweet_count", "like_count", "first_date", "last_date", "top_topics", "top_topic_counts",
+                  "top_hashtags", "top_hashtag_counts"):
+        assert merged[field] == full[field], field
+    assert dict(zip(merged["sentiment_labels"], merged["sentiment_counts"])) == \
+        dict(zip(full["sentiment_labels"], full["sentiment_counts"]))
+    assert merged_ids == full_ids == [5, 4]  # Tweet 2 loses its cluster to the more engaging 5
+
+def test_brand_sentiment_questions_use_summaries():
+    assert summary_request("How do people feel about Nike?", TODAY)["residual"] == []
+    assert summary_request("What's the overall sentiment toward Under Armour's brand?", TODAY)["residual"] == []
+
+def test_qualified_questions_are_left_to_retrieval():
+    request = summary_request("How do people feel about Nike's new running shoes?", TODAY)
+    assert set(request["residual"]) == {"new", "running", "shoes"}
+    summaries = [{"kind": "brand", "name": "Nike"}, {"kind": "topic", "name": "Running"}]
+    assert not covers_residual(request, summaries)
+
+def test_residual_words_naming_a_topic_keep_the_summaries():
+    request = summary_request("Overall sentiment about running for Nike", TODAY)
+    assert covers_residual(request, [{"kind": "brand", "name": "Nike"}, {"kind": "topic", "name": "Running"}])
+    assert not covers_residual(request, [{"kind": "brand", "name": "Nike"}])
+
+def test_refresh_reads_tweets_from_the_loaded_at_watermark():
+    assert dirty_condition(full=True, synced_until=1700000000000) == "true"
+    assert "loaded_at" not in dirty_condition(full=False, synced_until=None)  # First refresh: every new tweet
+    assert dirty_condition(full=False, synced_until=1700000000000).startswith("t.loaded_at >= $since")
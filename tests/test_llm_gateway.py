@@ -0,0 +1,42 @@
+# test_llm_gateway.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from data_pipeline.deadlines import Deadline, DeadlineExceeded, hedged
+from data_pipeline.llm_gateway import LLMGateway
+
+class APITimeoutError(Exception):
+    """Named like the SDK's timeout error, so the gateway treats it as retryable."""
+
+def timing_out(timeout, *args, **kwargs):
+    """A client call that hangs until its timeout, as the SDK does at the deadline."""
+    time.sleep(timeout or 0)
+    raise APITimeoutError("Request timed out.")
+
+@pytest.fixture
+def gateway():
+    gateway = LLMGateway(api_key="test", cache_enabled=False)
+    gateway._create_chat = lambda model, messages, temperature, stream, timeout: timing_out(timeout)
+    gateway._create_embeddings = lambda inputs, timeout: timing_out(timeout)
+    return gateway
+
+def test_chat_timing_out_at_the_deadline_raises_deadline_exceeded(gateway):
+    with pytest.raises(DeadlineExceeded) as raised:
+        gateway.chat([{"role": "user", "content": "hi"}], deadline=Deadline(0.2))
+    assert isinstance(raised.value.__cause__, APITimeoutError)
+
+def test_hedged_embedding_timing_out_at_the_deadline_raises_deadline_exceeded(gateway):
+    with pytest.raises(DeadlineExceeded):
+        gateway.embed("hi", deadline=Deadline(0.2), hedge=True)
+
+def test_hedged_converts_a_late_failure():
+    with ThreadPoolExecutor(max_workers=2) as executor, pytest.raises(DeadlineExceeded):
+        hedged(lambda: timing_out(0.2), hedge_after=10, deadline=Deadline(0.1), executor=executor)
+
+def test_errors_before_the_deadline_are_not_converted(gateway):
+    def rejected(*args, **kwargs):
+        raise ValueError("invalid request")
+    gateway._create_chat = rejected
+    with pytest.raises(ValueError):
+        gateway.chat([{"role": "user", "content": "hi"}], deadline=Deadline(5))
@@ -0,0 +1,66 @@
+# test_llm_qa.py
+from data_pipeline.llm_qa import QASystem
+
+SUMMARY = {"key": "brand:nike|month:2024-03", "kind": "brand", "name": "Nike", "bucket": "2024-03",
+           "tweet_count": 120, "like_count": 900, "retweet_count": 80,
+           "sentiment_labels": ["POSITIVE", "NEGATIVE"], "sentiment_counts": [90, 30],
+           "tweets": [{"tweet_id": "7", "tweet": "Nike launch was great", "sentiment": "POSITIVE"}]}
+TWEETS = [{"tweet_id": "1", "tweet": "My Adidas shoes fell apart", "sentiment": "NEGATIVE"}]
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def chat(self, messages, temperature=0.0, deadline=None):
+        self.prompts.append(messages[-1]["content"])
+        return "answer"
+
+class FakeQASystem(QASystem):
+    """QASystem with canned router, summary and retrieval results instead of Neo4j."""
+
+    def __init__(self):
+        self.llm = FakeLLM()
+        self.answer_cache = None
+        self.retrieved = []
+        self.embedded = []
+
+    def answer_routed(self, question):
+        return {"answer": "42 tweets", "sources": []} if question.startswith("How many") else None
+
+    def lookup_summaries(self, question):
+        return [SUMMARY] if "overall" in question else []
+
+    def generate_embeddings(self, text, deadline=None):
+        self.embedded.append(text)
+        return [1.0, 0.0]
+
+    def generate_embeddings_batch(self, texts):
+        self.embedded.extend(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+    def query_knowledge_graph(self, question, embedding, keywords=None):
+        self.retrieved.append(question)
+        return TWEETS
+
+    def query_knowledge_graph_many(self, questions, embeddings):
+        self.retrieved.extend(questions)
+        return [TWEETS for _ in questions]
+
+def test_process_question_answers_aggregates_from_summaries():
+    qa = FakeQASystem()
+    result = qa.process_question("Nike overall sentiment in March 2024")
+    assert qa.retrieved == []
+    assert [source["tweet_id"] for source in result["sources"]] == ["7"]
+    assert "Tweet summaries" in qa.llm.prompts[0]
+
+def test_process_questions_routes_and_summarizes_before_retrieval():
+    qa = FakeQASystem()
+    questions = ["How many tweets mention Nike?", "Nike overall sentiment in March 2024", "Why do Adidas shoes break?"]
+    results = qa.process_questions(questions, requests_per_minute=0)
+
+    assert results[0]["answer"] == "42 tweets"
+    assert qa.embedded == questions[1:]
+    assert qa.retrieved == questions[2:]
+    assert [source["tweet_id"] for source in results[1]["sources"]] == ["7"]
+    assert [source["tweet_id"] for source in results[2]["sources"]] == ["1"]
+    assert sorted("Tweet summaries" in prompt for prompt in qa.llm.prompts) == [False, True]
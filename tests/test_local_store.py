@@ -0,0 +1,50 @@
+# test_local_store.py
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pyarrow as pa
+
+from visualization import local_store
+from visualization.local_store import STORE_COLUMNS, LocalTweetStore
+
+class FakeFinalTweets:
+    """FINAL_TWEETS rows, answering the sync query's CREATED_AT lower bound."""
+
+    def __init__(self):
+        self.rows = []
+        self.bounds = []
+
+    def load(self, tweet_id, created_at):
+        self.rows.append({"TWEET_ID": tweet_id, "CREATED_AT": created_at, "DATE": created_at.date(),
+                          "TEXT": f"Nike tweet {tweet_id}", "SCREEN_NAME": "fan", "SENTIMENT": "POSITIVE",
+                          "TOPIC": "Running", "LIKE_COUNT": 1, "RETWEET_COUNT": 0})
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, query, params=None):
+        since = datetime.fromisoformat(params[0]) if params else None
+        self.bounds.append(since)
+        self.result = [row for row in self.rows if since is None or row["CREATED_AT"] >= since]
+
+    def fetch_arrow_all(self):
+        return pa.Table.from_pylist(self.result) if self.result else None
+
+def test_sync_picks_up_rows_loaded_after_newer_ones(tmp_path, monkeypatch):
+    tweets = FakeFinalTweets()
+    monkeypatch.setattr(local_store, "pooled_cursor", tweets.cursor)
+    store = LocalTweetStore(path=str(tmp_path))
+
+    tweets.load("1", datetime(2025, 3, 10, 12))
+    store.sync()
+    # Scraped late: created before the watermark, loaded after the last sync
+    tweets.load("2", datetime(2025, 3, 9, 8))
+    store.sync()
+    store.sync()
+
+    table = store.table()
+    assert sorted(table["TWEET_ID"].to_pylist()) == ["1", "2"]
+    assert table.column_names == STORE_COLUMNS + ["BRAND"]
+    assert len(store._parts()) == 2  # The re-read overlap adds no part of already stored rows
+    assert tweets.bounds[-1].date() == date(2025, 3, 3)
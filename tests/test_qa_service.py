@@ -0,0 +1,55 @@
+# test_qa_service.py
+import asyncio
+
+from data_pipeline.qa_service import ConversationStore, QAService
+
+class FakePipeline:
+    """Records the conversation each question was answered in."""
+
+    def __init__(self):
+        self.conversations = []
+
+    async def run(self, question, emit, conversation=None):
+        await asyncio.sleep(0)
+        self.conversations.append(conversation)
+        emit("answer")
+        return {"question": question, "answer": "answer"}
+
+def answer(requests, concurrently):
+    """Conversations the service answered (question, conversation_id) requests in."""
+    async def main():
+        service = QAService(qa_system=None)
+        service.pipeline = FakePipeline()
+        if concurrently:
+            shared = [service.ask(question, conversation_id) for question, conversation_id in requests]
+            await asyncio.gather(*(answer.task for answer in shared))
+        else:
+            for question, conversation_id in requests:
+                await service.ask(question, conversation_id).task
+        return service.pipeline.conversations
+    return asyncio.run(main())
+
+def test_follow_ups_share_their_conversation():
+    conversations = answer([("How is Nike doing?", "a"), ("And their shoes?", "a"), ("How is Nike doing?", "b")],
+                           concurrently=False)
+    assert conversations[0] is conversations[1]
+    assert conversations[2] is not conversations[0]
+
+def test_identical_questions_coalesce_only_within_a_conversation():
+    conversations = answer([("How is Nike doing?", "a"), ("how is  nike doing?", "a"), ("How is Nike doing?", "b")],
+                           concurrently=True)
+    assert len(conversations) == 2
+
+def test_requests_without_an_id_have_no_conversation():
+    assert answer([("How is Nike doing?", None)], concurrently=False) == [None]
+
+def test_idle_and_least_recently_used_conversations_are_dropped():
+    store = ConversationStore(ttl=-1, max_conversations=10)
+    first = store.get("a")
+    assert store.get("a") is not first  # Expired
+    store = ConversationStore(ttl=60, max_conversations=2)
+    a, b = store.get("a"), store.get("b")
+    store.get("c")  # Drops "a"
+    assert len(store) == 2
+    assert store.get("b") is b
+    assert store.get("a") is not a
@@ -0,0 +1,61 @@
+# test_qa_streaming.py
+import asyncio
+
+from data_pipeline.qa_streaming import StreamingQAPipeline
+
+TWEETS = [{"tweet_id": "1", "text": "Loving my new Nike runners", "brands": ["nike"]}]
+
+class FakeCache:
+    """Records the answers written to it."""
+
+    def __init__(self):
+        self.added = []
+
+    def lookup(self, embedding, question=None):
+        return None
+
+    def add(self, question, embedding, entry):
+        self.added.append(entry)
+
+    def record(self, hit, seconds):
+        pass
+
+class FakeQA:
+    def __init__(self):
+        self.answer_cache = FakeCache()
+
+    def extract_keywords(self, question):
+        return ["nike"]
+
+    def generate_embeddings(self, text, deadline=None):
+        return [0.1, 0.2]
+
+    def query_knowledge_graph(self, question, embedding, keywords):
+        return TWEETS
+
+def answer(chat_stream):
+    qa = FakeQA()
+    pipeline = StreamingQAPipeline(qa, chat_stream=chat_stream)
+    tokens = []
+    result = asyncio.run(pipeline.run("How is Nike doing?", tokens.append))
+    return result, qa.answer_cache.added
+
+def test_complete_answer_is_cached():
+    result, cached = answer(lambda messages, temperature: iter(["Nike ", "is doing well."]))
+    assert result["answer"] == "Nike is doing well."
+    assert result["degraded"] == []
+    assert [entry["answer"] for entry in cached] == ["Nike is doing well."]
+
+def test_answer_stream_failing_midway_is_degraded_and_not_cached():
+    def chat_stream(messages, temperature):
+        if temperature:  # Follow-up questions
+            return iter(["Which shoes?"])
+        def tokens():
+            yield "Nike is "
+            raise RuntimeError("connection reset")
+        return tokens()
+
+    result, cached = answer(chat_stream)
+    assert result["answer"].startswith("Nike is Error generating answer")
+    assert "answer" in result["degraded"]
+    assert cached == []
@@ -0,0 +1,37 @@
+# test_question_router.py
+from datetime import date
+
+import pytest
+from data_pipeline.question_router import route_question, followup_questions
+
+TODAY = date(2026, 3, 18)
+
+@pytest.mark.parametrize("question", [
+    "How many tweets about running shoes?",
+    "How many tweets mention the Nike Air Max?",
+    "What hashtags does Adidas use for the World Cup campaign?",
+    "How many negative tweets about the Nike recall?",
+    "Which topics drive negative sentiment for Nike?",
+    "Why is Puma sentiment so negative this month?",
+])
+def test_qualified_questions_are_not_routed(question):
+    assert route_question(question, TODAY) is None
+
+@pytest.mark.parametrize("question, intent, brands", [
+    ("How many tweets mention Puma this month?", "tweet_count", ["Puma"]),
+    ("What share of Nike tweets are negative?", "sentiment_share", ["Nike"]),
+    ("Top hashtags for Adidas", "top_hashtags", ["Adidas"]),
+    ("What are the most discussed topics for Nike and Puma last week?", "top_topics", ["Nike", "Puma"]),
+    ("What percentage of Under Armour's tweets are positive since 2026-01-01?", "sentiment_share", ["Under Armour"]),
+    ("How many tweets are there?", "tweet_count", []),
+])
+def test_plain_aggregates_are_routed(question, intent, brands):
+    route = route_question(question, TODAY)
+    assert route is not None
+    assert route.intent == intent
+    assert route.filters.brands == brands
+
+def test_followup_questions_route_back_to_templates():
+    route = route_question("How many tweets mention Nike?", TODAY)
+    for question in followup_questions(route):
+        assert route_question(question, TODAY) is not None
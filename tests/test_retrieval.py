@@ -0,0 +1,54 @@
+# test_retrieval.py
+from data_pipeline.retrieval import Neo4jVectorBackend, hybrid_search
+from data_pipeline.retrieval_filters import RetrievalFilter
+from config import ANN_FILTER_EXACT_MAX, VECTOR_FILTER_OVERFETCH
+
+class FakeResult(list):
+    def data(self):
+        return list(self)
+
+class FakeSession:
+    """Fails the full-text query as Neo4j does when the index is missing; echoes the context query."""
+
+    def run(self, query, params=None, **kwargs):
+        if "db.index.fulltext.queryNodes" in query:
+            raise RuntimeError("There is no such fulltext schema index: tweet_text")
+        return FakeResult({"tweet_id": hit["tweet_id"]} for hit in params["hits"])
+
+class FakeBackend:
+    def search(self, session, embedding, top_k, filters=None):
+        return [("1", 0.9), ("2", 0.8)]
+
+def test_missing_fulltext_index_keeps_vector_hits():
+    rows = hybrid_search(FakeSession(), [0.1, 0.2], ["nike"], FakeBackend())
+    assert [row["tweet_id"] for row in rows] == ["1", "2"]
+
+class RecordingSession:
+    """Answers the filtered vector query with `ann` hits and the exact query with `exact` hits."""
+
+    def __init__(self, ann, exact):
+        self.ann, self.exact = ann, exact
+        self.statements = []
+
+    def run(self, query, params=None, **kwargs):
+        name = "exact" if "vector_exact" in query else "ann"
+        self.statements.append((name, params))
+        return FakeResult({"tweet_id": tweet_id, "score": score} for tweet_id, score in getattr(self, name))
+
+def test_filtered_search_overfetches_from_the_vector_index():
+    session = RecordingSession(ann=[("1", 0.9), ("2", 0.8)], exact=[])
+    hits = Neo4jVectorBackend().search(session, [0.1, 0.2], 2, RetrievalFilter(brands=["Nike"]))
+    assert hits == [("1", 0.9), ("2", 0.8)]
+    assert [name for name, _ in session.statements] == ["ann"]
+    assert session.statements[0][1]["fetchK"] == 2 * VECTOR_FILTER_OVERFETCH
+
+def test_narrow_filter_falls_back_to_the_capped_exact_search():
+    session = RecordingSession(ann=[("1", 0.9)], exact=[("1", 0.9), ("3", 0.7)])
+    hits = Neo4jVectorBackend().search(session, [0.1, 0.2], 2, RetrievalFilter(brands=["Nike"]))
+    assert hits == [("1", 0.9), ("3", 0.7)]
+    assert session.statements[1][1]["exactMax"] == ANN_FILTER_EXACT_MAX
+
+def test_too_many_eligible_tweets_keep_the_vector_index_hits():
+    session = RecordingSession(ann=[("1", 0.9)], exact=[])  # The exact query returns nothing above the cap
+    hits = Neo4jVectorBackend().search(session, [0.1, 0.2], 2, RetrievalFilter(brands=["Nike"]))
+    assert hits == [("1", 0.9)]
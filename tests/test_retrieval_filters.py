@@ -0,0 +1,31 @@
+# test_retrieval_filters.py
+from datetime import date
+
+import pytest
+from data_pipeline.question_router import route_question
+from data_pipeline.retrieval_filters import extract_filters
+
+TODAY = date(2026, 3, 15)
+
+@pytest.mark.parametrize("question, since, until", [
+    ("How many tweets mention Nike between 2026-01-01 and 2026-01-31?", "2026-01-01", "2026-01-31"),
+    ("Nike tweets from 2026-01-01 to 2026-01-31", "2026-01-01", "2026-01-31"),
+    ("Nike tweets between 2026-01-31 and 2026-01-01", "2026-01-01", "2026-01-31"),
+    ("Nike tweets since 2026-01-01 until 2026-01-31", "2026-01-01", "2026-01-31"),
+    ("Nike tweets up to 2026-01-31", None, "2026-01-31"),
+    ("Nike tweets after 2026-01-01", "2026-01-01", None),
+    ("Nike tweets on 2026-01-05", "2026-01-05", "2026-01-05"),
+])
+def test_date_phrasings(question, since, until):
+    filters = extract_filters(question, TODAY)
+    assert (filters.since, filters.until) == (since, until)
+
+def test_dates_that_cannot_be_told_apart_give_no_window():
+    question = "How many tweets mention Nike on 2026-01-05 or 2026-01-09?"
+    filters = extract_filters(question, TODAY)
+    assert (filters.since, filters.until) == (None, None)
+    assert route_question(question, TODAY) is None  # Not answered as an all-time count
+
+def test_date_ranges_are_routed_with_the_range():
+    route = route_question("How many tweets mention Nike between 2026-01-01 and 2026-01-31?", TODAY)
+    assert (route.filters.since, route.filters.until) == ("2026-01-01", "2026-01-31")
@@ -0,0 +1,26 @@
+# test_semantic_cache.py
+from data_pipeline.semantic_cache import SemanticAnswerCache
+
+def test_concurrent_writers_keep_each_others_entries(tmp_path):
+    # Two processes' caches on one directory: both load before either writes
+    first = SemanticAnswerCache(path=str(tmp_path), threshold=0.99)
+    second = SemanticAnswerCache(path=str(tmp_path), threshold=0.99)
+    first.add("How is Nike doing?", [1.0, 0.0], {"answer": "nike"})
+    second.add("How is Adidas doing?", [0.0, 1.0], {"answer": "adidas"})
+
+    reader = SemanticAnswerCache(path=str(tmp_path), threshold=0.99)
+    assert reader.lookup([1.0, 0.0], "How is Nike doing?") == {"answer": "nike"}
+    assert reader.lookup([0.0, 1.0], "How is Adidas doing?") == {"answer": "adidas"}
+    # The first writer sees the second's entry without reopening the cache
+    assert first.lookup([0.0, 1.0], "How is Adidas doing?") == {"answer": "adidas"}
+
+def test_questions_with_other_filters_do_not_share_answers(tmp_path):
+    cache = SemanticAnswerCache(path=str(tmp_path), threshold=0.9)
+    cache.add("Nike sentiment in March 2024", [1.0, 0.0], {"answer": "march"})
+    cache.add("How is Nike doing?", [1.0, 0.0], {"answer": "overall"})
+
+    # Near-identical embeddings, but another brand or time window
+    assert cache.lookup([1.0, 0.0], "Adidas sentiment in March 2024") is None
+    assert cache.lookup([1.0, 0.01], "Nike sentiment in April 2024") is None
+    assert cache.lookup([1.0, 0.01], "Nike sentiment in March 2024") == {"answer": "march"}
+    assert cache.lookup([1.0, 0.01], "How's Nike doing?") == {"answer": "overall"}
@@ -0,0 +1,36 @@
+# test_snowflake_query_report.py
+import json
+import os
+import subprocess
+import sys
+
+from testing.query_history import load_fixture, parse_query_tag, summarize_run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, "tests", "fixtures", "query_history.json")
+
+def test_latest_run_is_summarized_by_stage():
+    run_id, stages = summarize_run(load_fixture(FIXTURE))
+    assert run_id == "20261019T040000-d4e5f6"  # The later query_report run is not a pipeline run
+    by_stage = {stage["stage"]: stage for stage in stages}
+    assert [stage["stage"] for stage in stages] == ["process_tweets", "load_neo4j"]  # Most elapsed time first
+    assert by_stage["process_tweets"]["statements"] == 2
+    assert by_stage["process_tweets"]["bytes_scanned"] == 3 * 1024 * 1024
+    assert by_stage["process_tweets"]["queued_s"] == 1.5
+    assert by_stage["load_neo4j"]["failed"] == 1
+
+def test_earlier_run_and_other_apps():
+    _, stages = summarize_run(load_fixture(FIXTURE), "20261018T040000-a1b2c3")
+    assert sum(stage["statements"] for stage in stages) == 2
+    assert summarize_run(load_fixture(FIXTURE), app="another-app") == (None, [])
+    assert parse_query_tag("not json") is None
+
+def test_fixture_report_runs_without_config_or_snowflake(tmp_path):
+    # No config.ini in the working directory: importing config or the connector would fail
+    output = tmp_path / "report.json"
+    subprocess.run([sys.executable, "-m", "testing.snowflake_query_report", "--fixture", FIXTURE,
+                    "--output", str(output)], cwd=tmp_path, check=True, capture_output=True,
+                   env={**os.environ, "PYTHONPATH": ROOT})
+    report = json.loads(output.read_text())
+    assert report["run_id"] == "20261019T040000-d4e5f6"
+    assert len(report["stages"]) == 2
@@ -3,6 +3,12 @@ Visualization modules for the Twitter Analytics project.
 This package provides Streamlit-based dashboard and Q&A interfaces.
 """
 
-from ..data_pipeline.llm_qa import QASystem
+__all__ = ['QASystem']
 
-__all__ = ['QASystem']
\ No newline at end of file
+def __getattr__(name):
+    # QASystem pulls in spaCy and OpenAI, so only import it when it is actually used.
+    # This keeps `visualization.queries` importable from the dashboard scripts.
+    if name == 'QASystem':
+        from data_pipeline.llm_qa import QASystem
+        return QASystem
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -18,8 +18,14 @@ st.set_page_config(
 )
 
 # Now import from the root-level connectors
-from connectors.snowflake_connector import get_connection
+from connectors.snowflake_connector import get_pool
 from connectors.neo4j_connector import get_driver
+from visualization.queries import get_dashboard_panels
+from visualization.panel_cache import get_panel_cache
+from data_pipeline.tracing import start_metrics_server
+from config import METRICS_PORT
+
+start_metrics_server(METRICS_PORT)  # Once per process; later reruns are no-ops
 
 # Add custom CSS for better styling - IMPROVED COLORS
 st.markdown("""
@@ -158,9 +164,7 @@ with col1:
 
 with col2:
     st.markdown("<br>", unsafe_allow_html=True)
-    if st.button("🔄 Refresh Data", help="Refresh the dashboard data"):
-        st.cache_data.clear()
-        st.experimental_rerun()
+    refresh_requested = st.button("🔄 Refresh Data", help="Refresh the dashboard data")
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     st.markdown(f"<p class='refresh-time'>Last updated: {current_time}</p>", unsafe_allow_html=True)
 
@@ -193,43 +197,19 @@ with st.sidebar:
 @st.cache_resource
 def init_connections():
     try:
-        snowflake_conn = get_connection()
+        snowflake_pool = get_pool()
         neo4j_driver = get_driver()
-        return snowflake_conn, neo4j_driver, None
+        return snowflake_pool, neo4j_driver, None
     except Exception as e:
         return None, None, str(e)
 
-snowflake_conn, neo4j_driver, connection_error = init_connections()
+snowflake_pool, neo4j_driver, connection_error = init_connections()
 
 if connection_error:
     st.error(f"Failed to connect to databases: {connection_error}")
     st.warning("Displaying sample data instead")
     # You could add sample data fallback here
 
-# Helper function to create where clause for queries
-def get_where_clause():
-    # Date filter
-    if date_range == "Last 7 days":
-        date_filter = "DATE >= DATEADD(day, -7, CURRENT_DATE())"
-    elif date_range == "Last 30 days":
-        date_filter = "DATE >= DATEADD(day, -30, CURRENT_DATE())"
-    elif date_range == "Last 90 days":
-        date_filter = "DATE >= DATEADD(day, -90, CURRENT_DATE())"
-    else:
-        date_filter = "1=1"  # All time
-    
-    # Brand filter
-    brand_conditions = []
-    for brand in brands:
-        brand_conditions.append(f"TEXT ILIKE '%{brand}%'")
-    
-    if brand_conditions:
-        brand_filter = "(" + " OR ".join(brand_conditions) + ")"
-    else:
-        brand_filter = "1=1"
-    
-    return f"WHERE {date_filter} AND {brand_filter}"
-
 # IMPROVED COLOR SCHEME FOR CHARTS
 BRAND_COLORS = {
     "Nike": "#FF9900",      # Orange
@@ -246,100 +226,21 @@ SENTIMENT_COLORS = {
     "Negative": "#FF453A"   # Red
 }
 
-# Data loading functions with progress indicators and error handling
-@st.cache_data(ttl=300)
-def get_brand_sentiment():
-    where_clause = get_where_clause()
-    
-    query = f"""
-    SELECT 
-        CASE 
-            WHEN TEXT ILIKE '%Nike%' THEN 'Nike'
-            WHEN TEXT ILIKE '%Adidas%' THEN 'Adidas'
-            WHEN TEXT ILIKE '%Puma%' THEN 'Puma'
-            WHEN TEXT ILIKE '%Under Armour%' THEN 'Under Armour'
-            WHEN TEXT ILIKE '%New Balance%' THEN 'New Balance'
-            ELSE 'Other'
-        END as BRAND,
-        SENTIMENT,
-        COUNT(*) as COUNT
-    FROM FINAL_TWEETS
-    {where_clause}
-    GROUP BY BRAND, SENTIMENT
-    ORDER BY BRAND, SENTIMENT
-    """
-    
-    try:
-        cursor = snowflake_conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        
-        return pd.DataFrame(results, columns=["Brand", "Sentiment", "Count"]), None
-    except Exception as e:
-        return pd.DataFrame(columns=["Brand", "Sentiment", "Count"]), str(e)
+# Refresh only drops the current filter combination; other users' cached views stay warm
+if refresh_requested:
+    get_panel_cache().invalidate(date_range, brands)
 
-@st.cache_data(ttl=300)
-def get_topic_distribution():
-    where_clause = get_where_clause()
-    
-    query = f"""
-    SELECT 
-        TOPIC,
-        COUNT(*) as COUNT
-    FROM FINAL_TWEETS
-    {where_clause}
-    GROUP BY TOPIC
-    ORDER BY COUNT DESC
-    """
-    
-    try:
-        cursor = snowflake_conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        
-        return pd.DataFrame(results, columns=["Topic", "Count"]), None
-    except Exception as e:
-        return pd.DataFrame(columns=["Topic", "Count"]), str(e)
-
-@st.cache_data(ttl=300)
-def get_top_tweets():
-    where_clause = get_where_clause()
-    
-    query = f"""
-    SELECT 
-        TEXT,
-        SCREEN_NAME,
-        CREATED_AT,
-        SENTIMENT,
-        LIKE_COUNT,
-        RETWEET_COUNT
-    FROM FINAL_TWEETS
-    {where_clause}
-    ORDER BY (LIKE_COUNT + RETWEET_COUNT) DESC
-    LIMIT 10
-    """
-    
-    try:
-        cursor = snowflake_conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        
-        return pd.DataFrame(results, columns=["Text", "User", "Date", "Sentiment", "Likes", "Retweets"]), None
-    except Exception as e:
-        return pd.DataFrame(columns=["Text", "User", "Date", "Sentiment", "Likes", "Retweets"]), str(e)
+# Fetch every panel at once through the shared cache; the tabs below only render the results
+with st.spinner("Loading dashboard data..."):
+    panels = get_dashboard_panels(neo4j_driver, date_range, brands)
 
 # Create tabs for different views instead of radio buttons
 tab1, tab2, tab3 = st.tabs(["📊 Brand Overview", "😊 Sentiment Analysis", "🔍 Topic Analysis"])
 
 with tab1:
     # Brand Overview Tab
-    # Load data with progress indicator
-    with st.spinner("Loading brand data..."):
-        brand_sentiment, bs_error = get_brand_sentiment()
-        top_tweets, tt_error = get_top_tweets()
+    brand_sentiment, bs_error = panels["brand_sentiment"]
+    top_tweets, tt_error = panels["top_tweets"]
         
     if bs_error:
         st.error(f"Error fetching brand sentiment: {bs_error}")
@@ -450,8 +351,7 @@ with tab1:
 
 with tab2:
     # Sentiment Analysis Tab
-    with st.spinner("Loading sentiment data..."):
-        brand_sentiment, bs_error = get_brand_sentiment()
+    brand_sentiment, bs_error = panels["brand_sentiment"]
     
     if bs_error:
         st.error(f"Error fetching sentiment data: {bs_error}")
@@ -597,8 +497,7 @@ with tab2:
 
 with tab3:
     # Topic Analysis Tab
-    with st.spinner("Loading topic data..."):
-        topic_data, topic_error = get_topic_distribution()
+    topic_data, topic_error = panels["topic_distribution"]
     
     if topic_error:
         st.error(f"Error fetching topic data: {topic_error}")
@@ -708,77 +607,42 @@ with tab3:
     st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
     st.subheader("Top Hashtags")
     
-    try:
-        with st.spinner("Loading hashtag data..."):
-            # Define date filter in Neo4j format
-            if date_range == "Last 7 days":
-                date_clause = "date(t.date) >= date() - duration('P7D')"
-            elif date_range == "Last 30 days":
-                date_clause = "date(t.date) >= date() - duration('P30D')"
-            elif date_range == "Last 90 days":
-                date_clause = "date(t.date) >= date() - duration('P90D')"
-            else:
-                date_clause = "1=1"  # All time
-            
-            # Build brand filter for Neo4j
-            brand_clauses = []
-            for brand in brands:
-                brand_clauses.append(f"toLower(t.text) CONTAINS toLower('{brand}')")
-            
-            brand_clause = " OR ".join(brand_clauses) if brand_clauses else "1=1"
-            
-            # Query with both filters
-            query = f"""
-            MATCH (t:Tweet)-[:CONTAINS_HASHTAG]->(h:Hashtag)
-            WHERE ({date_clause}) AND ({brand_clause})
-            RETURN h.tag AS hashtag, COUNT(t) AS count
-            ORDER BY count DESC
-            LIMIT 15
-            """
-            
-            with neo4j_driver.session() as session:
-                result = session.run(query)
-                records = [dict(record) for record in result]
-                
-                if records:
-                    hashtag_data = pd.DataFrame(records)
-                    
-                    # Create hashtag visualization
-                    fig = px.bar(
-                        hashtag_data,
-                        y="hashtag",
-                        x="count",
-                        color="count",
-                        color_continuous_scale="Turbo",
-                        orientation='h'
-                    )
-                    
-                    fig.update_layout(
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        font=dict(color='white'),
-                        xaxis_title="Number of Tweets",
-                        yaxis_title="",
-                        yaxis=dict(autorange="reversed"),  # Display highest count at top
-                        margin=dict(t=30, b=10, l=10, r=10)
-                    )
-                    
-                    # Correct way to update colorbar properties
-                    fig.update_coloraxes(
-                        colorbar=dict(
-                            title="Count",
-                            tickfont=dict(color="white")
-                        )
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # Add hashtag word cloud (if additional libraries available)
-                    # This would require additional imports like WordCloud
-                else:
-                    st.info("No hashtag data available for selected filters")
-    except Exception as e:
-        st.error(f"Error fetching hashtag data: {str(e)}")
+    hashtag_data, hashtag_error = panels["hashtags"]
+
+    if hashtag_error:
+        st.error(f"Error fetching hashtag data: {hashtag_error}")
+    elif not hashtag_data.empty:
+        # Create hashtag visualization
+        fig = px.bar(
+            hashtag_data,
+            y="hashtag",
+            x="count",
+            color="count",
+            color_continuous_scale="Turbo",
+            orientation='h'
+        )
+        
+        fig.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            xaxis_title="Number of Tweets",
+            yaxis_title="",
+            yaxis=dict(autorange="reversed"),  # Display highest count at top
+            margin=dict(t=30, b=10, l=10, r=10)
+        )
+        
+        # Correct way to update colorbar properties
+        fig.update_coloraxes(
+            colorbar=dict(
+                title="Count",
+                tickfont=dict(color="white")
+            )
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No hashtag data available for selected filters")
     
     st.markdown("</div>", unsafe_allow_html=True)
 
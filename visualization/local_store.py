@@ -0,0 +1,213 @@
+# local_store.py
+"""
+This module keeps a local columnar replica of FINAL_TWEETS for the Streamlit apps.
+Only the columns the dashboards need are stored, as Parquet parts under LOCAL_STORE_PATH.
+New rows are pulled incrementally on CREATED_AT and all dashboard aggregations run
+in-process with Arrow compute, so Snowflake is only touched by the sync itself.
+FINAL_TWEETS has no load-time column, and tweets are often loaded after newer ones
+(scraped late, or re-run loads), so each sync re-reads the last LOCAL_STORE_SYNC_OVERLAP
+seconds before the watermark and keeps only the TWEET_IDs the store does not have yet.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from connectors.snowflake_connector import pooled_cursor, tag_queries
+from data_pipeline.tracing import span
+from config import (DASHBOARD_BRANDS, LOCAL_STORE_PATH, LOCAL_STORE_SYNC_INTERVAL, LOCAL_STORE_MAX_PARTS,
+                    LOCAL_STORE_SYNC_OVERLAP)
+
+# FINAL_TWEETS columns replicated locally (BRAND is derived at sync time)
+STORE_COLUMNS = [
+    "TWEET_ID", "CREATED_AT", "DATE", "TEXT", "SCREEN_NAME",
+    "SENTIMENT", "TOPIC", "LIKE_COUNT", "RETWEET_COUNT"
+]
+
+def assign_brand(text_column):
+    """Label each tweet with the first brand it mentions, or 'Other' (same rule as the rollup table)."""
+    brand = pa.array(["Other"] * len(text_column), pa.string())
+    # Walk the brands backwards so the highest-priority match is applied last
+    for name in reversed(DASHBOARD_BRANDS):
+        mentions = pc.fill_null(pc.match_substring(text_column, name, ignore_case=True), False)
+        brand = pc.if_else(mentions, name, brand)
+    return brand
+
+class LocalTweetStore:
+    def __init__(self, path=LOCAL_STORE_PATH):
+        self.path = path
+        self.watermark_path = os.path.join(path, "_watermark.json")
+        self._lock = threading.Lock()
+        self._table = None
+        self._table_version = None
+
+    # --- Sync -----------------------------------------------------------------
+
+    def _read_watermark(self):
+        if not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path) as f:
+            return json.load(f)
+
+    def _write_watermark(self, watermark):
+        tmp_path = self.watermark_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(watermark, f)
+        os.replace(tmp_path, self.watermark_path)
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    @tag_queries("local_store_sync")
+    def sync(self):
+        """
+        Pull FINAL_TWEETS rows created since the last sync, less the overlap window, and append
+        those not stored yet as a new Parquet part.
+        """
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            watermark = self._read_watermark()
+            since = watermark.get("created_at")
+
+            query = f"SELECT {', '.join(STORE_COLUMNS)} FROM FINAL_TWEETS"
+            params = None
+            if since:
+                # Rows loaded since the last sync can be older than the watermark
+                query += " WHERE CREATED_AT >= %s"
+                params = (str(datetime.fromisoformat(since) - timedelta(seconds=LOCAL_STORE_SYNC_OVERLAP)),)
+            query += " ORDER BY CREATED_AT"
+
+            with pooled_cursor() as cursor, span("snowflake.local_store_sync") as attrs:
+                cursor.execute(query, params)
+                new_rows = cursor.fetch_arrow_all()
+                attrs["rows"] = new_rows.num_rows if new_rows is not None else 0
+
+            if new_rows is not None and new_rows.num_rows > 0:
+                latest = pc.max(new_rows["CREATED_AT"]).as_py()
+                if since is None or latest > datetime.fromisoformat(since):
+                    watermark["created_at"] = str(latest)
+                stored = self.table()
+                if stored is not None:
+                    # The overlap window re-reads rows earlier syncs stored
+                    new_rows = new_rows.filter(pc.invert(pc.is_in(new_rows["TWEET_ID"], value_set=stored["TWEET_ID"])))
+                if new_rows.num_rows > 0:
+                    new_rows = new_rows.append_column("BRAND", assign_brand(new_rows["TEXT"]))
+                    part_path = os.path.join(self.path, f"part-{time.time_ns()}.parquet")
+                    pq.write_table(new_rows, part_path)
+                    print(f"✅ Local store synced {new_rows.num_rows} row(s) from FINAL_TWEETS.")
+
+            watermark["synced_at"] = time.time()
+            self._write_watermark(watermark)
+
+            if len(self._parts()) > LOCAL_STORE_MAX_PARTS:
+                self._compact()
+
+    def sync_if_stale(self, max_age=LOCAL_STORE_SYNC_INTERVAL):
+        """Sync only if the last sync is older than `max_age` seconds."""
+        synced_at = self._read_watermark().get("synced_at", 0)
+        if time.time() - synced_at >= max_age:
+            self.sync()
+
+    def _compact(self):
+        """Merge all parts into one de-duplicated file. Caller must hold the lock."""
+        parts = self._parts()
+        table = self._dedupe(pq.read_table(parts))
+        compacted_path = os.path.join(self.path, f"part-{time.time_ns()}.parquet")
+        pq.write_table(table, compacted_path)
+        for part in parts:
+            os.remove(part)
+
+    # --- Reads ----------------------------------------------------------------
+
+    @staticmethod
+    def _dedupe(table):
+        """Keep the latest copy of each TWEET_ID."""
+        if table.num_rows == 0:
+            return table
+        row_number = pa.array(range(table.num_rows))
+        latest = (
+            table.select(["TWEET_ID"])
+            .append_column("ROW", row_number)
+            .group_by("TWEET_ID")
+            .aggregate([("ROW", "max")])
+        )
+        return table.take(latest["ROW_max"])
+
+    def is_empty(self):
+        return not self._parts()
+
+    def table(self):
+        """Return the replicated table, re-reading the Parquet parts only when they change."""
+        parts = self._parts()
+        version = tuple((p, os.path.getmtime(p)) for p in parts)
+        if self._table is None or version != self._table_version:
+            self._table = self._dedupe(pq.read_table(list(parts))) if parts else None
+            self._table_version = version
+        return self._table
+
+    def _filtered(self, date_range_days):
+        table = self.table()
+        if table is None:
+            return None
+        if date_range_days:
+            since = pa.scalar(date.today() - timedelta(days=date_range_days), table.schema.field("DATE").type)
+            table = table.filter(pc.greater_equal(table["DATE"], since))
+        return table
+
+    def brand_sentiment(self, date_range_days, brands):
+        table = self._filtered(date_range_days)
+        if table is None:
+            return pd.DataFrame(columns=["Brand", "Sentiment", "Count"])
+        if brands:
+            table = table.filter(pc.is_in(table["BRAND"], pa.array(list(brands))))
+        counts = table.group_by(["BRAND", "SENTIMENT"]).aggregate([("TWEET_ID", "count")])
+        df = counts.to_pandas().rename(columns={"BRAND": "Brand", "SENTIMENT": "Sentiment", "TWEET_ID_count": "Count"})
+        return df[["Brand", "Sentiment", "Count"]].sort_values(["Brand", "Sentiment"]).reset_index(drop=True)
+
+    def topic_distribution(self, date_range_days, brands):
+        table = self._filtered(date_range_days)
+        if table is None:
+            return pd.DataFrame(columns=["Topic", "Count"])
+        if brands:
+            table = table.filter(pc.is_in(table["BRAND"], pa.array(list(brands))))
+        counts = table.group_by("TOPIC").aggregate([("TWEET_ID", "count")])
+        df = counts.to_pandas().rename(columns={"TOPIC": "Topic", "TWEET_ID_count": "Count"})
+        return df[["Topic", "Count"]].sort_values("Count", ascending=False).reset_index(drop=True)
+
+    def top_tweets(self, date_range_days, brands, limit=10):
+        table = self._filtered(date_range_days)
+        if table is None:
+            return pd.DataFrame(columns=["Text", "User", "Date", "Sentiment", "Likes", "Retweets"])
+        if brands:
+            # Same semantics as the Snowflake query: the text mentions any selected brand
+            mask = None
+            for name in brands:
+                mentions = pc.fill_null(pc.match_substring(table["TEXT"], name, ignore_case=True), False)
+                mask = mentions if mask is None else pc.or_(mask, mentions)
+            table = table.filter(mask)
+        engagement = pc.add(pc.fill_null(table["LIKE_COUNT"], 0), pc.fill_null(table["RETWEET_COUNT"], 0))
+        top = table.append_column("ENGAGEMENT", engagement).sort_by([("ENGAGEMENT", "descending")]).slice(0, limit)
+        df = top.select(["TEXT", "SCREEN_NAME", "CREATED_AT", "SENTIMENT", "LIKE_COUNT", "RETWEET_COUNT"]).to_pandas()
+        df.columns = ["Text", "User", "Date", "Sentiment", "Likes", "Retweets"]
+        return df
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_local_store():
+    """Return the process-wide local store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LocalTweetStore()
+        return _store
+
+if __name__ == "__main__":
+    get_local_store().sync()
@@ -0,0 +1,178 @@
+# panel_cache.py
+"""
+This module caches dashboard panel results across sessions and processes.
+Entries are keyed on the normalized filter tuple and tagged with the pipeline's data
+version token, so they stay valid until the next load instead of expiring on a timer.
+Results live in memory and on disk under DASHBOARD_CACHE_PATH, which lets the pipeline
+pre-warm the most requested filter combinations right after each load.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from data_pipeline.data_version import get_data_version
+from config import DASHBOARD_CACHE_PATH, DASHBOARD_CACHE_MAX_ENTRIES, DASHBOARD_PREWARM_TOP_N
+
+# Default sidebar selection, always pre-warmed
+DEFAULT_FILTERS = ("Last 90 days", ("Adidas", "Nike", "Puma"))
+
+POPULARITY_FLUSH_INTERVAL = 60  # Seconds between writes of the request counters
+
+class PanelCache:
+    def __init__(self, path=DASHBOARD_CACHE_PATH, max_entries=DASHBOARD_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.popularity_path = os.path.join(path, "popularity.json")
+        self._memory = OrderedDict()  # (version, key) -> panels, least recently used first
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._popularity = Counter()
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def normalize(date_range, brands):
+        """Filters that select the same data map to the same key regardless of brand order."""
+        return (date_range, tuple(sorted(set(brands))))
+
+    def _entry_path(self, version, key):
+        digest = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"v{version}", f"{digest}.pkl")
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _remember(self, version, key, panels):
+        with self._lock:
+            self._memory[(version, key)] = panels
+            self._memory.move_to_end((version, key))
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, version, key):
+        with self._lock:
+            panels = self._memory.get((version, key))
+            if panels is not None:
+                self._memory.move_to_end((version, key))
+                return panels
+        try:
+            with open(self._entry_path(version, key), "rb") as f:
+                panels = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        self._remember(version, key, panels)
+        return panels
+
+    def _store(self, version, key, panels):
+        # Results with errors are not cached, so a transient failure is retried next time
+        if any(error for _, error in panels.values()):
+            return
+        self._remember(version, key, panels)
+        entry_path = self._entry_path(version, key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(panels, f)
+        os.replace(tmp_path, entry_path)
+
+    def _record_request(self, key):
+        with self._lock:
+            self._popularity[json.dumps(key)] += 1
+            if time.monotonic() - self._last_flush < POPULARITY_FLUSH_INTERVAL:
+                return
+            counts, self._popularity = self._popularity, Counter()
+            self._last_flush = time.monotonic()
+        merged = Counter(self._read_popularity())
+        merged.update(counts)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self.popularity_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, self.popularity_path)
+
+    def _read_popularity(self):
+        try:
+            with open(self.popularity_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get_or_compute(self, date_range, brands, compute, record_request=True):
+        """
+        Return cached panels for the filters, computing them with `compute(date_range, brands)` on a miss.
+        Concurrent sessions asking for the same filters share a single computation.
+        """
+        key = self.normalize(date_range, brands)
+        version = get_data_version()
+        if record_request:
+            self._record_request(key)
+
+        panels = self._lookup(version, key)
+        if panels is not None:
+            return panels
+
+        with self._key_lock(key):
+            panels = self._lookup(version, key)
+            if panels is None:
+                panels = compute(key[0], list(key[1]))
+                self._store(version, key, panels)
+        return panels
+
+    def invalidate(self, date_range, brands):
+        """Drop a single filter combination for the current data version."""
+        key = self.normalize(date_range, brands)
+        version = get_data_version()
+        with self._lock:
+            self._memory.pop((version, key), None)
+        try:
+            os.remove(self._entry_path(version, key))
+        except FileNotFoundError:
+            pass
+
+    def purge_stale_versions(self):
+        """Delete on-disk entries belonging to older data versions."""
+        current = f"v{get_data_version()}"
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name.startswith("v") and name != current:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def popular_filters(self, top_n=DASHBOARD_PREWARM_TOP_N):
+        """The most requested filter combinations, plus the default selection."""
+        ranked = Counter(self._read_popularity()).most_common(top_n)
+        filters = [DEFAULT_FILTERS]
+        for key, _ in ranked:
+            date_range, brands = json.loads(key)
+            key = (date_range, tuple(brands))
+            if key not in filters:
+                filters.append(key)
+        return filters
+
+    def prewarm(self, compute, top_n=DASHBOARD_PREWARM_TOP_N):
+        """Compute and store the popular filter combinations for the current data version."""
+        self.purge_stale_versions()
+        filters = self.popular_filters(top_n)
+        for date_range, brands in filters:
+            try:
+                self.get_or_compute(date_range, brands, compute, record_request=False)
+            except Exception as e:
+                print(f"❌ Failed to pre-warm dashboard cache for {date_range} {list(brands)}: {str(e)}")
+        print(f"✅ Pre-warmed {len(filters)} dashboard filter combination(s).")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_panel_cache():
+    """Return the process-wide panel cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PanelCache()
+        return _cache
@@ -0,0 +1,228 @@
+# queries.py
+"""
+This module is the query layer behind the Streamlit dashboards.
+It builds the Snowflake and Neo4j queries for each dashboard panel and runs them
+concurrently: Snowflake statements are submitted with `execute_async` and gathered by
+query ID, while the Neo4j hashtag query runs in a worker thread, so a render waits for
+the slowest query instead of the sum of all of them.
+Brand sentiment and topic panels read the pre-aggregated rollup table maintained by
+`data_pipeline.rollup`; top tweets still come from FINAL_TWEETS.
+When the local Parquet replica is enabled (see `visualization.local_store`) the Snowflake
+panels are computed from it instead and the warehouse is only used to sync the replica.
+Results are shared across sessions through `visualization.panel_cache`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from connectors.snowflake_connector import get_pool, tag_queries
+from visualization.local_store import get_local_store
+from visualization.panel_cache import get_panel_cache
+from data_pipeline.tracing import traced
+from config import SNOWFLAKE_ROLLUP_TABLE, LOCAL_STORE_ENABLED
+
+# Column names of the DataFrame returned for each panel
+PANEL_COLUMNS = {
+    "brand_sentiment": ["Brand", "Sentiment", "Count"],
+    "topic_distribution": ["Topic", "Count"],
+    "top_tweets": ["Text", "User", "Date", "Sentiment", "Likes", "Retweets"],
+    "hashtags": ["hashtag", "count"],
+}
+
+# Number of days covered by each "Time Period" option ("All time" is unbounded)
+DATE_RANGE_DAYS = {
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+}
+
+def get_where_clause(date_range, brands):
+    """Build the Snowflake WHERE clause for the selected time period and brands."""
+    days = DATE_RANGE_DAYS.get(date_range)
+    date_filter = f"DATE >= DATEADD(day, -{days}, CURRENT_DATE())" if days else "1=1"
+
+    brand_conditions = [f"TEXT ILIKE '%{brand}%'" for brand in brands]
+    brand_filter = "(" + " OR ".join(brand_conditions) + ")" if brand_conditions else "1=1"
+
+    return f"WHERE {date_filter} AND {brand_filter}"
+
+def get_rollup_where_clause(date_range, brands):
+    """Build the WHERE clause for queries against the pre-aggregated rollup table."""
+    days = DATE_RANGE_DAYS.get(date_range)
+    date_filter = f"DATE >= DATEADD(day, -{days}, CURRENT_DATE())" if days else "1=1"
+
+    brand_list = ", ".join(f"'{brand}'" for brand in brands)
+    brand_filter = f"BRAND IN ({brand_list})" if brands else "1=1"
+
+    return f"WHERE {date_filter} AND {brand_filter}"
+
+def brand_sentiment_query(date_range, brands):
+    return f"""
+    SELECT
+        BRAND,
+        SENTIMENT,
+        SUM(TWEET_COUNT) as COUNT
+    FROM {SNOWFLAKE_ROLLUP_TABLE}
+    {get_rollup_where_clause(date_range, brands)}
+    GROUP BY BRAND, SENTIMENT
+    ORDER BY BRAND, SENTIMENT
+    """
+
+def topic_distribution_query(date_range, brands):
+    return f"""
+    SELECT
+        TOPIC,
+        SUM(TWEET_COUNT) as COUNT
+    FROM {SNOWFLAKE_ROLLUP_TABLE}
+    {get_rollup_where_clause(date_range, brands)}
+    GROUP BY TOPIC
+    ORDER BY COUNT DESC
+    """
+
+def top_tweets_query(date_range, brands):
+    return f"""
+    SELECT
+        TEXT,
+        SCREEN_NAME,
+        CREATED_AT,
+        SENTIMENT,
+        LIKE_COUNT,
+        RETWEET_COUNT
+    FROM FINAL_TWEETS
+    {get_where_clause(date_range, brands)}
+    ORDER BY (LIKE_COUNT + RETWEET_COUNT) DESC
+    LIMIT 10
+    """
+
+def hashtag_query(date_range, brands):
+    """Build the Cypher query for the top hashtags panel."""
+    days = DATE_RANGE_DAYS.get(date_range)
+    date_clause = f"date(t.date) >= date() - duration('P{days}D')" if days else "1=1"
+
+    brand_clauses = [f"toLower(t.text) CONTAINS toLower('{brand}')" for brand in brands]
+    brand_clause = " OR ".join(brand_clauses) if brand_clauses else "1=1"
+
+    return f"""
+    // query: dashboard.hashtags
+    MATCH (t:Tweet)-[:CONTAINS_HASHTAG]->(h:Hashtag)
+    WHERE ({date_clause}) AND ({brand_clause})
+    RETURN h.tag AS hashtag, COUNT(t) AS count
+    ORDER BY count DESC
+    LIMIT 15
+    """
+
+SNOWFLAKE_PANELS = {
+    "brand_sentiment": brand_sentiment_query,
+    "topic_distribution": topic_distribution_query,
+    "top_tweets": top_tweets_query,
+}
+
+def empty_panel(name):
+    return pd.DataFrame(columns=PANEL_COLUMNS[name])
+
+@traced("neo4j.hashtags")
+def fetch_hashtags(neo4j_driver, date_range, brands):
+    """Run the hashtag panel query against Neo4j."""
+    try:
+        with neo4j_driver.session() as session:
+            records = [dict(record) for record in session.run(hashtag_query(date_range, brands))]
+        if not records:
+            return empty_panel("hashtags"), None
+        return pd.DataFrame(records), None
+    except Exception as e:
+        return empty_panel("hashtags"), str(e)
+
+@traced("snowflake.panels")
+@tag_queries("dashboard")
+def fetch_snowflake_panels(date_range, brands, results):
+    """Submit every Snowflake panel query at once and gather the results into `results`."""
+    try:
+        with get_pool().connection() as conn:
+            # 1. Submit every panel query without waiting for results
+            query_ids = {}
+            for name, build_query in SNOWFLAKE_PANELS.items():
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute_async(build_query(date_range, brands))
+                        query_ids[name] = cursor.sfqid
+                except Exception as e:
+                    results[name] = (empty_panel(name), str(e))
+
+            # 2. Gather results by query ID (blocks only until each query finishes)
+            for name, query_id in query_ids.items():
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.get_results_from_sfqid(query_id)
+                        rows = cursor.fetchall()
+                    results[name] = (pd.DataFrame(rows, columns=PANEL_COLUMNS[name]), None)
+                except Exception as e:
+                    results[name] = (empty_panel(name), str(e))
+    except Exception as e:
+        for name in SNOWFLAKE_PANELS:
+            results.setdefault(name, (empty_panel(name), str(e)))
+
+@traced("local_store.panels")
+def fetch_local_panels(date_range, brands):
+    """
+    Compute the Snowflake panels from the local replica.
+    Returns None when the replica cannot be used, so the caller falls back to Snowflake.
+    """
+    store = get_local_store()
+    try:
+        store.sync_if_stale()
+    except Exception as e:
+        # A failed sync still leaves the last good replica usable
+        print(f"❌ Local store sync failed: {str(e)}")
+    if store.is_empty():
+        return None
+
+    days = DATE_RANGE_DAYS.get(date_range)
+    results = {}
+    for name, compute in [
+        ("brand_sentiment", store.brand_sentiment),
+        ("topic_distribution", store.topic_distribution),
+        ("top_tweets", store.top_tweets),
+    ]:
+        try:
+            results[name] = (compute(days, brands), None)
+        except Exception as e:
+            results[name] = (empty_panel(name), str(e))
+    return results
+
+@traced("dashboard.panels")
+def fetch_dashboard_panels(neo4j_driver, date_range, brands):
+    """
+    Fetch every dashboard panel at once.
+    Returns a dict mapping panel name to a (DataFrame, error) tuple, where error is None on success.
+    """
+    brands = list(brands)
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Neo4j works in the background while Snowflake runs the warehouse queries
+        if neo4j_driver is not None:
+            hashtag_future = executor.submit(fetch_hashtags, neo4j_driver, date_range, brands)
+        else:
+            hashtag_future = None
+            results["hashtags"] = (empty_panel("hashtags"), "Neo4j is not connected")
+
+        local_results = fetch_local_panels(date_range, brands) if LOCAL_STORE_ENABLED else None
+        if local_results is not None:
+            results.update(local_results)
+        else:
+            fetch_snowflake_panels(date_range, brands, results)
+
+        if hashtag_future is not None:
+            results["hashtags"] = hashtag_future.result()
+
+    return results
+
+def get_dashboard_panels(neo4j_driver, date_range, brands):
+    """Cached entry point used by the dashboards; valid until the pipeline bumps the data version."""
+    return get_panel_cache().get_or_compute(
+        date_range, brands, lambda d, b: fetch_dashboard_panels(neo4j_driver, d, b)
+    )
+
+def prewarm_dashboard_cache(neo4j_driver):
+    """Fill the cache for the most requested filter combinations after a load."""
+    get_panel_cache().prewarm(lambda d, b: fetch_dashboard_panels(neo4j_driver, d, b))
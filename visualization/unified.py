@@ -48,14 +48,26 @@ else:
 
 # Import from the root-level connectors
 try:
-    from connectors.snowflake_connector import get_connection
+    from connectors.snowflake_connector import get_pool
     from connectors.neo4j_connector import get_driver
+    from visualization.queries import get_dashboard_panels
+    from visualization.panel_cache import get_panel_cache
+    from data_pipeline.llm_qa import QASystem
+    from data_pipeline.embedding_profile import vector_index_statement
+    from data_pipeline.qa_streaming import StreamingQAPipeline
+    from data_pipeline.conversation import ConversationRetrieval
+    from data_pipeline.qa_client import RemoteQAPipeline
+    from data_pipeline.tracing import start_metrics_server
+    from connectors.neo4j_profiling import profiling_driver
+    from config import METRICS_PORT, QA_SERVICE_URL
     from neo4j import GraphDatabase
 except ImportError as e:
     logger.error(f"Import error: {e}")
     st.error(f"Error importing required modules: {e}")
     st.stop()
 
+start_metrics_server(METRICS_PORT)  # Once per process; later reruns are no-ops
+
 # Add custom CSS for better styling
 st.markdown("""
 <style>
@@ -227,7 +239,7 @@ def get_neo4j_driver():
         # Test the connection
         with driver.session(database=NEO4J_DATABASE) as session:
             session.run("RETURN 1")
-        return driver
+        return profiling_driver(driver)
     except Exception as e:
         logger.error(f"Neo4j connection error: {e}")
         st.error(f"Failed to connect to Neo4j: {e}")
@@ -237,27 +249,29 @@ def get_neo4j_driver():
 @st.cache_resource
 def init_connections():
     try:
-        snowflake_conn = get_connection()
+        snowflake_pool = get_pool()
         neo4j_driver = get_neo4j_driver()
-        return snowflake_conn, neo4j_driver, None
+        return snowflake_pool, neo4j_driver, None
     except Exception as e:
         return None, None, str(e)
 
-snowflake_conn, neo4j_driver, connection_error = init_connections()
+snowflake_pool, neo4j_driver, connection_error = init_connections()
 
 # If there's a connection error, show the error but continue as we might use sample data
 if connection_error:
     st.error(f"Failed to connect to databases: {connection_error}")
     st.warning("Displaying sample data instead")
 
-# Create a simplified QA System that works standalone
-class SimpleQASystem:
+# QASystem on the app's Neo4j driver, with keyword extraction that needs no spaCy model
+class SimpleQASystem(QASystem):
     def __init__(self):
-        # Connect to Neo4j
-        self.neo4j_driver = neo4j_driver
+        super().__init__(neo4j_driver=neo4j_driver)
         # Ensure vector index exists
         self.ensure_vector_index_exists()
     
+    def load_language_model(self):
+        return None
+    
     def ensure_vector_index_exists(self):
         """Make sure the vector index exists before running queries"""
         try:
@@ -273,17 +287,7 @@ class SimpleQASystem:
                 if result.single()["count"] == 0:
                     # Create the index if it doesn't exist
                     print("Creating vector index 'tweet_embeddings'...")
-                    session.run("""
-                    CREATE VECTOR INDEX tweet_embeddings
-                    FOR (t:Tweet)
-                    ON (t.embedding)
-                    OPTIONS {
-                        indexConfig: {
-                            `vector.dimensions`: 1536,
-                            `vector.similarity_function`: 'cosine'
-                        }
-                    }
-                    """)
+                    session.run(vector_index_statement())
                     print("Vector index created successfully")
                 else:
                     print("Vector index 'tweet_embeddings' already exists")
@@ -293,23 +297,6 @@ class SimpleQASystem:
             print(f"Error creating vector index: {e}")
             return False
     
-    def generate_embeddings(self, text):
-        """Generate embeddings for the input text"""
-        try:
-            # Using older OpenAI API format
-            res = openai.Embedding.create(
-                input=text,
-                model="text-embedding-3-small"
-            )
-            # Handle different response formats based on OpenAI version
-            if hasattr(res, 'data'):
-                return res.data[0].embedding
-            else:
-                return res["data"][0]["embedding"]
-        except Exception as e:
-            logger.error(f"Embedding error: {e}")
-            return []
-    
     def extract_keywords(self, text):
         """Extract simple keywords from the question"""
         # Simple keyword extraction without spaCy
@@ -322,179 +309,7 @@ class SimpleQASystem:
                     'through', 'during', 'before', 'after', 'above', 'below', 'on', 'off'}
         return [w for w in words if w.isalpha() and w not in stopwords]
     
-    def query_knowledge_graph(self, question, embedding):
-        """Query Neo4j with both vector search and keyword matching"""
-        # Return empty results if embedding generation failed
-        if not embedding:
-            return []
-        
-        # Extract keywords for keyword matching
-        keywords = self.extract_keywords(question)
-        
-        # Build hybrid search query
-        query = """
-        // Vector search for semantic similarity
-        CALL db.index.vector.queryNodes('tweet_embeddings', $topK, $embedding)
-        YIELD node, score
-        WITH node AS t, score AS semanticScore
-        
-        // Add keyword matching as additional signal
-        WITH t, semanticScore,
-            reduce(s=0, k IN $keywords | 
-                s + CASE WHEN toLower(t.text) CONTAINS k THEN 1 ELSE 0 END
-            ) AS keywordScore
-            
-        // Get related information
-        OPTIONAL MATCH (t)<-[:POSTED]-(u:User)
-        OPTIONAL MATCH (t)-[:HAS_SENTIMENT]->(s:Sentiment)
-        OPTIONAL MATCH (t)-[:BELONGS_TO_TOPIC]->(topic:Topic)
-        
-        // Return results with combined relevance score
-        RETURN 
-            t.text AS tweet, 
-            t.created_at AS created, 
-            u.screen_name AS user,
-            t.retweet_count AS retweet_count,
-            t.like_count AS like_count,
-            s.label AS sentiment,
-            topic.name AS topic,
-            t.location AS location,
-            semanticScore, 
-            keywordScore, 
-            (semanticScore * 3 + keywordScore) AS relevance
-            
-        ORDER BY relevance DESC 
-        LIMIT 50
-        """
-        
-        try:
-            with self.neo4j_driver.session(database=NEO4J_DATABASE) as session:
-                result = session.run(query, {
-                    "embedding": embedding,
-                    "keywords": keywords,
-                    "topK": 100
-                })
-                return result.data()
-        except Exception as e:
-            logger.error(f"Neo4j query error: {e}")
-            return []
-    
-    def generate_answer(self, question, results):
-        """Generate an answer using the LLM with context from tweets"""
-        if not results:
-            return "I couldn't find relevant information about that topic.", []
-        
-        # Create context from top relevant tweets
-        context = "\n".join([
-            f"- @{r.get('user', 'Anonymous')}: {r.get('tweet', '')}" 
-            for r in results[:15]  # Use top 15 results
-        ])
-        
-        try:
-            # Support both older and newer OpenAI API formats
-            try:
-                # Newer format
-                client = openai.OpenAI(api_key=openai.api_key)
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You're a sportswear brand analyst answering questions based on tweet data."},
-                        {"role": "user", "content": f"Question: {question}\n\nTweets:\n{context}"}
-                    ],
-                    temperature=0.0
-                )
-                return response.choices[0].message.content.strip(), results
-            except (AttributeError, TypeError):
-                # Older format
-                res = openai.ChatCompletion.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You're a sportswear brand analyst answering questions based on tweet data."},
-                        {"role": "user", "content": f"Question: {question}\n\nTweets:\n{context}"}
-                    ],
-                    temperature=0.0
-                )
-                return res.choices[0].message.content.strip(), results
-        except Exception as e:
-            logger.error(f"LLM answer error: {e}")
-            return f"Error generating answer: {str(e)}", results
-    
-    def generate_followup_questions(self, question, answer):
-        """Generate follow-up questions based on the current question and answer"""
-        try:
-            # Support both older and newer OpenAI API formats
-            prompt = f"""
-            Based on this question and answer about sportswear brands, suggest 3 natural follow-up questions that someone might ask next.
-            Keep the questions short, focused, and directly related to sportswear brands.
-            
-            Question: {question}
-            Answer: {answer}
-            
-            Format each question on its own line, without numbering or bullets.
-            """
-            
-            try:
-                # Newer format
-                client = openai.OpenAI(api_key=openai.api_key)
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You generate relevant follow-up questions about sportswear brands."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7
-                )
-                questions_text = response.choices[0].message.content.strip()
-            except (AttributeError, TypeError):
-                # Older format
-                res = openai.ChatCompletion.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You generate relevant follow-up questions about sportswear brands."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7
-                )
-                questions_text = res.choices[0].message.content.strip()
-            
-            # Parse questions from the response
-            questions = [q.strip() for q in questions_text.split('\n') if q.strip()]
-            return questions[:3]  # Ensure we only return up to 3 questions
-        except Exception as e:
-            logger.error(f"Follow-up questions error: {e}")
-            return [
-                "How does this brand compare to its competitors?",
-                "What are the trending products from this brand?",
-                "What marketing strategies is this brand using effectively?"
-            ]
-    
-    def process_question(self, question):
-        """Process a question and return answer with sources"""
-        # 1. Generate vector embedding
-        embedding = self.generate_embeddings(question)
-        
-        # 2. Perform hybrid search (vector + keyword)
-        results = self.query_knowledge_graph(question, embedding)
-        logger.info(f"Found {len(results)} relevant tweets")
-        
-        # 3. Generate answer using LLM
-        answer, sources = self.generate_answer(question, results)
-        
-        # 4. Generate follow-up questions
-        followup_questions = self.generate_followup_questions(question, answer)
-        
-        return {
-            "question": question,
-            "answer": answer,
-            "sources": sources,
-            "followup_questions": followup_questions
-        }
     
-    def close(self):
-        """Close the Neo4j connection"""
-        if self.neo4j_driver:
-            self.neo4j_driver.close()
-
 # IMPROVED COLOR SCHEME FOR CHARTS
 BRAND_COLORS = {
     "Nike": "#FF9900",      # Orange
@@ -511,125 +326,23 @@ SENTIMENT_COLORS = {
     "Negative": "#FF453A"   # Red
 }
 
-# Helper function to create where clause for queries
-def get_where_clause():
-    # Date filter
-    if date_range == "Last 7 days":
-        date_filter = "DATE >= DATEADD(day, -7, CURRENT_DATE())"
-    elif date_range == "Last 30 days":
-        date_filter = "DATE >= DATEADD(day, -30, CURRENT_DATE())"
-    elif date_range == "Last 90 days":
-        date_filter = "DATE >= DATEADD(day, -90, CURRENT_DATE())"
-    else:
-        date_filter = "1=1"  # All time
-    
-    # Brand filter
-    brand_conditions = []
-    for brand in brands:
-        brand_conditions.append(f"TEXT ILIKE '%{brand}%'")
-    
-    if brand_conditions:
-        brand_filter = "(" + " OR ".join(brand_conditions) + ")"
-    else:
-        brand_filter = "1=1"
-    
-    return f"WHERE {date_filter} AND {brand_filter}"
-
-# Data loading functions with progress indicators and error handling
-@st.cache_data(ttl=300)
-def get_brand_sentiment():
-    where_clause = get_where_clause()
-    
-    query = f"""
-    SELECT 
-        CASE 
-            WHEN TEXT ILIKE '%Nike%' THEN 'Nike'
-            WHEN TEXT ILIKE '%Adidas%' THEN 'Adidas'
-            WHEN TEXT ILIKE '%Puma%' THEN 'Puma'
-            WHEN TEXT ILIKE '%Under Armour%' THEN 'Under Armour'
-            WHEN TEXT ILIKE '%New Balance%' THEN 'New Balance'
-            ELSE 'Other'
-        END as BRAND,
-        SENTIMENT,
-        COUNT(*) as COUNT
-    FROM FINAL_TWEETS
-    {where_clause}
-    GROUP BY BRAND, SENTIMENT
-    ORDER BY BRAND, SENTIMENT
-    """
-    
-    try:
-        cursor = snowflake_conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        
-        return pd.DataFrame(results, columns=["Brand", "Sentiment", "Count"]), None
-    except Exception as e:
-        return pd.DataFrame(columns=["Brand", "Sentiment", "Count"]), str(e)
-
-@st.cache_data(ttl=300)
-def get_topic_distribution():
-    where_clause = get_where_clause()
-    
-    query = f"""
-    SELECT 
-        TOPIC,
-        COUNT(*) as COUNT
-    FROM FINAL_TWEETS
-    {where_clause}
-    GROUP BY TOPIC
-    ORDER BY COUNT DESC
-    """
-    
-    try:
-        cursor = snowflake_conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        
-        return pd.DataFrame(results, columns=["Topic", "Count"]), None
-    except Exception as e:
-        return pd.DataFrame(columns=["Topic", "Count"]), str(e)
-
-@st.cache_data(ttl=300)
-def get_top_tweets():
-    where_clause = get_where_clause()
-    
-    query = f"""
-    SELECT 
-        TEXT,
-        SCREEN_NAME,
-        CREATED_AT,
-        SENTIMENT,
-        LIKE_COUNT,
-        RETWEET_COUNT
-    FROM FINAL_TWEETS
-    {where_clause}
-    ORDER BY (LIKE_COUNT + RETWEET_COUNT) DESC
-    LIMIT 10
-    """
-    
-    try:
-        cursor = snowflake_conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        
-        return pd.DataFrame(results, columns=["Text", "User", "Date", "Sentiment", "Likes", "Retweets"]), None
-    except Exception as e:
-        return pd.DataFrame(columns=["Text", "User", "Date", "Sentiment", "Likes", "Retweets"]), str(e)
-
 # Initialize QA system
 @st.cache_resource
 def get_qa_system():
     return SimpleQASystem()
 
-try:
-    qa = get_qa_system()
-except Exception as e:
-    st.error(f"Error initializing QA system: {e}")
+if QA_SERVICE_URL:
+    # Thin client: questions are answered by the shared QA service (python -m data_pipeline.qa_service)
     qa = None
+    pipeline = RemoteQAPipeline(QA_SERVICE_URL)
+else:
+    try:
+        qa = get_qa_system()
+    except Exception as e:
+        st.error(f"Error initializing QA system: {e}")
+        qa = None
+    # Streaming pipeline around the in-process QA system
+    pipeline = StreamingQAPipeline(qa) if qa else None
 
 # Initialize session state for navigation and QA components
 if "app_view" not in st.session_state:
@@ -638,8 +351,12 @@ if "app_view" not in st.session_state:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "need_rerun" not in st.session_state:
-    st.session_state.need_rerun = False
+if "pending_question" not in st.session_state:
+    st.session_state.pending_question = None
+
+# Previous turn's retrieval candidates, re-ranked locally for follow-up questions
+if "conversation" not in st.session_state:
+    st.session_state.conversation = ConversationRetrieval()
 
 if "question_input" not in st.session_state:
     st.session_state.question_input = ""
@@ -693,38 +410,12 @@ with st.sidebar:
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     st.markdown(f"<p class='refresh-time'>Last updated: {current_time}</p>", unsafe_allow_html=True)
 
-# Check if we need to rerun (set by a callback)
-if st.session_state.need_rerun:
-    st.session_state.need_rerun = False
-    st.rerun()
-
 # Function to handle question submission and clear the input
 def handle_submit():
-    if st.session_state.question_input and qa:
-        # Get the question from the input widget's state
-        question = st.session_state.question_input
-        
-        with st.spinner("Analyzing tweets..."):
-            try:
-                # Process the question
-                result = qa.process_question(question)
-                
-                # Add to chat history
-                st.session_state.messages.append({"role": "user", "content": question})
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": result["answer"],
-                    "sources": result["sources"][:10],
-                    "followup_questions": result["followup_questions"]
-                })
-                
-                # Clear the input box after processing
-                st.session_state.question_input = ""
-                
-                # Set a flag to indicate we need to rerun after the callback completes
-                st.session_state.need_rerun = True
-            except Exception as e:
-                st.error(f"Error processing question: {e}")
+    if st.session_state.question_input and pipeline:
+        # The answer is streamed by the script body, callbacks cannot render incrementally
+        st.session_state.pending_question = st.session_state.question_input
+        st.session_state.question_input = ""
 
 # Main app layout based on selected view
 if st.session_state.app_view == "ask":
@@ -737,6 +428,7 @@ if st.session_state.app_view == "ask":
     with col2:
         if st.button("Clear History"):
             st.session_state.messages = []
+            st.session_state.conversation.clear()
             st.rerun()
     
     # Display chat history
@@ -764,7 +456,7 @@ if st.session_state.app_view == "ask":
                         """)
             
             # If this message has suggested questions, display them at the bottom
-            if "followup_questions" in message:
+            if message.get("followup_questions"):
                 st.markdown("### Suggested Questions")
                 cols = st.columns(len(message["followup_questions"]))
                 for i, question in enumerate(message["followup_questions"]):
@@ -772,12 +464,34 @@ if st.session_state.app_view == "ask":
                     message_idx = st.session_state.messages.index(message)
                     unique_key = f"suggestion_{message_idx}_{i}"
                     if cols[i].button(question, key=unique_key):
-                        try:
-                            # Set this as the new question and process it
-                            st.session_state.question_input = question
-                            handle_submit()
-                        except Exception as e:
-                            st.error(f"Error processing suggested question: {e}")
+                        # Set this as the new question and answer it on the next run
+                        st.session_state.pending_question = question
+                        st.rerun()
+    
+    # Stream the answer to a pending question
+    if st.session_state.pending_question and pipeline:
+        question = st.session_state.pending_question
+        st.session_state.pending_question = None
+        st.markdown(f"<div class='question-box'><h3>Question</h3>{question}</div>", unsafe_allow_html=True)
+        st.markdown("<h3>Answer</h3>", unsafe_allow_html=True)
+        try:
+            stream = pipeline.stream(question, conversation=st.session_state.conversation)
+            st.write_stream(stream)
+            result = stream.result
+            
+            # Add to chat history
+            st.session_state.messages.append({"role": "user", "content": question})
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": result["answer"],
+                "sources": result["sources"][:10],
+                "followup_questions": result.get("followup_questions", []),
+                "timings": result["timings"]
+            })
+        except Exception as e:
+            st.error(f"Error processing question: {e}")
+        else:
+            st.rerun()
     
     # Input section at the bottom
     st.markdown("---")
@@ -801,18 +515,21 @@ else:
     col1, col2 = st.columns([5, 1])
     with col2:
         if st.button("🔄 Refresh Data", help="Refresh the dashboard data"):
-            st.cache_data.clear()
+            # Only drop the current filter combination; other users' cached views stay warm
+            get_panel_cache().invalidate(date_range, brands)
             st.rerun()
     
+    # Fetch every panel at once through the shared cache; the tabs below only render the results
+    with st.spinner("Loading dashboard data..."):
+        panels = get_dashboard_panels(neo4j_driver, date_range, brands)
+
     # Create tabs for different views
     tab1, tab2, tab3 = st.tabs(["📊 Brand Overview", "😊 Sentiment Analysis", "🔍 Topic Analysis"])
     
     with tab1:
         # Brand Overview Tab
-        # Load data with progress indicator
-        with st.spinner("Loading brand data..."):
-            brand_sentiment, bs_error = get_brand_sentiment()
-            top_tweets, tt_error = get_top_tweets()
+        brand_sentiment, bs_error = panels["brand_sentiment"]
+        top_tweets, tt_error = panels["top_tweets"]
             
         if bs_error:
             st.error(f"Error fetching brand sentiment: {bs_error}")
@@ -923,8 +640,7 @@ else:
     
     with tab2:
         # Sentiment Analysis Tab
-        with st.spinner("Loading sentiment data..."):
-            brand_sentiment, bs_error = get_brand_sentiment()
+        brand_sentiment, bs_error = panels["brand_sentiment"]
         
         if bs_error:
             st.error(f"Error fetching sentiment data: {bs_error}")
@@ -1069,8 +785,7 @@ else:
 
     with tab3:
         # Topic Analysis Tab
-        with st.spinner("Loading topic data..."):
-            topic_data, topic_error = get_topic_distribution()
+        topic_data, topic_error = panels["topic_distribution"]
         
         if topic_error:
             st.error(f"Error fetching topic data: {topic_error}")
@@ -1180,74 +895,42 @@ else:
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
         st.subheader("Top Hashtags")
         
-        try:
-            with st.spinner("Loading hashtag data..."):
-                # Define date filter in Neo4j format
-                if date_range == "Last 7 days":
-                    date_clause = "date(t.date) >= date() - duration('P7D')"
-                elif date_range == "Last 30 days":
-                    date_clause = "date(t.date) >= date() - duration('P30D')"
-                elif date_range == "Last 90 days":
-                    date_clause = "date(t.date) >= date() - duration('P90D')"
-                else:
-                    date_clause = "1=1"  # All time
-                
-                # Build brand filter for Neo4j
-                brand_clauses = []
-                for brand in brands:
-                    brand_clauses.append(f"toLower(t.text) CONTAINS toLower('{brand}')")
-                
-                brand_clause = " OR ".join(brand_clauses) if brand_clauses else "1=1"
-                
-                # Query with both filters
-                query = f"""
-                MATCH (t:Tweet)-[:CONTAINS_HASHTAG]->(h:Hashtag)
-                WHERE ({date_clause}) AND ({brand_clause})
-                RETURN h.tag AS hashtag, COUNT(t) AS count
-                ORDER BY count DESC
-                LIMIT 15
-                """
-                
-                with neo4j_driver.session() as session:
-                    result = session.run(query)
-                    records = [dict(record) for record in result]
-                    
-                    if records:
-                        hashtag_data = pd.DataFrame(records)
-                        
-                        # Create hashtag visualization
-                        fig = px.bar(
-                            hashtag_data,
-                            y="hashtag",
-                            x="count",
-                            color="count",
-                            color_continuous_scale="Turbo",
-                            orientation='h'
-                        )
-                        
-                        fig.update_layout(
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            font=dict(color='white'),
-                            xaxis_title="Number of Tweets",
-                            yaxis_title="",
-                            yaxis=dict(autorange="reversed"),  # Display highest count at top
-                            margin=dict(t=30, b=10, l=10, r=10)
-                        )
-                        
-                        # Correct way to update colorbar properties
-                        fig.update_coloraxes(
-                            colorbar=dict(
-                                title="Count",
-                                tickfont=dict(color="white")
-                            )
-                        )
-                        
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info("No hashtag data available for selected filters")
-        except Exception as e:
-            st.error(f"Error fetching hashtag data: {str(e)}")
+        hashtag_data, hashtag_error = panels["hashtags"]
+
+        if hashtag_error:
+            st.error(f"Error fetching hashtag data: {hashtag_error}")
+        elif not hashtag_data.empty:
+            # Create hashtag visualization
+            fig = px.bar(
+                hashtag_data,
+                y="hashtag",
+                x="count",
+                color="count",
+                color_continuous_scale="Turbo",
+                orientation='h'
+            )
+            
+            fig.update_layout(
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='white'),
+                xaxis_title="Number of Tweets",
+                yaxis_title="",
+                yaxis=dict(autorange="reversed"),  # Display highest count at top
+                margin=dict(t=30, b=10, l=10, r=10)
+            )
+            
+            # Correct way to update colorbar properties
+            fig.update_coloraxes(
+                colorbar=dict(
+                    title="Count",
+                    tickfont=dict(color="white")
+                )
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No hashtag data available for selected filters")
         
         st.markdown("</div>", unsafe_allow_html=True)
 